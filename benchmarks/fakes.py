@@ -0,0 +1,183 @@
+import json
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+# Section names are quoted, and escaped when they come from JSON columns
+QUOTED_PATTERN = re.compile(r"\\?[\"']([\w ]+)\\?[\"']")
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+TOP_K_PATTERN = re.compile(r"top (\d+) section")
+QUESTION_MARKER = "Here is the user's question"
+EQ_FORMULA_PATTERN = re.compile(r"\{(.+?)\}\s*=\s*'(.*)'")
+
+
+def _usage(prompt: str, text: str) -> SimpleNamespace:
+    return SimpleNamespace(
+        prompt_token_count=len(prompt) // 4,
+        candidates_token_count=len(text) // 4,
+        total_token_count=(len(prompt) + len(text)) // 4,
+    )
+
+
+def route_sections(prompt: str) -> list[str]:
+    """
+    Pick the section names of a routing prompt that share a word with the question
+
+    The section names are read from the table of contents in the prompt, so
+    the answer is deterministic and always refers to existing sections.
+    """
+    toc_part, _, question = prompt.partition(QUESTION_MARKER)
+    top_k = TOP_K_PATTERN.search(toc_part)
+    question_words = {
+        word for word in WORD_PATTERN.findall(question.lower()) if len(word) > 3
+    }
+    candidates = dict.fromkeys(
+        name
+        for name in QUOTED_PATTERN.findall(toc_part)
+        # The example answer of the prompt
+        if name != "troubleshooting_section"
+    )
+    ranked = sorted(
+        candidates,
+        key=lambda name: -len(question_words & set(name.split("_"))),
+    )
+    matches = [
+        name for name in ranked if question_words & set(name.split("_"))
+    ] or ranked
+    return matches[: int(top_k.group(1)) if top_k else 1]
+
+
+class FakeChatSession:
+    def __init__(self, model: "FakeGeminiModel", history: list | None = None):
+        self.model = model
+        self.history = history or []
+
+    def send_message(self, message) -> SimpleNamespace:
+        parts = []
+        for turn in self.history:
+            turn_parts = turn.get("parts", [])
+            parts.extend([turn_parts] if isinstance(turn_parts, str) else turn_parts)
+        return self.model.respond("\n".join(map(str, [*parts, message])))
+
+
+class FakeGeminiModel:
+    """
+    A deterministic stand-in for `genai.GenerativeModel`
+
+    Routing prompts are answered with the matching section names of the
+    table of contents, table of contents prompts with `toc_mapping` and
+    anything else with an empty JSON object. `latency` seconds are slept
+    per call to mimic the network.
+    """
+
+    def __init__(self, toc_mapping: dict | None = None, latency: float = 0.0):
+        self.toc_mapping = toc_mapping or {}
+        self.latency = latency
+        self.calls = 0
+
+    def start_chat(self, history: list | None = None) -> FakeChatSession:
+        return FakeChatSession(self, history)
+
+    def generate_content(self, contents) -> SimpleNamespace:
+        return self.respond(str(contents))
+
+    def respond(self, prompt: str) -> SimpleNamespace:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if QUESTION_MARKER in prompt:
+            text = json.dumps(route_sections(prompt))
+        elif "table of contents" in prompt.lower():
+            text = json.dumps(self.toc_mapping)
+        else:
+            text = "{}"
+        return SimpleNamespace(text=text, usage_metadata=_usage(prompt, text))
+
+
+class FakeStreamingClient:
+    """
+    A stand-in for `google.genai.Client` that streams a canned answer
+
+    `client.models.generate_content_stream` waits `first_token_latency`
+    seconds, then yields `chunks` text chunks `chunk_latency` seconds apart.
+    A share `error_rate` of the calls raise instead, to mimic API errors.
+    """
+
+    def __init__(
+        self,
+        first_token_latency: float = 0.5,
+        chunk_latency: float = 0.05,
+        chunks: int = 20,
+        error_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        self.first_token_latency = first_token_latency
+        self.chunk_latency = chunk_latency
+        self.chunks = chunks
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.models = self
+
+    def generate_content_stream(self, model: str, contents: str):
+        with self._lock:
+            fail = self._random.random() < self.error_rate
+        time.sleep(self.first_token_latency)
+        if fail:
+            raise RuntimeError("503 The model is overloaded")
+        text = ""
+        for i in range(self.chunks):
+            if i:
+                time.sleep(self.chunk_latency)
+            chunk = f"Step {i + 1}: check the filters and the drain hose. "
+            text += chunk
+            yield SimpleNamespace(
+                candidates=[
+                    SimpleNamespace(
+                        content=SimpleNamespace(parts=[SimpleNamespace(text=chunk)])
+                    )
+                ],
+                prompt_feedback=None,
+                usage_metadata=_usage(contents, text),
+            )
+
+
+class StubAirtableTable:
+    """
+    An in-memory stand-in for `pyairtable.Table`
+
+    Supports the `first`, `get` and `all` calls of `CustomerProfileService`,
+    each taking `latency` seconds like a round trip to the Airtable API.
+    """
+
+    def __init__(self, records: list[dict], latency: float = 0.0):
+        self.records = {record["id"]: record for record in records}
+        self.latency = latency
+        self.calls = 0
+
+    def _call(self) -> None:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def first(self, formula=None, fields=None) -> dict | None:
+        self._call()
+        field_name, value = EQ_FORMULA_PATTERN.search(str(formula)).groups()
+        return next(
+            (
+                record
+                for record in self.records.values()
+                if record["fields"].get(field_name) == value
+            ),
+            None,
+        )
+
+    def get(self, record_id: str) -> dict:
+        self._call()
+        return self.records[record_id]
+
+    def all(self, fields=None) -> list[dict]:
+        self._call()
+        return list(self.records.values())
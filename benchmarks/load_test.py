@@ -0,0 +1,367 @@
+"""
+Load test of the chat pipeline with local stand-ins
+
+Drives the code behind `chatbot.app` - customer lookup, section routing and
+fetch, context assembly, streaming the answer and queuing the chat log - from
+`concurrency` threads, like concurrent Streamlit sessions of one container.
+Gemini is replaced by fakes with configurable latency, MotherDuck by a local
+DuckDB file and Airtable by an in-memory stub.
+
+    python -m benchmarks.load_test --concurrency 1 8 32 --requests 200
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import duckdb
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(REPO_ROOT))
+sys.path.append(str(REPO_ROOT / "web"))
+
+from benchmarks.fakes import (  # noqa: E402
+    FakeGeminiModel,
+    FakeStreamingClient,
+    StubAirtableTable,
+)
+from benchmarks.synthetic_manual import generate_section_records  # noqa: E402
+from chat_log import ChatLogWriter  # noqa: E402
+from chat_pipeline import NO_CONTEXT_MESSAGE, ChatPipeline  # noqa: E402
+from chat_utils import (  # noqa: E402
+    MODEL_DOCUMENTS_TABLE,
+    SECTIONS_TABLE,
+    determine_relevant_section_for_help,
+    get_column_value,
+)
+from context_builder import build_context, fetch_sections_markdown  # noqa: E402
+from customer_profile import CustomerProfileService  # noqa: E402
+from stream_renderer import ThrottledStreamRenderer  # noqa: E402
+
+from helper.tracing import SPAN_METRIC, Histogram, metrics, span  # noqa: E402
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+MODEL_NAME = "gemini-2.0-flash-exp"
+
+# (question, weight), roughly the mix seen in the chat logs
+QUESTION_MIX = [
+    ("My dishwasher shows the E15 error, what does it mean?", 4),
+    ("How do I clean the filters?", 3),
+    ("The water does not drain, is the drain hose blocked?", 3),
+    ("How do I install the dishwasher?", 2),
+    ("How much salt and detergent should I use?", 2),
+    ("What does the warranty cover?", 1),
+    ("What is the weather like today?", 1),
+]
+
+
+@dataclass
+class LoadTestConfig:
+    requests: int = 100
+    customers: int = 500
+    models: int = 20
+    airtable_latency: float = 0.2
+    routing_latency: float = 0.8
+    first_token_latency: float = 0.5
+    chunk_latency: float = 0.05
+    chunks: int = 20
+    error_rate: float = 0.0
+    seed: int = 0
+
+
+class NullPlaceholder:
+    """Stands in for `st.empty()`, counting renders instead of sending them"""
+
+    def __init__(self):
+        self.renders = 0
+
+    def markdown(self, text: str) -> None:
+        self.renders += 1
+
+
+@dataclass
+class RequestResult:
+    latency: float
+    time_to_first_token: float | None
+    error: str | None = None
+    degraded: bool = False
+
+
+def create_stubs(config: LoadTestConfig, db_path: Path) -> tuple:
+    """Creates the Airtable stubs and the local sections database"""
+    model_numbers = [f"DIS{i:05d}" for i in range(config.models)]
+    accounts = [
+        {
+            "id": f"recAccount{i}",
+            "fields": {
+                "Email": f"customer{i}@example.com",
+                "Brand Name": ["BEKO"],
+                "Product Model Number": [model_numbers[i % config.models]],
+                "Product Category": ["recDishwasher"],
+            },
+        }
+        for i in range(config.customers)
+    ]
+    products = [{"id": "recDishwasher", "fields": {"Name": "Dishwasher"}}]
+
+    with duckdb.connect(str(db_path)) as conn:
+        conn.execute(f"CREATE OR REPLACE TABLE {SECTIONS_TABLE} (_airbyte_data JSON)")
+        conn.executemany(
+            f"INSERT INTO {SECTIONS_TABLE} VALUES (?)",
+            [
+                [json.dumps({**record, "model_number": None})]
+                for i, model_number in enumerate(model_numbers)
+                for record in generate_section_records(
+                    model_number=model_number, seed=i
+                )
+            ],
+        )
+        conn.execute(
+            f"CREATE OR REPLACE TABLE {MODEL_DOCUMENTS_TABLE} (_airbyte_data JSON)"
+        )
+        conn.executemany(
+            f"INSERT INTO {MODEL_DOCUMENTS_TABLE} VALUES (?)",
+            [
+                [
+                    json.dumps(
+                        {
+                            "brand": "BEKO",
+                            "model_number": model_number,
+                            "device": "Dishwasher",
+                            "document_hash": f"synthetic-{model_number}",
+                        }
+                    )
+                ]
+                for model_number in model_numbers
+            ],
+        )
+    return (
+        StubAirtableTable(accounts, latency=config.airtable_latency),
+        StubAirtableTable(products, latency=config.airtable_latency),
+    )
+
+
+def create_pipeline(config: LoadTestConfig, db_path: Path) -> ChatPipeline:
+    """Wires a `ChatPipeline` the way `chatbot` does, against the local stand-ins"""
+    accounts_table, products_table = create_stubs(config, db_path)
+    customer_profiles = CustomerProfileService(accounts_table, products_table)
+    conn = duckdb.connect(str(db_path), read_only=True)
+    gemini_model = FakeGeminiModel(latency=config.routing_latency)
+
+    return ChatPipeline(
+        lookup_account=customer_profiles.lookup_account,
+        lookup_product=customer_profiles.lookup_product,
+        fetch_table_of_contents=lambda brand, model_number: get_column_value(
+            conn.cursor(), "section_name", brand, model_number
+        ),
+        route_sections=lambda toc, question: determine_relevant_section_for_help(
+            gemini_model, toc, question, top_k=3
+        ),
+        fetch_sections=lambda names, brand, device, model_number: (
+            fetch_sections_markdown(conn.cursor(), names, brand, device, model_number)
+        ),
+        assemble_context=build_context,
+    )
+
+
+def stream_answer(client: FakeStreamingClient, prompt: str):
+    for response in client.models.generate_content_stream(
+        model=MODEL_NAME, contents=prompt
+    ):
+        for candidate in response.candidates:
+            for part in candidate.content.parts:
+                yield part.text
+
+
+def chat_request(
+    pipeline: ChatPipeline,
+    client: FakeStreamingClient,
+    chat_log_writer: ChatLogWriter,
+    email: str,
+    question: str,
+) -> RequestResult:
+    """One chat turn of a Streamlit session, as run by `chatbot.app`"""
+    start = time.perf_counter()
+    renderer = ThrottledStreamRenderer(NullPlaceholder())
+    try:
+        with span("resolve_customer"):
+            customer = asyncio.run(pipeline.resolve_customer(email))
+        with span("chat_request"):
+            chat_context = asyncio.run(pipeline.prepare(customer, question))
+            with span("gemini_stream"):
+                answer = renderer.render(
+                    stream_answer(client, chat_context.prompt), start_time=start
+                )
+        chat_log_writer.write(
+            {
+                "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "user_id": email,
+                "model_number": customer.model_number,
+                "product": customer.product,
+                "messages": [
+                    {"role": "user", "content": question},
+                    {"role": "assistant", "content": answer},
+                ],
+                "metadata": {
+                    "gemini_prompt": question,
+                    "model_name": MODEL_NAME,
+                    "gemini_response_time": renderer.total_time,
+                    "time_to_first_token": renderer.time_to_first_token,
+                },
+            }
+        )
+    except Exception as e:
+        return RequestResult(
+            time.perf_counter() - start, renderer.time_to_first_token, error=str(e)
+        )
+    return RequestResult(
+        time.perf_counter() - start,
+        renderer.time_to_first_token,
+        degraded=chat_context.context == NO_CONTEXT_MESSAGE,
+    )
+
+
+def run_level(
+    concurrency: int,
+    config: LoadTestConfig,
+    pipeline: ChatPipeline,
+    client: FakeStreamingClient,
+    chat_log_writer: ChatLogWriter,
+) -> dict:
+    """
+    Send `config.requests` chat requests from `concurrency` threads
+
+    Returns
+    -------
+    dict
+        The throughput, latency and time to first token percentiles, error
+        and degraded rates, and the percentiles of each pipeline stage
+    """
+    rng = random.Random(config.seed)
+    questions, weights = zip(*QUESTION_MIX)
+    workload = [
+        (
+            f"customer{rng.randrange(config.customers)}@example.com",
+            rng.choices(questions, weights)[0],
+        )
+        for _ in range(config.requests)
+    ]
+
+    metrics.reset()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency, thread_name_prefix="session") as sessions:
+        results = list(
+            sessions.map(
+                lambda work: chat_request(pipeline, client, chat_log_writer, *work),
+                workload,
+            )
+        )
+    elapsed = time.perf_counter() - start
+
+    latency, time_to_first_token = Histogram(), Histogram()
+    for result in results:
+        latency.observe(result.latency)
+        if result.time_to_first_token is not None:
+            time_to_first_token.observe(result.time_to_first_token)
+    errors = [result.error for result in results if result.error]
+    summary = metrics.summary()
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "elapsed": elapsed,
+        "throughput": len(results) / elapsed,
+        "latency": latency.summary(),
+        "time_to_first_token": time_to_first_token.summary(),
+        "error_rate": len(errors) / len(results),
+        "errors": sorted(set(errors)),
+        "degraded_rate": sum(result.degraded for result in results) / len(results),
+        "stages": {
+            entry["labels"]["span"]: {k: v for k, v in entry.items() if k != "labels"}
+            for entry in summary["histograms"].get(SPAN_METRIC, [])
+        },
+        "fallbacks": summary["counters"].get("chat_stage_fallbacks_total", []),
+    }
+
+
+def run(config: LoadTestConfig, levels: list[int], work_dir: Path) -> dict:
+    """Run the load test at every concurrency level"""
+    pipeline = create_pipeline(config, work_dir / "sections.duckdb")
+    client = FakeStreamingClient(
+        first_token_latency=config.first_token_latency,
+        chunk_latency=config.chunk_latency,
+        chunks=config.chunks,
+        error_rate=config.error_rate,
+        seed=config.seed,
+    )
+    chat_log_writer = ChatLogWriter(work_dir / "chat_logs.duckdb")
+    try:
+        results = [
+            run_level(concurrency, config, pipeline, client, chat_log_writer)
+            for concurrency in levels
+        ]
+    finally:
+        chat_log_writer.close()
+    return {
+        "metadata": {
+            "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "threads": threading.active_count(),
+            **asdict(config),
+        },
+        "levels": results,
+    }
+
+
+def main(argv: list[str] | None = None) -> dict:
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    arg_parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    defaults = LoadTestConfig()
+    for name, value in asdict(defaults).items():
+        arg_parser.add_argument(
+            f"--{name.replace('_', '-')}", type=type(value), default=value
+        )
+    arg_parser.add_argument("--output", type=Path, help="The JSON file to save to")
+    args = vars(arg_parser.parse_args(argv))
+    levels, output = args.pop("concurrency"), args.pop("output")
+    config = LoadTestConfig(**args)
+
+    logging.getLogger("AirbyteHackathon").setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        report = run(config, levels, Path(work_dir))
+
+    print(
+        f"{'concurrency':>11} {'req/s':>8} {'p50':>7} {'p95':>7} {'p99':>7} "
+        f"{'ttft p95':>8} {'errors':>7} {'degraded':>8}"
+    )
+    for level in report["levels"]:
+        latency = level["latency"]
+        print(
+            f"{level['concurrency']:>11} {level['throughput']:>8.2f} "
+            f"{latency['p50']:>7.2f} {latency['p95']:>7.2f} {latency['p99']:>7.2f} "
+            f"{level['time_to_first_token']['p95'] or 0:>8.2f} "
+            f"{level['error_rate']:>7.1%} {level['degraded_rate']:>8.1%}"
+        )
+
+    if output is None:
+        output = RESULTS_DIR / (
+            f"load_test_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"\nSaved results to {output}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,380 @@
+"""
+Offline benchmarks of the PDF parser and the chat queries
+
+Generates a synthetic manual, times the table of contents search, page
+rendering and markdown extraction of `PdfManualParser`, with every extraction
+profile, then loads the extracted sections into a local DuckDB file and times
+the section queries of the chatbot. Gemini is replaced by a deterministic fake, so no network or
+API key is needed. Results are saved as JSON, and compared with a previous
+result when `--baseline` is given.
+
+    python -m benchmarks.run_benchmarks --pages 120 --languages en de fr
+    python -m benchmarks.run_benchmarks --baseline benchmarks/results/<previous>.json
+"""
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import duckdb
+import pymupdf
+import pymupdf4llm
+from bs4 import BeautifulSoup
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(REPO_ROOT))
+sys.path.append(str(REPO_ROOT / "web"))
+
+from benchmarks.fakes import FakeGeminiModel  # noqa: E402
+from benchmarks.synthetic_manual import SECTION_NAMES, generate_manual  # noqa: E402
+from chat_utils import (  # noqa: E402
+    MODEL_DOCUMENTS_TABLE,
+    SECTIONS_TABLE,
+    determine_relevant_section_for_help,
+    get_column_value,
+    get_relevant_markdown_content,
+)
+from context_builder import build_context, fetch_sections_markdown  # noqa: E402
+from helper.utils import ExtractorOption  # noqa: E402
+from pdfprocessor.parser import PdfManualParser  # noqa: E402
+from pdfprocessor.profiles import DEFAULT_PROFILE, EXTRACTION_PROFILES  # noqa: E402
+from scraper.extraction import HTML_PARSER, SITE_SPECS, extract  # noqa: E402
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+BRAND, DEVICE, MODEL_NUMBER = "BEKO", "Dishwasher", "DIS15010"
+QUESTION = "Troubleshooting an E15 error, is cleaning the drain hose needed?"
+GUIDE_STEP = (
+    "<div class='step'><h3>Step {i}</h3><p>Remove the <b>screws</b> and "
+    "<a href='/Guide/Step/{i}'>the panel</a>.</p><img src='/img/{i}.jpg'/>"
+    "<ul><li>Note</li><li>Tip</li></ul></div>"
+)
+
+# Direction in which a metric improves, used to flag regressions
+HIGHER_IS_BETTER = ("pages_per_second", "queries_per_second")
+
+
+def timed(func, repeat: int = 5) -> dict:
+    """Run `func` `repeat` times and summarise the wall times in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {
+        "runs": repeat,
+        "mean": statistics.fmean(timings),
+        "min": min(timings),
+        "p50": statistics.median(timings),
+        "max": max(timings),
+    }
+
+
+def with_rate(timing: dict, unit: str, per_run: int) -> dict:
+    timing[unit] = per_run / timing["mean"] if timing["mean"] else None
+    return timing
+
+
+def benchmark_parser(parser: PdfManualParser, manual, repeat: int) -> dict:
+    document = parser.document
+    results = {}
+
+    results["toc_search"] = with_rate(
+        timed(
+            lambda: parser._get_pages_with_content(
+                "Contents", pages_to_search=len(document)
+            ),
+            repeat,
+        ),
+        "pages_per_second",
+        len(document),
+    )
+
+    render_pages = range(min(20, len(document)))
+    results["page_render"] = with_rate(
+        timed(lambda: [document[i].get_pixmap() for i in render_pages], repeat),
+        "pages_per_second",
+        len(render_pages),
+    )
+
+    sections = manual.sections_for(manual.languages[0])
+    section_pages = sum(end - start for start, end in sections.values())
+
+    def extract_sections(profile: str) -> list:
+        # pymupdf4llm prints a progress bar per call
+        with contextlib.redirect_stdout(io.StringIO()):
+            return [
+                parser.extract_section_content(name, *page_span, profile=profile)
+                for name, page_span in sections.items()
+            ]
+
+    for profile in EXTRACTION_PROFILES:
+        name = (
+            "markdown_extraction"
+            if profile == DEFAULT_PROFILE
+            else f"markdown_extraction_{profile}"
+        )
+        # Also a warm up, the header levels and boilerplate are found once
+        markdown_chars = sum(
+            len(record["markdown_text"])
+            for record in extract_sections(profile)
+            if record
+        )
+        results[name] = with_rate(
+            timed(lambda: extract_sections(profile), max(repeat // 2, 1)),
+            "pages_per_second",
+            section_pages,
+        )
+        results[name]["sections"] = len(sections)
+        results[name]["profile"] = profile
+        # The size of the output, a rough measure of the fidelity kept
+        results[name]["markdown_chars"] = markdown_chars
+    return results
+
+
+def benchmark_html_extraction(repeat: int, steps: int = 3000) -> dict:
+    """Time a full and a targeted parse of the table of contents of a guide page"""
+    page = (
+        "<html><body>"
+        + "".join(GUIDE_STEP.format(i=i) for i in range(steps))
+        + "<div class='toc'><a href='/Guide/1'>Replace the pump</a></div>"
+        + "</body></html>"
+    )
+    results = {
+        "html_full_parse": with_rate(
+            timed(
+                lambda: BeautifulSoup(page, "html.parser").find_all(
+                    "div", class_="toc"
+                ),
+                repeat,
+            ),
+            "pages_per_second",
+            1,
+        ),
+        "html_targeted_extraction": with_rate(
+            timed(lambda: extract(page, SITE_SPECS["ifixit"]["toc"]), repeat),
+            "pages_per_second",
+            1,
+        ),
+    }
+    results["html_targeted_extraction"]["parser"] = HTML_PARSER
+    return results
+
+
+def load_sections(db_path: Path, records: list[dict], models: int) -> None:
+    """Save the extracted sections, shared by `models` model numbers, to a DuckDB file"""
+    model_numbers = [MODEL_NUMBER] + [f"{MODEL_NUMBER}-{i}" for i in range(1, models)]
+    with duckdb.connect(str(db_path)) as conn:
+        conn.execute(f"CREATE OR REPLACE TABLE {SECTIONS_TABLE} (_airbyte_data JSON)")
+        conn.executemany(
+            f"INSERT INTO {SECTIONS_TABLE} VALUES (?)",
+            [[json.dumps({**record, "model_number": None})] for record in records],
+        )
+        conn.execute(
+            f"CREATE OR REPLACE TABLE {MODEL_DOCUMENTS_TABLE} (_airbyte_data JSON)"
+        )
+        conn.executemany(
+            f"INSERT INTO {MODEL_DOCUMENTS_TABLE} VALUES (?)",
+            [
+                [
+                    json.dumps(
+                        {
+                            "brand": BRAND,
+                            "model_number": model_number,
+                            "device": DEVICE,
+                            "document_hash": records[0]["document_hash"],
+                        }
+                    )
+                ]
+                for model_number in model_numbers
+            ],
+        )
+
+
+def benchmark_queries(db_path: Path, repeat: int) -> dict:
+    gemini_model = FakeGeminiModel()
+    results = {}
+    with duckdb.connect(str(db_path), read_only=True) as conn:
+        table_of_contents = get_column_value(
+            conn, "section_name", BRAND, MODEL_NUMBER, DEVICE
+        )
+        section_names = determine_relevant_section_for_help(
+            gemini_model, table_of_contents, QUESTION, top_k=3
+        )
+        sections = fetch_sections_markdown(
+            conn, section_names, BRAND, DEVICE, MODEL_NUMBER
+        )
+        query_repeat = repeat * 10
+
+        cases = {
+            "get_column_value": lambda: get_column_value(
+                conn, "section_name", BRAND, MODEL_NUMBER, DEVICE
+            ),
+            "get_relevant_markdown_content": lambda: get_relevant_markdown_content(
+                conn, section_names, BRAND, DEVICE, MODEL_NUMBER
+            ),
+            "fetch_sections_markdown": lambda: fetch_sections_markdown(
+                conn, section_names, BRAND, DEVICE, MODEL_NUMBER
+            ),
+            "section_routing": lambda: determine_relevant_section_for_help(
+                gemini_model, table_of_contents, QUESTION, top_k=3
+            ),
+            "build_context": lambda: build_context(QUESTION, sections),
+        }
+        for name, case in cases.items():
+            results[name] = with_rate(
+                timed(case, query_repeat), "queries_per_second", 1
+            )
+    results["section_routing"]["sections"] = section_names
+    return results
+
+
+def run(
+    pages: int,
+    languages: tuple[str, ...],
+    models: int,
+    repeat: int,
+    work_dir: Path,
+) -> dict:
+    """
+    Run every benchmark
+
+    Parameters
+    ----------
+    pages : int
+        The number of pages of the synthetic manual
+    languages : tuple[str, ...]
+        The languages of the synthetic manual
+    models : int
+        The number of model numbers whose sections are loaded into DuckDB
+    repeat : int
+        The number of timed runs of each benchmark
+    work_dir : Path
+        Where the manual and the DuckDB file are created
+
+    Returns
+    -------
+    dict
+        The metadata of the run and the results by benchmark
+    """
+    manual = generate_manual(
+        work_dir / "dataset" / "synthetic_manual.pdf", pages=pages, languages=languages
+    )
+    parser = PdfManualParser(
+        manual.path,
+        device=DEVICE,
+        brand=BRAND,
+        toc_mapping_method=ExtractorOption.GEMINI,
+        model_number=MODEL_NUMBER,
+        output_path=work_dir / "output",
+    )
+    try:
+        parser_results = benchmark_parser(parser, manual, repeat)
+        with contextlib.redirect_stdout(io.StringIO()):
+            records = [
+                parser.extract_section_content(name, *page_span)
+                for name, page_span in manual.sections_for(languages[0]).items()
+            ]
+    finally:
+        parser.document.close()
+
+    db_path = work_dir / "sections.duckdb"
+    load_sections(db_path, [record for record in records if record], models)
+    query_results = benchmark_queries(db_path, repeat)
+
+    return {
+        "metadata": {
+            "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "pymupdf": pymupdf.VersionBind,
+            "pymupdf4llm": getattr(pymupdf4llm, "__version__", None),
+            "machine": platform.machine(),
+            "pages": manual.page_count,
+            "languages": list(languages),
+            "sections": len(SECTION_NAMES),
+            "models": models,
+            "repeat": repeat,
+        },
+        "results": {
+            **parser_results,
+            **query_results,
+            **benchmark_html_extraction(repeat),
+        },
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: dict, baseline: dict) -> list[str]:
+    """Format the relative change of every throughput metric against a baseline"""
+    lines = []
+    for name, result in current["results"].items():
+        previous = baseline["results"].get(name, {})
+        for metric in HIGHER_IS_BETTER:
+            if result.get(metric) and previous.get(metric):
+                change = result[metric] / previous[metric] - 1
+                flag = "  REGRESSION" if change < -0.1 else ""
+                lines.append(
+                    f"{name:32} {metric:20} {previous[metric]:12.1f} -> "
+                    f"{result[metric]:12.1f} ({change:+.1%}){flag}"
+                )
+    return lines
+
+
+def main(argv: list[str] | None = None) -> dict:
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    arg_parser.add_argument("--pages", type=int, default=60)
+    arg_parser.add_argument("--languages", nargs="+", default=["en"])
+    arg_parser.add_argument("--models", type=int, default=50)
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    arg_parser.add_argument("--output", type=Path, help="The JSON file to save to")
+    arg_parser.add_argument("--baseline", type=Path, help="A previous result")
+    args = arg_parser.parse_args(argv)
+
+    logging.getLogger("AirbyteHackathon").setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        report = run(
+            args.pages, tuple(args.languages), args.models, args.repeat, Path(work_dir)
+        )
+
+    output = args.output or RESULTS_DIR / (
+        f"benchmark_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        f"_{report['metadata']['commit'] or 'unknown'}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+
+    for name, result in report["results"].items():
+        rate = result.get("pages_per_second") or result.get("queries_per_second")
+        print(f"{name:32} mean {result['mean'] * 1000:10.2f} ms  {rate:12.1f}/s")
+    if args.baseline:
+        print(f"\nCompared with {args.baseline}")
+        print("\n".join(compare(report, json.loads(args.baseline.read_text()))))
+    print(f"\nSaved results to {output}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+import random
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import pymupdf
+
+PAGE_WIDTH, PAGE_HEIGHT = pymupdf.paper_size("a4")
+MARGIN = 56
+
+SECTION_NAMES = [
+    "safety_instructions",
+    "installation",
+    "preparation",
+    "operating_the_product",
+    "cleaning_and_caring",
+    "troubleshooting",
+    "technical_data",
+    "warranty",
+]
+
+LANGUAGES = {
+    "en": {
+        "contents": "Contents",
+        "header": "User Manual",
+        "words": "the water filter door program temperature dishwasher clean "
+        "check reset power supply detergent rinse salt level drain hose".split(),
+    },
+    "de": {
+        "contents": "Inhalt",
+        "header": "Bedienungsanleitung",
+        "words": "der die das und wasser filter tür programm temperatur reinigen "
+        "prüfen strom spülmittel klarspüler salz ablauf schlauch".split(),
+    },
+    "fr": {
+        "contents": "Sommaire",
+        "header": "Manuel d'utilisation",
+        "words": "le la les et eau filtre porte programme température nettoyer "
+        "vérifier alimentation détergent rinçage sel vidange tuyau".split(),
+    },
+    "es": {
+        "contents": "Índice",
+        "header": "Manual de usuario",
+        "words": "el la los y agua filtro puerta programa temperatura limpiar "
+        "comprobar corriente detergente abrillantador sal desagüe manguera".split(),
+    },
+    "it": {
+        "contents": "Indice",
+        "header": "Manuale utente",
+        "words": "il la gli e acqua filtro porta programma temperatura pulire "
+        "controllare alimentazione detersivo brillantante sale scarico tubo".split(),
+    },
+}
+
+ERROR_CODES = [
+    ("E01", "Water does not drain", "Drain hose blocked", "Clean the drain hose"),
+    ("E02", "No water intake", "Tap closed", "Open the water tap"),
+    ("E09", "Heater fault", "Heating element failure", "Contact service"),
+    ("E15", "Water leak detected", "Leak in the base", "Turn off the tap"),
+    ("E24", "Drain pump blocked", "Foreign object in pump", "Clean the filters"),
+]
+
+
+@dataclass
+class SyntheticManual:
+    path: Path
+    page_count: int
+    languages: list[str]
+    # Section name -> [first page, last page + 1], 0-based, per language
+    sections: dict[str, dict[str, list[int]]] = field(default_factory=dict)
+    toc_pages: dict[str, int] = field(default_factory=dict)
+
+    def sections_for(self, language: str = "en") -> dict[str, list[int]]:
+        return {
+            name: spans[language]
+            for name, spans in self.sections.items()
+            if language in spans
+        }
+
+
+def _paragraph(rng: random.Random, words: list[str], sentences: int = 4) -> str:
+    return " ".join(
+        " ".join(rng.choices(words, k=rng.randint(8, 16))).capitalize() + "."
+        for _ in range(sentences)
+    )
+
+
+def _insert_error_code_table(page: pymupdf.Page, top: float) -> float:
+    """Draws a bordered error code table, returns the y it ends at"""
+    columns = [MARGIN, MARGIN + 50, MARGIN + 200, MARGIN + 340, PAGE_WIDTH - MARGIN]
+    row_height = 22
+    rows = [("Code", "Symptom", "Cause", "Remedy"), *ERROR_CODES]
+    for i, row in enumerate(rows):
+        y0 = top + i * row_height
+        for j, cell in enumerate(row):
+            rect = pymupdf.Rect(columns[j], y0, columns[j + 1], y0 + row_height)
+            page.draw_rect(rect, color=(0, 0, 0), width=0.5)
+            page.insert_textbox(rect + (3, 4, -3, 0), cell, fontsize=8)
+    return top + len(rows) * row_height
+
+
+def generate_manual(
+    path: str | Path,
+    pages: int = 60,
+    languages: tuple[str, ...] = ("en",),
+    brand: str = "BEKO",
+    model_number: str = "DIS15010",
+    seed: int = 0,
+) -> SyntheticManual:
+    """
+    Generate a synthetic user manual PDF
+
+    Each language gets an equal block of pages, starting with a localized
+    "contents" page followed by every section in `SECTION_NAMES`. Pages have
+    a running header, a legal notice and a page number footer, the
+    troubleshooting section has a bordered error code table and the document
+    has an outline.
+
+    Parameters
+    ----------
+    path : str | Path
+        Where to save the PDF
+    pages : int, optional
+        The approximate number of pages, by default 60
+    languages : tuple[str, ...], optional
+        The languages to include, keys of `LANGUAGES`, by default ("en",)
+    brand : str, optional
+        The brand printed in the running header, by default "BEKO"
+    model_number : str, optional
+        The model number printed in the running header, by default "DIS15010"
+    seed : int, optional
+        The seed of the generated text, by default 0
+
+    Returns
+    -------
+    SyntheticManual
+        The path and layout of the generated manual
+    """
+    rng = random.Random(seed)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    manual = SyntheticManual(path=path, page_count=0, languages=list(languages))
+
+    pages_per_language = max(pages // len(languages), len(SECTION_NAMES) + 1)
+    pages_per_section = max((pages_per_language - 1) // len(SECTION_NAMES), 1)
+
+    doc = pymupdf.open()
+    outline = []
+    for language in languages:
+        text = LANGUAGES[language]
+        toc_page_number = doc.page_count
+        manual.toc_pages[language] = toc_page_number
+        doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+
+        toc_lines = []
+        for section_name in SECTION_NAMES:
+            start = doc.page_count
+            manual.sections.setdefault(section_name, {})[language] = [
+                start,
+                start + pages_per_section,
+            ]
+            outline.append([1, f"{language}: {section_name}", start + 1])
+            toc_lines.append(
+                f"{section_name.replace('_', ' ').title()} .... {start + 1}"
+            )
+
+            for i in range(pages_per_section):
+                page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+                page.insert_text(
+                    (MARGIN, 30), f"{brand} {model_number} {text['header']}", fontsize=8
+                )
+                page.insert_text(
+                    (MARGIN, PAGE_HEIGHT - 70),
+                    f"© 2024 {brand}. {model_number} Rev. 3, subject to change.",
+                    fontsize=7,
+                )
+                page.insert_text(
+                    (PAGE_WIDTH / 2, PAGE_HEIGHT - 24), str(page.number + 1), fontsize=8
+                )
+                y = MARGIN
+                if i == 0:
+                    page.insert_text(
+                        (MARGIN, y + 10),
+                        section_name.replace("_", " ").title(),
+                        fontsize=16,
+                    )
+                    y += 30
+                if section_name == "troubleshooting" and i == 0:
+                    y = _insert_error_code_table(page, y) + 12
+                while y < PAGE_HEIGHT - 2 * MARGIN:
+                    rect = pymupdf.Rect(MARGIN, y, PAGE_WIDTH - MARGIN, y + 90)
+                    page.insert_textbox(
+                        rect, _paragraph(rng, text["words"]), fontsize=10
+                    )
+                    y += 100
+
+        # Page objects go stale as pages are added, so fetch it again
+        toc_page = doc[toc_page_number]
+        toc_page.insert_text((MARGIN, MARGIN), text["contents"], fontsize=18)
+        toc_page.insert_textbox(
+            pymupdf.Rect(
+                MARGIN, MARGIN + 20, PAGE_WIDTH - MARGIN, PAGE_HEIGHT - MARGIN
+            ),
+            "\n".join(toc_lines),
+            fontsize=11,
+        )
+        outline.insert(
+            len(outline) - len(SECTION_NAMES),
+            [1, f"{language}: {text['contents']}", toc_page_number + 1],
+        )
+
+    doc.set_toc(outline)
+    doc.save(path)
+    manual.page_count = doc.page_count
+    doc.close()
+    return manual
+
+
+def generate_section_records(
+    brand: str = "BEKO",
+    device: str = "Dishwasher",
+    model_number: str = "DIS15010",
+    paragraphs: int = 20,
+    language: str = "en",
+    seed: int = 0,
+) -> list[dict]:
+    """
+    Generate section records shaped like the output of `PdfManualParser`
+
+    Much faster than parsing a generated manual, for benchmarks that only
+    need the markdown in the warehouse.
+    """
+    rng = random.Random(seed)
+    words = LANGUAGES[language]["words"]
+    records = []
+    for section_name in SECTION_NAMES:
+        blocks = [f"## {section_name.replace('_', ' ').title()}"]
+        if section_name == "troubleshooting":
+            blocks.append(
+                "|Code|Symptom|Cause|Remedy|\n|---|---|---|---|\n"
+                + "\n".join(f"|{'|'.join(row)}|" for row in ERROR_CODES)
+            )
+        blocks += [_paragraph(rng, words) for _ in range(paragraphs)]
+        records.append(
+            {
+                "brand": brand,
+                "section_name": section_name,
+                "markdown_text": "\n\n".join(blocks),
+                "document_hash": f"synthetic-{model_number}",
+                "model_number": model_number,
+                "device": device,
+            }
+        )
+    return records
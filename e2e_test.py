@@ -10,6 +10,9 @@ load_dotenv()
 
 env_to_use = os.getenv("ENVIRONMENT", "LOCAL")
 envs = {"AWS": Environment.AWS, "LOCAL": Environment.LOCAL}
+parser_instrument = os.getenv("PARSER_INSTRUMENT", "false").lower() == "true"
+parser_profile_mode = os.getenv("PARSER_PROFILE_MODE") or None
+parser_extraction_profile = os.getenv("PARSER_EXTRACTION_PROFILE", "full")
 
 file_details = [
     (file, file.stem, file.parent.name)
@@ -23,6 +26,9 @@ for file_detail in file_details:
         device="Dishwasher",
         environment=envs[env_to_use],
         toc_mapping_method=ExtractorOption.GEMINI,
+        instrument=parser_instrument,
+        profile_mode=parser_profile_mode,
+        extraction_profile=parser_extraction_profile,
     )
 
     trblshoot_sections_map = pdf_parser.get_subject_of_interest_section_map(
@@ -33,6 +39,7 @@ for file_detail in file_details:
     pdf_parser.get_subject_of_interest_section_map(
         "device care instructions", "troubleshooting_page"
     )
-    pdf_parser.extract_all_sections_content()
+    with pdf_parser.instrumented_run():
+        pdf_parser.extract_all_sections_content()
     pdf_parser.cleanup()
     break
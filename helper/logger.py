@@ -1,33 +1,81 @@
+import atexit
 import datetime
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
+LOGGER_NAME = "AirbyteHackathon"
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
 
-class Logger:
+_setup_lock = threading.Lock()
+_listener: QueueListener | None = None
+
+
+def setup_logging(log_directory: str = ".logs", level: str | None = None):
     """
-    Logger class for saving and printing logs
+    Configure the process wide "AirbyteHackathon" logger once
+
+    Records are put on an in-memory queue by a `QueueHandler`, and a
+    `QueueListener` thread writes them to the rotating log file and the
+    console, so logging never blocks the calling thread on I/O. Calls after
+    the first return the already configured logger.
+
+    Parameters
+    ----------
+    log_directory : str, optional
+        The directory of the log files, by default ".logs"
+    level : str | None, optional
+        The log level, by default the LOG_LEVEL environment variable or INFO
+
+    Returns
+    -------
+    logging.Logger
+        The configured logger
     """
+    global _listener
+    logger = logging.getLogger(LOGGER_NAME)
+    with _setup_lock:
+        if _listener is not None:
+            return logger
 
-    def __init__(self, log_directory=".logs"):
         if not os.path.exists(log_directory):
             os.makedirs(log_directory)
         timestamp = datetime.datetime.now().strftime("%Y%m%d%H")
         log_filename = f"{log_directory}/log_{timestamp}.log"
-        self.logger = logging.getLogger("AirbyteHackathon")
-        self.logger.setLevel(logging.INFO)
+        formatter = logging.Formatter(LOG_FORMAT)
 
         file_handler = RotatingFileHandler(
             log_filename, maxBytes=1024 * 1024, backupCount=5
         )
-        log_fmt = "%(asctime)s - %(levelname)s - %(message)s"
-        formatter = logging.Formatter(log_fmt)
         file_handler.setFormatter(formatter)
-        self.logger.addHandler(file_handler)
-
         console_handler = logging.StreamHandler()
         console_handler.setFormatter(formatter)
-        self.logger.addHandler(console_handler)
+
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        _listener = QueueListener(
+            log_queue, file_handler, console_handler, respect_handler_level=True
+        )
+        _listener.start()
+        # Flush the queued records on shutdown
+        atexit.register(_listener.stop)
+
+        logger.addHandler(QueueHandler(log_queue))
+        logger.setLevel(level or os.getenv("LOG_LEVEL", "INFO").upper())
+    return logger
+
+
+class Logger:
+    """
+    Logger class for saving and printing logs
+
+    Every instance shares the logger configured by `setup_logging`, so
+    creating one per module no longer adds handlers.
+    """
+
+    def __init__(self, log_directory=".logs"):
+        self.logger = setup_logging(log_directory)
 
     def get_logger(self):
         return self.logger
@@ -0,0 +1,243 @@
+import dataclasses
+import datetime
+import functools
+import gzip
+import json
+import types
+import typing
+from dataclasses import dataclass, field
+from enum import Enum
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+# A dependency, the stdlib json module is only the fallback of platforms
+# without an orjson wheel
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+@dataclass(slots=True)
+class SectionRecord:
+    """A section of a manual as saved to S3 and synced to MotherDuck"""
+
+    brand: str
+    section_name: str
+    markdown_text: str
+    document_hash: str
+    model_number: str | None
+    device: str
+    languages: list[str] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class ErrorCodeRecord:
+    """A row of an error code table of a troubleshooting section"""
+
+    code: str
+    symptom: str
+    cause: str
+    remedy: str
+    page: int
+    section_name: str
+    document_hash: str
+    device: str
+
+
+@dataclass(slots=True)
+class ModelDocumentRecord:
+    """The record linking a brand and model number to a document"""
+
+    brand: str
+    model_number: str | None
+    device: str
+    document_hash: str
+    linked_at: str
+
+
+@dataclass(slots=True)
+class TocEntry:
+    """A section of a table of contents as extracted by Gemini"""
+
+    page_number: int
+    subsections: dict[str, int] = field(default_factory=dict)
+
+
+@dataclass(slots=True)
+class ChatLogRecord:
+    """A chat message exchange, saved by `ChatLogWriter`"""
+
+    user_id: str | None
+    model_number: str | None
+    product: str | None
+    messages: list[dict] = field(default_factory=list)
+    metadata: dict = field(default_factory=dict)
+    timestamp: str | datetime.datetime | None = None
+
+
+@functools.cache
+def _field_types(schema: type) -> dict[str, Any]:
+    return typing.get_type_hints(schema)
+
+
+def _matches(value: Any, annotation: Any) -> bool:
+    """Whether a value is of a type annotation, checking the items of lists and dicts"""
+    if annotation is Any:
+        return True
+    origin = typing.get_origin(annotation)
+    if origin in (types.UnionType, typing.Union):
+        return any(_matches(value, arg) for arg in typing.get_args(annotation))
+    if origin is None:
+        return isinstance(value, annotation)
+    if not isinstance(value, origin):
+        return False
+    args = typing.get_args(annotation)
+    if origin is list and args:
+        return all(_matches(item, args[0]) for item in value)
+    if origin is dict and args:
+        return all(
+            _matches(key, args[0]) and _matches(item, args[1])
+            for key, item in value.items()
+        )
+    return True
+
+
+def validate(record: dict | Any, schema: type) -> Any:
+    """
+    Build a record of a schema from a dict, checking its fields and their types
+
+    Parameters
+    ----------
+    record : dict | Any
+        The record, checked as is when it already is a `schema`
+    schema : type
+        One of the record dataclasses of this module
+
+    Returns
+    -------
+    Any
+        The `schema` instance
+
+    Raises
+    ------
+    ValueError
+        When the fields of the record are not those of the schema, or a
+        value is not of the type of its field
+    """
+    if not isinstance(record, schema):
+        try:
+            record = schema(**record)
+        except TypeError as e:
+            raise ValueError(f"Record does not match {schema.__name__}: {e}") from e
+    for name, annotation in _field_types(schema).items():
+        value = getattr(record, name)
+        if not _matches(value, annotation):
+            raise ValueError(
+                f"Record does not match {schema.__name__}: {name} is a "
+                f"{type(value).__name__}, expected {annotation}"
+            )
+    return record
+
+
+def _default(obj: Any, default: Callable[[Any], Any] | None = None) -> Any:
+    """The JSON value of the types the stdlib encoder does not handle"""
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if isinstance(obj, (datetime.datetime, datetime.date)):
+        return obj.isoformat()
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, Path):
+        return str(obj)
+    if default is not None:
+        return default(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _dumps(
+    obj: Any, indent: bool = False, default: Callable[[Any], Any] | None = None
+) -> bytes:
+    """Encode to JSON bytes, with orjson when it is installed"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, default=lambda o: _default(o, default), option=option)
+    return json.dumps(
+        obj,
+        indent=2 if indent else None,
+        separators=None if indent else (",", ":"),
+        ensure_ascii=False,
+        default=lambda o: _default(o, default),
+    ).encode("utf-8")
+
+
+def encode(
+    obj: Any,
+    schema: type | None = None,
+    compress: bool = False,
+    indent: bool = False,
+    default: Callable[[Any], Any] | None = None,
+) -> bytes:
+    """
+    Encode an object to compact JSON
+
+    Parameters
+    ----------
+    obj : Any
+        The object, dicts, lists and the record dataclasses of this module
+    schema : type | None, optional
+        The record dataclass `obj` is validated against, by default None
+    compress : bool, optional
+        Gzip the JSON, by default False
+    indent : bool, optional
+        Indent the JSON for reading, by default False
+    default : Callable[[Any], Any] | None, optional
+        Called with the objects that cannot be encoded, e.g. str, by default
+        they raise a TypeError
+
+    Returns
+    -------
+    bytes
+        The UTF-8 JSON
+    """
+    if schema is not None:
+        obj = validate(obj, schema)
+    data = _dumps(obj, indent=indent, default=default)
+    return gzip.compress(data, mtime=0) if compress else data
+
+
+def encode_lines(
+    records: Iterable[Any], schema: type | None = None, compress: bool = False
+) -> bytes:
+    """Encode records to JSON lines, see `encode`"""
+    data = b"\n".join(encode(record, schema=schema) for record in records)
+    return gzip.compress(data, mtime=0) if compress else data
+
+
+def encode_str(obj: Any, default: Callable[[Any], Any] | None = None) -> str:
+    """Encode an object to a compact JSON string, e.g. for a DuckDB column"""
+    return encode(obj, default=default).decode("utf-8")
+
+
+def decode(data: bytes | str, schema: type | None = None) -> Any:
+    """
+    Decode JSON, gzipped or not
+
+    Parameters
+    ----------
+    data : bytes | str
+        The JSON
+    schema : type | None, optional
+        The record dataclass to decode the object to, by default a dict
+
+    Returns
+    -------
+    Any
+        The decoded object
+    """
+    if isinstance(data, bytes) and data.startswith(GZIP_MAGIC):
+        data = gzip.decompress(data)
+    obj = orjson.loads(data) if orjson is not None else json.loads(data)
+    return validate(obj, schema) if schema is not None else obj
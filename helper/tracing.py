@@ -0,0 +1,467 @@
+import contextvars
+import cProfile
+import datetime
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from helper.logger import Logger
+from helper.serialization import encode
+
+logger_instance = Logger()
+logger = logger_instance.get_logger()
+
+SPAN_METRIC = "span_duration_seconds"
+QUANTILES = (0.5, 0.95, 0.99)
+
+_current_span: contextvars.ContextVar["Span | None"] = contextvars.ContextVar(
+    "current_span", default=None
+)
+_current_report: contextvars.ContextVar["RunReport | None"] = contextvars.ContextVar(
+    "current_report", default=None
+)
+
+
+class Histogram:
+    """
+    Keeps the most recent `max_samples` observations of a metric
+
+    The count and sum cover every observation, the quantiles only the
+    retained samples, which keeps memory bounded under constant load.
+    """
+
+    def __init__(self, max_samples: int = 10_000):
+        self.samples: deque = deque(maxlen=max_samples)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.samples.append(value)
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float | None:
+        return _quantile(sorted(self.samples), q)
+
+    def summary(self) -> dict:
+        ordered = sorted(self.samples)
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            **{f"p{round(q * 100)}": _quantile(ordered, q) for q in QUANTILES},
+        }
+
+
+def _quantile(ordered: list, q: float) -> float | None:
+    """Nearest-rank quantile of sorted samples"""
+    if not ordered:
+        return None
+    index = min(math.ceil(q * len(ordered)) - 1, len(ordered) - 1)
+    return ordered[max(index, 0)]
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(label_key: tuple, **extra) -> str:
+    pairs = [*label_key, *((k, str(v)) for k, v in extra.items())]
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class MetricsRegistry:
+    """In-process histograms and counters, exported as Prometheus text or JSON"""
+
+    def __init__(self, max_samples: int = 10_000):
+        self.max_samples = max_samples
+        self._histograms: dict[str, dict[tuple, Histogram]] = {}
+        self._counters: dict[str, dict[tuple, float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            key = _label_key(labels)
+            if key not in series:
+                series[key] = Histogram(self.max_samples)
+            series[key].observe(value)
+
+    def increment(self, name: str, value: float = 1, **labels) -> None:
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            key = _label_key(labels)
+            series[key] = series.get(key, 0) + value
+
+    def histogram(self, name: str, **labels) -> Histogram | None:
+        return self._histograms.get(name, {}).get(_label_key(labels))
+
+    def counter(self, name: str, **labels) -> float:
+        return self._counters.get(name, {}).get(_label_key(labels), 0)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def summary(self) -> dict:
+        """
+        Summarise all metrics
+
+        Returns
+        -------
+        dict
+            The histograms (count, sum, p50, p95, p99) and counters by name,
+            with one entry per label combination
+        """
+        with self._lock:
+            return {
+                "histograms": {
+                    name: [
+                        {"labels": dict(key), **histogram.summary()}
+                        for key, histogram in series.items()
+                    ]
+                    for name, series in self._histograms.items()
+                },
+                "counters": {
+                    name: [
+                        {"labels": dict(key), "value": value}
+                        for key, value in series.items()
+                    ]
+                    for name, series in self._counters.items()
+                },
+            }
+
+    def to_prometheus(self) -> str:
+        """Render the metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name, series in self._histograms.items():
+                lines.append(f"# TYPE {name} summary")
+                for key, histogram in series.items():
+                    for q in QUANTILES:
+                        value = histogram.quantile(q)
+                        if value is not None:
+                            lines.append(
+                                f"{name}{_format_labels(key, quantile=q)} {value}"
+                            )
+                    lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+            for name, series in self._counters.items():
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def dump_json(self, file_path: str | Path) -> None:
+        with open(file_path, "wb") as json_file:
+            json_file.write(encode(self.summary()))
+
+
+metrics = MetricsRegistry()
+
+
+class Span:
+    def __init__(self, name: str, parent: "Span | None" = None):
+        self.name = name
+        self.parent = parent
+        self.path = f"{parent.path}.{name}" if parent else name
+        self.attributes: dict = {}
+        self.children: list["Span"] = []
+        self.start = time.perf_counter()
+        self.duration: float | None = None
+
+    def set(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "duration": self.duration,
+            **({"attributes": self.attributes} if self.attributes else {}),
+            **(
+                {"children": [child.to_dict() for child in self.children]}
+                if self.children
+                else {}
+            ),
+        }
+
+
+@contextmanager
+def span(name: str, registry: MetricsRegistry | None = None):
+    """
+    Time a block of code as a span nested in the current span
+
+    The duration is recorded in the `span_duration_seconds` histogram under
+    the dotted path of the span, e.g. `chat_request.section_routing`. Spans
+    follow contextvars, so they nest across asyncio tasks and worker threads
+    started with a copy of the current context.
+
+    Parameters
+    ----------
+    name : str
+        The name of the span
+    registry : MetricsRegistry | None, optional
+        The registry to record to, by default the process wide `metrics`
+
+    Yields
+    ------
+    Span
+        The span, which can carry attributes such as token counts
+    """
+    parent = _current_span.get()
+    current = Span(name, parent)
+    if parent is not None:
+        parent.children.append(current)
+    token = _current_span.set(current)
+    try:
+        yield current
+    finally:
+        current.duration = time.perf_counter() - current.start
+        _current_span.reset(token)
+        (registry or metrics).observe(SPAN_METRIC, current.duration, span=current.path)
+        report = _current_report.get()
+        if report is not None:
+            report.add_stage(name, current.duration)
+
+
+def current_span() -> Span | None:
+    return _current_span.get()
+
+
+class RunReport:
+    """
+    Wall time per stage and counters of a single run, e.g. parsing one document
+    """
+
+    def __init__(self, name: str, **attributes):
+        self.name = name
+        self.attributes = attributes
+        self.started_at = datetime.datetime.now(datetime.timezone.utc)
+        self.stages: dict[str, dict] = {}
+        self.counters: dict[str, float] = {}
+        self.duration: float | None = None
+        self._lock = threading.Lock()
+
+    def add_stage(self, name: str, duration: float) -> None:
+        with self._lock:
+            stage = self.stages.setdefault(name, {"calls": 0, "seconds": 0.0})
+            stage["calls"] += 1
+            stage["seconds"] += duration
+
+    def record(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def record_max(self, name: str, value: float) -> None:
+        with self._lock:
+            self.counters[name] = max(self.counters.get(name, value), value)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            **self.attributes,
+            "started_at": self.started_at.isoformat(),
+            "duration": self.duration,
+            "stages": dict(
+                sorted(self.stages.items(), key=lambda item: -item[1]["seconds"])
+            ),
+            "counters": self.counters,
+        }
+
+
+@contextmanager
+def run_report(name: str, **attributes):
+    """
+    Collect the stages and counters recorded while the block runs
+
+    Parameters
+    ----------
+    name : str
+        The name of the run, e.g. the document being parsed
+    attributes : dict
+        Extra fields added to the report
+
+    Yields
+    ------
+    RunReport
+        The report, complete once the block exits
+    """
+    report = RunReport(name, **attributes)
+    token = _current_report.set(report)
+    start = time.perf_counter()
+    try:
+        yield report
+    finally:
+        report.duration = time.perf_counter() - start
+        _current_report.reset(token)
+
+
+def stage(name: str):
+    """
+    Time a stage of a run, a no-op unless a `run_report` is active
+
+    This keeps instrumentation of hot paths opt-in.
+    """
+    if _current_report.get() is None:
+        return nullcontext()
+    return span(name)
+
+
+def record(name: str, value: float = 1) -> None:
+    """Add to a counter of the active `run_report`, if any"""
+    report = _current_report.get()
+    if report is not None:
+        report.record(name, value)
+
+
+def record_max(name: str, value: float) -> None:
+    """Keep the highest value of a counter of the active `run_report`, e.g. a peak"""
+    report = _current_report.get()
+    if report is not None:
+        report.record_max(name, value)
+
+
+def resident_memory() -> int | None:
+    """The resident set size of the process in bytes, None if unknown"""
+    try:
+        with open("/proc/self/statm") as statm:
+            resident_pages = int(statm.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # Not Linux, the peak is the closest figure available
+        try:
+            import resource
+        except ImportError:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, bytes on macOS
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+@contextmanager
+def profile_capture(output_path: str | Path, mode: str = "cprofile"):
+    """
+    Profile the block with cProfile or, if installed, pyinstrument
+
+    Parameters
+    ----------
+    output_path : str | Path
+        The file to save the profile to, without an extension. cProfile
+        stats are saved as `.prof`, pyinstrument sessions as `.html`
+    mode : str, optional
+        Either "cprofile" or "pyinstrument", by default "cprofile"
+    """
+    output_path = Path(output_path)
+    if mode == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            logger.warning("pyinstrument is not installed, falling back to cProfile")
+            mode = "cprofile"
+
+    if mode == "pyinstrument":
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield profiler
+        finally:
+            profiler.stop()
+            output_path.with_suffix(".html").write_text(profiler.output_html())
+            logger.info("Saved profile to %s", output_path.with_suffix(".html"))
+    elif mode == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield profiler
+        finally:
+            profiler.disable()
+            profiler.dump_stats(output_path.with_suffix(".prof"))
+            logger.info("Saved profile to %s", output_path.with_suffix(".prof"))
+    else:
+        raise ValueError(f"Unsupported profile mode: {mode}")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry = metrics
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            body = self.registry.to_prometheus().encode("utf-8")
+            content_type = "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body = encode(self.registry.summary())
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_metrics_server(
+    port: int, host: str = "0.0.0.0", registry: MetricsRegistry | None = None
+) -> ThreadingHTTPServer:
+    """
+    Serve the metrics at `/metrics` (Prometheus) and `/metrics.json` in a daemon thread
+
+    Parameters
+    ----------
+    port : int
+        The port to listen on, 0 picks a free port
+    host : str, optional
+        The interface to listen on, by default all interfaces
+    registry : MetricsRegistry | None, optional
+        The registry to serve, by default the process wide `metrics`
+
+    Returns
+    -------
+    ThreadingHTTPServer
+        The running server
+    """
+    handler = type(
+        "MetricsHandler", (_MetricsHandler,), {"registry": registry or metrics}
+    )
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(
+        target=server.serve_forever, name="metrics-server", daemon=True
+    ).start()
+    logger.info("Serving metrics on port %s", server.server_port)
+    return server
+
+
+def start_json_dump(
+    file_path: str | Path, interval: float = 60, registry: MetricsRegistry | None = None
+) -> threading.Event:
+    """
+    Dump the metrics summary to a JSON file every `interval` seconds
+
+    Returns
+    -------
+    threading.Event
+        Set it to stop dumping
+    """
+    stop = threading.Event()
+
+    def _dump_loop():
+        while not stop.wait(interval):
+            try:
+                (registry or metrics).dump_json(file_path)
+            except OSError as e:
+                logger.error("Unable to dump metrics to %s: %s", file_path, e)
+
+    threading.Thread(target=_dump_loop, name="metrics-json-dump", daemon=True).start()
+    return stop
@@ -1,18 +1,18 @@
+import functools
 import hashlib
-import json
+import mmap
 import os
 import tempfile
 from enum import Enum
 from pathlib import Path
 from typing import BinaryIO, Optional
 
-import boto3
-import duckdb
 from botocore.exceptions import ClientError
 from dotenv import load_dotenv
-from pyairtable import Api
 
 from helper.logger import Logger
+from helper.serialization import encode
+from helper.tracing import record, stage
 
 load_dotenv()
 
@@ -85,12 +85,22 @@ def auto_create_dir(directory: str | Path) -> None:
     try:
         if not os.path.exists(directory):
             os.makedirs(directory)
-            logger.info(f"Created directory: {directory}")
+            logger.info("Created directory: %s", directory)
     except Exception as e:
         logger.error(f"Error creating directory: {e}")
         raise e
 
 
+def _md5_of_fileno(fileno: int) -> "hashlib._Hash":
+    """The MD5 of an open file, hashed from a memory map in one pass"""
+    file_hash = hashlib.md5(usedforsecurity=False)
+    # Empty files cannot be memory mapped
+    if os.fstat(fileno).st_size:
+        with mmap.mmap(fileno, 0, access=mmap.ACCESS_READ) as mapped:
+            file_hash.update(mapped)
+    return file_hash
+
+
 def get_hash_from_file(file_path: str) -> str:
     """
     Get the hash of a file
@@ -107,20 +117,51 @@ def get_hash_from_file(file_path: str) -> str:
     """
     try:
         with open(file_path, "rb") as f:
-            file_hash = hashlib.md5(usedforsecurity=False)
-            while chunk := f.read(8192):
-                file_hash.update(chunk)
-        return file_hash.hexdigest()
+            return _md5_of_fileno(f.fileno()).hexdigest()
     except Exception as e:
         logger.error(f"Error getting hash from file: {e}")
         raise e
 
 
+def get_hash_from_data(data: bytes | str | BinaryIO) -> str:
+    """
+    Get the MD5 hash of data saved to S3, the ETag of a single part upload
+
+    Parameters
+    ----------
+    data : bytes | str | BinaryIO
+        The data, files are hashed from their current position and rewound
+
+    Returns
+    -------
+    str
+        The hex digest of the data
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return hashlib.md5(data, usedforsecurity=False).hexdigest()
+
+    position = data.tell()
+    try:
+        fileno = data.fileno()
+    except (AttributeError, OSError):
+        fileno = None
+    if fileno is not None and position == 0:
+        digest = _md5_of_fileno(fileno).hexdigest()
+    else:
+        digest = hashlib.md5(data.read(), usedforsecurity=False).hexdigest()
+    data.seek(position)
+    return digest
+
+
 # Save the dictionary to a JSON file
-def save_dict_to_json(data, file_path):
+def save_dict_to_json(data, file_path, compress: bool = False):
     try:
-        with open(file_path, "w") as json_file:
-            json.dump(data, json_file, indent=4)
+        # Encoded first, so the file is left untouched when it fails
+        json_bytes = encode(data, compress=compress, indent=True)
+        with open(file_path, "wb") as json_file:
+            json_file.write(json_bytes)
         print(f"Data successfully saved to {file_path}")
     except Exception as e:
         print(f"Error saving data to JSON: {e}")
@@ -189,11 +230,32 @@ class ContentType(Enum):
     OCTET_STREAM = "application/octet-stream"
 
 
+# The user metadata holding the MD5 of the objects saved to S3, compared when
+# their ETag is not the MD5, e.g. for multipart uploads
+CONTENT_MD5_METADATA = "content-md5"
+
+
 class PageContentSearchType(Enum):
     CONSECUTIVE_PAGES = "consecutive_pages"
     EARLIEST_PAGE_FIRST = "earliest_page_first"
 
 
+@functools.lru_cache(maxsize=None)
+def _create_s3_client(
+    aws_access_key_id: str | None, aws_secret_access_key: str | None
+) -> "S3Client":
+    """Creates one S3 client per set of credentials, clients are thread safe"""
+    import boto3
+
+    if aws_access_key_id and aws_secret_access_key:
+        return boto3.client(
+            "s3",
+            aws_access_key_id=aws_access_key_id,
+            aws_secret_access_key=aws_secret_access_key,
+        )
+    return boto3.client("s3")
+
+
 def get_s3_client(bucket_name: str | None) -> Optional["S3Client"]:
     """Retrieves an S3 client.
 
@@ -212,15 +274,7 @@ def get_s3_client(bucket_name: str | None) -> Optional["S3Client"]:
         aws_access_key_id = os.getenv("AWS_ACCESS_KEY_ID")
         aws_secret_access_key = os.getenv("AWS_SECRET_ACCESS_KEY")
 
-        if aws_access_key_id and aws_secret_access_key:
-            s3_client = boto3.client(
-                "s3",
-                aws_access_key_id=aws_access_key_id,
-                aws_secret_access_key=aws_secret_access_key,
-            )
-        else:
-            s3_client = boto3.client("s3")
-        return s3_client
+        return _create_s3_client(aws_access_key_id, aws_secret_access_key)
     except ClientError as e:
         logger.error(f"AWS ClientError: {e}")
         return None
@@ -229,22 +283,65 @@ def get_s3_client(bucket_name: str | None) -> Optional["S3Client"]:
         return None
 
 
+def _get_stored_hashes(s3_client, bucket_name: str, object_key: str) -> set | None:
+    """
+    The MD5 hashes an object in S3 is known by
+
+    Parameters
+    ----------
+    s3_client : S3Client
+        The S3 client
+    bucket_name : str
+        The name of the S3 bucket
+    object_key : str
+        The key of the object
+
+    Returns
+    -------
+    set | None
+        The hash saved in the metadata of the object and its ETag, None when
+        the object does not exist
+    """
+    try:
+        with stage("s3_head"):
+            head = s3_client.head_object(Bucket=bucket_name, Key=object_key)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return None
+        raise
+    hashes = set()
+    if stored_hash := head.get("Metadata", {}).get(CONTENT_MD5_METADATA):
+        hashes.add(stored_hash)
+    # The ETag of a multipart upload is not the MD5 of the object
+    etag = head.get("ETag", "").strip('"')
+    if etag and "-" not in etag:
+        hashes.add(etag)
+    return hashes
+
+
 def save_file_to_s3(
     data: bytes | str | BinaryIO,
     object_key: str | Path,
     content_type: str | None = None,
     bucket_name: str | None = os.getenv("BUCKET_NAME"),
+    skip_unchanged: bool = True,
 ) -> bool:
     """Saves data to an S3 bucket.
 
+    Unless `skip_unchanged` is False, the MD5 of the data is compared with
+    the object already in S3, and identical data is not uploaded again. New
+    objects are created with a conditional PUT, so an object written by
+    another run in the meantime is compared again rather than overwritten.
+
     Parameters:
         data (bytes, str, or BinaryIO): The data to save. Can be bytes (for images, etc.), a string, or a file-like object.
         object_key (str): The key (filename/path) for the object in S3. Can include folders (e.g., "my_folder/my_file.json").
         content_type (str, optional): The content type to save as. If None, S3 will attempt to determine it automatically (less reliable).
         bucket_name (str, optional): The name of the S3 bucket. Defaults to the value of the `BUCKET_NAME` environment variable if not provided.
+        skip_unchanged (bool, optional): Skip the upload when the object in S3 has the same MD5. Defaults to True.
 
     Returns:
-        bool: True if the data was successfully saved, False otherwise.
+        bool: True if the data was successfully saved or was already saved, False otherwise.
     Raises:
         ValueError: If the bucket name is not provided or is empty.
     """
@@ -258,17 +355,59 @@ def save_file_to_s3(
             logger.error("Failed to create S3 client.")
             return False
 
+        object_key = str(object_key)
+        put_args = {"Bucket": bucket_name, "Key": object_key}
+        if content_type:
+            put_args["ContentType"] = content_type
+        position = data.tell() if hasattr(data, "seek") else None
+
         try:
-            if content_type:
-                s3_client.put_object(
-                    Bucket=bucket_name,
-                    Key=str(object_key),
-                    Body=data,
-                    ContentType=content_type,
-                )
-            else:
-                s3_client.put_object(Bucket=bucket_name, Key=str(object_key), Body=data)
-            logger.info(f"File saved to s3://{bucket_name}/{object_key}")
+            if skip_unchanged:
+                data_hash = get_hash_from_data(data)
+                put_args["Metadata"] = {CONTENT_MD5_METADATA: data_hash}
+                try:
+                    stored_hashes = _get_stored_hashes(
+                        s3_client, bucket_name, object_key
+                    )
+                except ClientError as e:
+                    # e.g. no permission to read the object, upload it anyway
+                    logger.warning(
+                        f"Unable to compare s3://{bucket_name}/{object_key}: {e}"
+                    )
+                    stored_hashes = set()
+                if stored_hashes is not None and data_hash in stored_hashes:
+                    record("s3_puts_skipped")
+                    logger.info(
+                        "Unchanged, not saved s3://%s/%s", bucket_name, object_key
+                    )
+                    return True
+                if stored_hashes is None:
+                    put_args["IfNoneMatch"] = "*"
+
+            try:
+                with stage("s3_put"):
+                    s3_client.put_object(Body=data, **put_args)
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") != "PreconditionFailed":
+                    raise
+                # Created by another run since it was compared
+                put_args.pop("IfNoneMatch")
+                if data_hash in (
+                    _get_stored_hashes(s3_client, bucket_name, object_key) or set()
+                ):
+                    record("s3_puts_skipped")
+                    logger.info(
+                        "Unchanged, not saved s3://%s/%s", bucket_name, object_key
+                    )
+                    return True
+                if position is not None:
+                    data.seek(position)
+                with stage("s3_put"):
+                    s3_client.put_object(Body=data, **put_args)
+            record("s3_puts")
+            if isinstance(data, (bytes, str)):
+                record("bytes_written", len(data))
+            logger.info("File saved to s3://%s/%s", bucket_name, object_key)
             return True
         except ClientError as e:
             logger.error(f"AWS ClientError: {e} bucket_name:{bucket_name}")
@@ -312,7 +451,8 @@ def get_object_from_s3(
             logger.info(
                 f"Object key {object_key}",
             )
-            s3_client.download_file(bucket_name, str(object_key), temp_file_path)
+            with stage("s3_get"):
+                s3_client.download_file(bucket_name, str(object_key), temp_file_path)
             logger.info(
                 f"File s3://{bucket_name}/{object_key} saved to {temp_file_path}"
             )
@@ -329,6 +469,14 @@ def get_object_from_s3(
         return None
 
 
+@functools.lru_cache(maxsize=None)
+def _get_airtable_api(api_key: str):
+    """Creates one Airtable client per API key, reusing its HTTP session"""
+    from pyairtable import Api
+
+    return Api(api_key)
+
+
 def get_airtable_table(
     table_id: str,
     base_id: str | None = None,
@@ -351,7 +499,7 @@ def get_airtable_table(
     if not base_id:
         base_id = os.environ["AIRTABLE_BASE_ID"]
     try:
-        api = Api(os.environ["AIRTABLE_API_KEY"])
+        api = _get_airtable_api(os.environ["AIRTABLE_API_KEY"])
         table = api.table(base_id, table_id)
     except Exception as e:
         print(e)
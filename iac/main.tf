@@ -80,6 +80,7 @@ resource "airbyte_source_s3" "source_s3" {
         }
         globs = [
           "output/brand=*/model_number=*/sections/*.json",
+          "output/document_hash=*/sections/*.json",
         ]
 
         input_schema = "{\"brand\": \"string\", \"section_name\": \"string\", \"markdown_text\": \"string\", \"document_hash\": \"string\", \"model_number\": \"string\", \"device\": \"string\"}"
@@ -88,6 +89,40 @@ resource "airbyte_source_s3" "source_s3" {
         schemaless        = false
 
       },
+      {
+        days_to_sync_if_history_is_full = 3
+        format = {
+          jsonl_format = {
+            double_as_string = true
+          }
+        }
+        globs = [
+          "output/model_documents/brand=*/model_number=*.json",
+        ]
+
+        input_schema = "{\"brand\": \"string\", \"model_number\": \"string\", \"device\": \"string\", \"document_hash\": \"string\", \"linked_at\": \"string\"}"
+        name         = "model_documents"
+        validation_policy = "Emit Record"
+        schemaless        = false
+
+      },
+      {
+        days_to_sync_if_history_is_full = 3
+        format = {
+          jsonl_format = {
+            double_as_string = true
+          }
+        }
+        globs = [
+          "output/document_hash=*/error_codes/*.jsonl",
+        ]
+
+        input_schema = "{\"code\": \"string\", \"symptom\": \"string\", \"cause\": \"string\", \"remedy\": \"string\", \"page\": \"integer\", \"section_name\": \"string\", \"document_hash\": \"string\", \"device\": \"string\"}"
+        name         = "error_codes"
+        validation_policy = "Emit Record"
+        schemaless        = false
+
+      },
     ]
   }
   name         = "airbyte_s3_src_${random_id.unique_id.hex}"
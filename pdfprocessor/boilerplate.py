@@ -0,0 +1,86 @@
+import re
+from collections import defaultdict
+
+import pymupdf
+
+# A block is boilerplate when it repeats on this fraction of the pages...
+MIN_REPEAT_FRACTION = 0.2
+# ...and on at least this many pages
+MIN_REPEAT_PAGES = 3
+# Only the top and bottom bands of the page are searched, so repeated
+# content of the body, e.g. a warning box, is kept
+MARGIN_BAND = 0.15
+# Positions are compared after rounding to this many points
+POSITION_TOLERANCE = 6
+
+DIGITS_PATTERN = re.compile(r"\d+")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def _block_key(text: str, rect: pymupdf.Rect, page_rect: pymupdf.Rect) -> tuple | None:
+    """The normalized text and rounded position of a block in a margin band"""
+    band = page_rect.height * MARGIN_BAND
+    if page_rect.y0 + band < rect.y0 and rect.y1 < page_rect.y1 - band:
+        return None
+    # Page numbers, dates and revisions differ between pages
+    normalized = WHITESPACE_PATTERN.sub(" ", DIGITS_PATTERN.sub("#", text)).strip()
+    if not normalized:
+        return None
+    position = tuple(
+        round(coordinate / POSITION_TOLERANCE) for coordinate in tuple(rect)
+    )
+    return normalized.lower(), position
+
+
+def find_boilerplate(
+    document: pymupdf.Document,
+    min_fraction: float = MIN_REPEAT_FRACTION,
+    min_pages: int = MIN_REPEAT_PAGES,
+) -> dict[int, list[pymupdf.Rect]]:
+    """
+    Find the running headers, footers and page numbers of a document
+
+    These are text blocks in the top or bottom band of the pages that repeat
+    at the same position on many pages, once digits are ignored.
+
+    Parameters
+    ----------
+    document : pymupdf.Document
+        The document
+    min_fraction : float, optional
+        The fraction of the pages a block repeats on, by default 0.2
+    min_pages : int, optional
+        The number of pages a block repeats on, by default 3
+
+    Returns
+    -------
+    dict[int, list[pymupdf.Rect]]
+        The rectangles of the boilerplate blocks of each page, by page number
+    """
+    occurrences: dict[tuple, dict[int, pymupdf.Rect]] = defaultdict(dict)
+    for page in document:
+        for x0, y0, x1, y1, text, _, block_type in page.get_text("blocks"):
+            if block_type != 0:
+                continue
+            rect = pymupdf.Rect(x0, y0, x1, y1)
+            key = _block_key(text, rect, page.rect)
+            if key is not None:
+                occurrences[key][page.number] = rect
+
+    threshold = max(min_pages, min_fraction * len(document))
+    boilerplate: dict[int, list[pymupdf.Rect]] = defaultdict(list)
+    for pages in occurrences.values():
+        if len(pages) >= threshold:
+            for page_number, rect in pages.items():
+                boilerplate[page_number].append(rect)
+    return dict(boilerplate)
+
+
+def remove_blocks(page: pymupdf.Page, rects: list[pymupdf.Rect]) -> None:
+    """Redact the text of the blocks from the page, keeping images and drawings"""
+    for rect in rects:
+        page.add_redact_annot(rect)
+    page.apply_redactions(
+        images=pymupdf.PDF_REDACT_IMAGE_NONE,
+        graphics=pymupdf.PDF_REDACT_LINE_ART_NONE,
+    )
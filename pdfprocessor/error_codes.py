@@ -0,0 +1,123 @@
+import re
+
+import pymupdf
+
+ERROR_CODE_FIELDS = ("code", "symptom", "cause", "remedy")
+
+# The headers of each field, compared after lowercasing
+HEADER_ALIASES = {
+    "code": {"code", "error", "error code", "fault code", "display", "error display"},
+    "symptom": {
+        "symptom",
+        "problem",
+        "fault",
+        "description",
+        "meaning",
+        "message",
+        "error message",
+    },
+    "cause": {"cause", "possible cause", "possible causes", "reason"},
+    "remedy": {"remedy", "solution", "action", "what to do", "fix"},
+}
+# The section names searched for error code tables
+TROUBLESHOOTING_PATTERN = re.compile(r"troubleshoot|error|fault|problem", re.I)
+# E15, F07 and 4E once normalized, or two or three letters like OE and IE
+CODE_PATTERN = re.compile(r"^(?:[A-Z]{0,3}\d{1,4}[A-Z]{0,2}|[A-Z]{2,3})$")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def is_troubleshooting_section(section_name: str) -> bool:
+    return bool(TROUBLESHOOTING_PATTERN.search(section_name))
+
+
+def normalize_code(text: str) -> str:
+    """The code as matched by lookups, e.g. "e-15 " -> "E15" """
+    return re.sub(r"[\s\-:.]", "", text).upper()
+
+
+def is_code(text: str) -> bool:
+    return bool(CODE_PATTERN.match(normalize_code(text)))
+
+
+def _clean(cell: str | None) -> str:
+    return WHITESPACE_PATTERN.sub(" ", cell or "").strip()
+
+
+def _column_fields(header: list[str]) -> dict[int, str]:
+    """The field of each column whose header is known"""
+    columns = {}
+    for i, name in enumerate(header):
+        name = _clean(name).lower().rstrip(":")
+        for field_name, aliases in HEADER_ALIASES.items():
+            if name in aliases and field_name not in columns.values():
+                columns[i] = field_name
+    return columns
+
+
+def extract_error_codes(page: pymupdf.Page) -> list[dict]:
+    """
+    Extract the rows of the error code tables of a page
+
+    Tables are found with `pymupdf.Page.find_tables`. A table holds error
+    codes when its header names a code column and another field, or when it
+    has no known header and most cells of its first column look like codes,
+    its columns are then taken as code, symptom, cause and remedy. Rows
+    without a code continue the cells of the row above.
+
+    Parameters
+    ----------
+    page : pymupdf.Page
+        The page
+
+    Returns
+    -------
+    list[dict]
+        The `ERROR_CODE_FIELDS` of each row, the code normalized, and the
+        page number
+    """
+    rows = []
+    for table in page.find_tables():
+        cells = table.extract()
+        header = [_clean(name) for name in table.header.names]
+        columns = _column_fields(header)
+        if "code" in columns and len(columns) > 1:
+            has_header_row = not table.header.external
+        else:
+            first_column = [_clean(row[0]) for row in cells if _clean(row[0])]
+            codes = [cell for cell in first_column if is_code(cell)]
+            if len(header) < 2 or len(codes) <= len(first_column) / 2:
+                continue
+            columns = dict(enumerate(ERROR_CODE_FIELDS[: len(header)]))
+            # An unknown header may be the first row of codes
+            has_header_row = not table.header.external and not is_code(header[0])
+        if has_header_row:
+            cells = cells[1:]
+
+        table_rows: list[dict] = []
+        for row in cells:
+            values = {
+                field_name: _clean(row[i])
+                for i, field_name in columns.items()
+                if i < len(row)
+            }
+            code = normalize_code(values.get("code", ""))
+            if not code and table_rows:
+                previous = table_rows[-1]
+                for field_name, value in values.items():
+                    if value and field_name != "code":
+                        previous[field_name] = f"{previous[field_name]} {value}".strip()
+                continue
+            if not is_code(code):
+                continue
+            table_rows.append(
+                {
+                    **{
+                        field_name: values.get(field_name, "")
+                        for field_name in ERROR_CODE_FIELDS
+                    },
+                    "code": code,
+                    "page": page.number,
+                }
+            )
+        rows += table_rows
+    return rows
@@ -0,0 +1,391 @@
+import datetime
+import multiprocessing
+import os
+import queue
+import sqlite3
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from dataclasses import dataclass, field
+from enum import Enum
+from pathlib import Path
+from typing import Callable
+
+from helper.logger import Logger
+from helper.serialization import decode, encode_str
+from helper.utils import Environment, ExtractorOption, auto_create_dir
+from pdfprocessor.registry import DEFAULT_STATE_DB, DocumentRegistry
+
+logger_instance = Logger()
+logger = logger_instance.get_logger()
+
+JOBS_TABLE = "ingestion_jobs"
+
+
+class JobStatus(Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+@dataclass
+class IngestionJob:
+    job_id: str
+    pdf_path: str
+    brand: str
+    model_number: str | None
+    device: str
+    options: dict = field(default_factory=dict)
+    status: JobStatus = JobStatus.QUEUED
+    stage: str | None = None
+    progress: float = 0.0
+    error: str | None = None
+    created_at: str | None = None
+    started_at: str | None = None
+    finished_at: str | None = None
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (JobStatus.SUCCEEDED, JobStatus.FAILED)
+
+
+def _now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+def parse_manual(job: IngestionJob, progress: Callable[[str, float], None]) -> None:
+    """
+    Parse an uploaded manual and save its sections, the default job runner
+
+    Parameters
+    ----------
+    job : IngestionJob
+        The job, its options hold the environment, instrumentation settings,
+        the state database of the document registry, the memory limit, the
+        languages to extract and the extraction profile
+    progress : Callable[[str, float], None]
+        Called with the current stage and the fraction of it that is done
+    """
+    from pdfprocessor.parser import DEFAULT_PROFILE, PdfManualParser
+
+    progress("opening_document", 0.0)
+    pdf_parser = PdfManualParser(
+        pdf_path=job.pdf_path,
+        model_number=job.model_number,
+        brand=job.brand,
+        device=job.device,
+        environment=Environment(job.options.get("environment", "local")),
+        toc_mapping_method=ExtractorOption.GEMINI,
+        instrument=job.options.get("instrument", False),
+        profile_mode=job.options.get("profile_mode"),
+        registry=DocumentRegistry(job.options.get("state_db", DEFAULT_STATE_DB)),
+        memory_limit_mb=job.options.get("memory_limit_mb"),
+        languages=job.options.get("languages"),
+        extraction_profile=job.options.get("extraction_profile", DEFAULT_PROFILE),
+    )
+    try:
+        pdf_parser.save_all_sections_content(progress)
+    finally:
+        pdf_parser.document.close()
+        pdf_parser.cleanup()
+
+
+class JobError(Exception):
+    pass
+
+
+def _run_job_worker(
+    run_job: Callable[[IngestionJob, Callable], None],
+    job: IngestionJob,
+    events: multiprocessing.Queue,
+) -> None:
+    """Runs a job in a worker process, reporting its progress on `events`"""
+    try:
+        run_job(job, lambda stage_name, fraction: events.put((stage_name, fraction)))
+    except Exception as e:
+        events.put(JobError(f"{type(e).__name__}: {e}"))
+
+
+def run_in_subprocess(
+    job: IngestionJob,
+    progress: Callable[[str, float], None],
+    run_job: Callable[[IngestionJob, Callable], None] = parse_manual,
+) -> None:
+    """
+    Run a job in its own process, the default job runner of `JobQueue`
+
+    PyMuPDF is not thread safe, so manuals cannot be parsed by several
+    threads of the app at once. A worker process also keeps a crash of
+    MuPDF from taking the app down with it.
+
+    Parameters
+    ----------
+    job : IngestionJob
+        The job
+    progress : Callable[[str, float], None]
+        Called with the current stage and the fraction of it that is done
+    run_job : Callable[[IngestionJob, Callable], None], optional
+        Runs the job in the worker process, by default `parse_manual`. It
+        must be importable by the worker, e.g. a module level function
+
+    Raises
+    ------
+    JobError
+        When the job raised an exception or the worker process died
+    """
+    context = multiprocessing.get_context("spawn")
+    events = context.Queue()
+    worker = context.Process(
+        target=_run_job_worker,
+        args=(run_job, job, events),
+        name=f"ingestion-job-{job.job_id}",
+        daemon=True,
+    )
+    worker.start()
+    try:
+        while True:
+            try:
+                event = events.get(timeout=0.5)
+            except queue.Empty:
+                if not worker.is_alive():
+                    break
+                continue
+            if isinstance(event, JobError):
+                raise event
+            progress(*event)
+    finally:
+        worker.join()
+        events.close()
+    if worker.exitcode:
+        raise JobError(f"The worker process exited with code {worker.exitcode}")
+
+
+class JobQueue:
+    """
+    Runs ingestion jobs in the background, at most `max_workers` at once,
+    each in its own worker process by default
+
+    Jobs are recorded in a SQLite table, so their status and progress can be
+    read by any Streamlit session, and survive a restart: jobs that were
+    still queued are resubmitted and jobs that were running are marked as
+    failed.
+    """
+
+    def __init__(
+        self,
+        db_path: str | Path = DEFAULT_STATE_DB,
+        max_workers: int = 2,
+        run_job: Callable[[IngestionJob, Callable], None] = run_in_subprocess,
+    ):
+        """
+        Parameters
+        ----------
+        db_path : str | Path, optional
+            The SQLite database of the jobs table, by default ".ingestion/state.sqlite"
+        max_workers : int, optional
+            The maximum number of jobs running at once, by default 2
+        run_job : Callable[[IngestionJob, Callable], None], optional
+            Runs a job, given the job and a progress callback, by default
+            `parse_manual` in a worker process, see `run_in_subprocess`
+        """
+        self.db_path = Path(db_path)
+        self.run_job = run_job
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="ingestion-job"
+        )
+        self._lock = threading.Lock()
+        auto_create_dir(self.db_path.parent)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {JOBS_TABLE} (
+                    job_id TEXT PRIMARY KEY,
+                    pdf_path TEXT NOT NULL,
+                    brand TEXT NOT NULL,
+                    model_number TEXT,
+                    device TEXT NOT NULL,
+                    options TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    stage TEXT,
+                    progress REAL NOT NULL DEFAULT 0,
+                    error TEXT,
+                    created_at TEXT NOT NULL,
+                    started_at TEXT,
+                    finished_at TEXT
+                )
+                """
+            )
+        self._recover()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _execute(self, query: str, parameters=()) -> list[sqlite3.Row]:
+        with closing(self._connect()) as conn, conn:
+            return conn.execute(query, parameters).fetchall()
+
+    def _update(self, job_id: str, **columns) -> None:
+        assignments = ", ".join(f"{column} = ?" for column in columns)
+        values = [
+            value.value if isinstance(value, JobStatus) else value
+            for value in columns.values()
+        ]
+        with self._lock:
+            self._execute(
+                f"UPDATE {JOBS_TABLE} SET {assignments} WHERE job_id = ?",
+                [*values, job_id],
+            )
+
+    def _recover(self) -> None:
+        """Fails the jobs interrupted by a restart and resubmits the queued ones"""
+        interrupted = [
+            self._to_job(row)
+            for row in self._execute(
+                f"SELECT * FROM {JOBS_TABLE} WHERE status = ?",
+                [JobStatus.RUNNING.value],
+            )
+        ]
+        self._execute(
+            f"""
+            UPDATE {JOBS_TABLE} SET status = ?, error = ?, finished_at = ?
+            WHERE status = ?
+            """,
+            [
+                JobStatus.FAILED.value,
+                "Interrupted by a restart",
+                _now(),
+                JobStatus.RUNNING.value,
+            ],
+        )
+        for job in interrupted:
+            logger.warning("Ingestion job %s was interrupted by a restart", job.job_id)
+            self._remove_pdf(job)
+        for row in self._execute(
+            f"SELECT job_id FROM {JOBS_TABLE} WHERE status = ? ORDER BY created_at",
+            [JobStatus.QUEUED.value],
+        ):
+            logger.info("Resubmitting queued ingestion job %s", row["job_id"])
+            self._executor.submit(self._run, row["job_id"])
+
+    def submit(
+        self,
+        pdf_path: str | Path,
+        brand: str,
+        model_number: str | None,
+        device: str,
+        **options,
+    ) -> str:
+        """
+        Queue a manual to be parsed and return immediately
+
+        Parameters
+        ----------
+        pdf_path : str | Path
+            The path to the PDF manual
+        brand : str
+            The brand of the device
+        model_number : str | None
+            The model number of the device
+        device : str
+            The device type, e.g. Dishwasher
+        options : dict
+            JSON serializable settings passed to the job runner, e.g.
+            environment, instrument, profile_mode, memory_limit_mb, languages,
+            extraction_profile and remove_pdf
+
+        Returns
+        -------
+        str
+            The ID of the job
+        """
+        job_id = uuid.uuid4().hex
+        self._execute(
+            f"""
+            INSERT INTO {JOBS_TABLE}
+            (job_id, pdf_path, brand, model_number, device, options, status, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            [
+                job_id,
+                str(pdf_path),
+                brand,
+                model_number,
+                device,
+                encode_str(options),
+                JobStatus.QUEUED.value,
+                _now(),
+            ],
+        )
+        self._executor.submit(self._run, job_id)
+        logger.info("Queued ingestion job %s for %s %s", job_id, brand, model_number)
+        return job_id
+
+    def get(self, job_id: str) -> IngestionJob | None:
+        rows = self._execute(f"SELECT * FROM {JOBS_TABLE} WHERE job_id = ?", [job_id])
+        return self._to_job(rows[0]) if rows else None
+
+    def list_jobs(self, limit: int = 20) -> list[IngestionJob]:
+        """The most recently created jobs first"""
+        rows = self._execute(
+            f"SELECT * FROM {JOBS_TABLE} ORDER BY created_at DESC LIMIT ?", [limit]
+        )
+        return [self._to_job(row) for row in rows]
+
+    @staticmethod
+    def _to_job(row: sqlite3.Row) -> IngestionJob:
+        values = dict(row)
+        values["options"] = decode(values["options"])
+        values["status"] = JobStatus(values["status"])
+        return IngestionJob(**values)
+
+    def _claim(self, job_id: str) -> bool:
+        """Marks a queued job as running, False if another worker got it first"""
+        with closing(self._connect()) as conn, conn:
+            cursor = conn.execute(
+                f"""
+                UPDATE {JOBS_TABLE} SET status = ?, started_at = ?
+                WHERE job_id = ? AND status = ?
+                """,
+                [JobStatus.RUNNING.value, _now(), job_id, JobStatus.QUEUED.value],
+            )
+            return cursor.rowcount == 1
+
+    def _run(self, job_id: str) -> None:
+        if not self._claim(job_id):
+            return
+        job = self.get(job_id)
+
+        def progress(stage_name: str, fraction: float) -> None:
+            self._update(job_id, stage=stage_name, progress=min(max(fraction, 0), 1))
+
+        try:
+            self.run_job(job, progress)
+            self._update(
+                job_id,
+                status=JobStatus.SUCCEEDED,
+                stage="done",
+                progress=1.0,
+                finished_at=_now(),
+            )
+            logger.info("Ingestion job %s succeeded", job_id)
+        except Exception as e:
+            logger.exception("Ingestion job %s failed: %s", job_id, e)
+            self._update(
+                job_id, status=JobStatus.FAILED, error=str(e), finished_at=_now()
+            )
+        finally:
+            self._remove_pdf(job)
+
+    @staticmethod
+    def _remove_pdf(job: IngestionJob) -> None:
+        """Deletes the uploaded PDF of a finished job submitted with remove_pdf"""
+        if job.options.get("remove_pdf") and os.path.exists(job.pdf_path):
+            os.remove(job.pdf_path)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
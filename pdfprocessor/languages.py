@@ -0,0 +1,137 @@
+import re
+from collections import Counter
+
+import pymupdf
+
+# Frequent short words of each language, distinct enough to tell them apart.
+# Single letters are left out, e.g. "a" is an article in English and Czech
+STOPWORDS = {
+    "en": "the and of to is in for with not be are this that you your on or it "
+    "do if as by from can".split(),
+    "de": "der die das und ist nicht mit für den dem des ein eine sie zu auf im "
+    "von wird oder wenn bei sich auch".split(),
+    "fr": "le la les et des est pas une pour dans du que qui sur avec ne vous au "
+    "ce ou par sont être".split(),
+    "es": "el la los las es del que una para con por no se en al su lo como más "
+    "este".split(),
+    "it": "il la gli è di che non per con una del della si da sono questo nel "
+    "alla".split(),
+    "nl": "de het een en van is niet met voor op dat die te zijn als bij of aan "
+    "wordt worden".split(),
+    "pt": "os as do da que não para com um uma em no na por se ao mais".split(),
+    "sv": "och att det är som en på för med inte av till den har ett om kan".split(),
+    "da": "og at det er som en på for med ikke af til den har et kan skal "
+    "efter".split(),
+    "nb": "og at det er som en på for med ikke av til den har et kan skal "
+    "etter".split(),
+    "fi": "ja on ei se että kun jos tai ovat sekä tämä mutta myös kanssa voi "
+    "tulee".split(),
+    "pl": "nie na się do że jest to jak od po lub przez dla są".split(),
+    "cs": "se na je že to do jako pro by nebo při jsou tak".split(),
+    "tr": "ve bir bu için ile da de değil olarak çok daha gibi veya ise her".split(),
+    "ru": "не на что по для как это или из от при его".split(),
+    "el": "και το να σε με για την της του τα είναι από που".split(),
+}
+
+# How the table of contents is titled in each language
+CONTENTS_KEYWORDS = {
+    "en": ["contents"],
+    "de": ["Inhalt"],
+    "fr": ["Sommaire", "Table des matières"],
+    "es": ["Índice", "Contenido"],
+    "it": ["Indice", "Sommario"],
+    "nl": ["Inhoud"],
+    "pt": ["Índice", "Conteúdo"],
+    "sv": ["Innehåll"],
+    "da": ["Indhold"],
+    "nb": ["Innhold"],
+    "fi": ["Sisällys"],
+    "pl": ["Spis treści"],
+    "cs": ["Obsah"],
+    "tr": ["İçindekiler"],
+    "ru": ["Содержание", "Оглавление"],
+    "el": ["Περιεχόμενα"],
+}
+
+# A page with fewer stopwords of its best language is left undetected
+MIN_STOPWORDS = 3
+
+WORD_PATTERN = re.compile(r"[^\W\d_]{2,}")
+_LANGUAGES_BY_WORD: dict[str, list[str]] = {}
+for _language, _words in STOPWORDS.items():
+    for _word in _words:
+        _LANGUAGES_BY_WORD.setdefault(_word, []).append(_language)
+
+
+def detect_language(text: str, min_stopwords: int = MIN_STOPWORDS) -> str | None:
+    """
+    Detect the language of a text from its stopwords
+
+    Parameters
+    ----------
+    text : str
+        The text, e.g. of a page
+    min_stopwords : int, optional
+        The stopwords the language needs in the text, by default 3
+
+    Returns
+    -------
+    str | None
+        The language code, a key of `STOPWORDS`, None when the text has too
+        few stopwords or two languages score the same
+    """
+    scores: Counter = Counter()
+    for word in WORD_PATTERN.findall(text.lower()):
+        scores.update(_LANGUAGES_BY_WORD.get(word, ()))
+    ranked = scores.most_common(2)
+    if not ranked or ranked[0][1] < min_stopwords:
+        return None
+    if len(ranked) > 1 and ranked[0][1] == ranked[1][1]:
+        return None
+    return ranked[0][0]
+
+
+def detect_page_languages(document: pymupdf.Document) -> list[str | None]:
+    """
+    Detect the language of every page of a document
+
+    Pages with too little text, e.g. covers, contents pages and figures,
+    take the language of the nearest detected page, the following one when
+    both are as near, as a language block starts with its cover and contents.
+
+    Parameters
+    ----------
+    document : pymupdf.Document
+        The document
+
+    Returns
+    -------
+    list[str | None]
+        The language of each page, in page order, None only when no page of
+        the document was detected
+    """
+    detected = [detect_language(page.get_text("text")) for page in document]
+    languages = list(detected)
+    for page_number, language in enumerate(detected):
+        if language is not None:
+            continue
+        for distance in range(1, len(detected)):
+            following = page_number + distance
+            preceding = page_number - distance
+            if following < len(detected) and detected[following]:
+                languages[page_number] = detected[following]
+                break
+            if preceding >= 0 and detected[preceding]:
+                languages[page_number] = detected[preceding]
+                break
+    return languages
+
+
+def contents_keywords(languages: list[str] | None) -> list[str]:
+    """The titles of the table of contents in the languages, English by default"""
+    keywords = []
+    for language in languages or ["en"]:
+        for keyword in CONTENTS_KEYWORDS.get(language, []):
+            if keyword not in keywords:
+                keywords.append(keyword)
+    return keywords
@@ -1,9 +1,16 @@
+import ctypes
+import dataclasses
+import datetime
+import functools
+import gc
 import json
+import logging
 import os
 import tempfile
+from contextlib import contextmanager, nullcontext
 from pathlib import Path
+from typing import Callable, Iterator
 
-import google.generativeai as genai
 import pymupdf
 import pymupdf4llm
 from pymupdf import Document
@@ -22,14 +29,60 @@ from helper.utils import (
     save_dict_to_json,
     save_file_to_s3,
 )
+from helper.serialization import (
+    ErrorCodeRecord,
+    ModelDocumentRecord,
+    SectionRecord,
+    TocEntry,
+    decode,
+    encode,
+    encode_lines,
+    validate,
+)
+from helper.tracing import (
+    profile_capture,
+    record,
+    record_max,
+    resident_memory,
+    run_report,
+    stage,
+)
+from pdfprocessor.boilerplate import find_boilerplate, remove_blocks
+from pdfprocessor.error_codes import extract_error_codes, is_troubleshooting_section
+from pdfprocessor.languages import contents_keywords, detect_page_languages
+from pdfprocessor.profiles import (
+    DEFAULT_PROFILE,
+    ExtractionProfile,
+    convert_pages,
+    get_profile,
+)
+from pdfprocessor.registry import DocumentRegistry
+from pdfprocessor.revisions import document_fingerprints, plan_revision
 
 # Initialize logger
 logger_instance = Logger()
 logger = logger_instance.get_logger()
 
+# Links every brand and model number to the document holding its sections
+MODEL_DOCUMENTS_DIR = Path("output") / "model_documents"
+# Pages converted at once when a memory limit is set
+MEMORY_LIMITED_CHUNK_PAGES = 20
+# The first pages of each target language searched for the table of contents
+TOC_SEARCH_PAGES = 5
+
+
+@functools.lru_cache(maxsize=None)
+def get_genai():
+    """
+    Import and configure the Gemini SDK on first use
+
+    The SDK is slow to import and needs GEMINI_API_KEY, so the parser stays
+    importable, and quick to import, in tools that never call the LLM.
+    """
+    import google.generativeai as genai
 
-# Configure GEMINI
-genai.configure(api_key=os.environ["GEMINI_API_KEY"])
+    genai.configure(api_key=os.environ["GEMINI_API_KEY"])
+    return genai
 
 
 # Create the model
@@ -51,20 +104,24 @@ def create_model(model_name: str = "gemini-2.0-flash-exp", **kwargs):
     """
     generation_config = kwargs
 
-    model = genai.GenerativeModel(
+    model = get_genai().GenerativeModel(
         model_name=model_name,
         generation_config=generation_config,
     )
     return model
 
 
-gemini_model_2_0_flash_exp = create_model(
-    temperature=1,
-    top_p=0.95,
-    top_k=40,
-    max_output_tokens=8192,
-    response_mime_type="application/json",
-)
+@functools.lru_cache(maxsize=None)
+def get_gemini_model():
+    """Creates the process wide Gemini model on first use"""
+    return create_model(
+        temperature=1,
+        top_p=0.95,
+        top_k=40,
+        max_output_tokens=8192,
+        response_mime_type="application/json",
+    )
+
 
 EXPECTED_TOC_OUTPUT = """
             {
@@ -93,7 +150,8 @@ def upload_to_gemini(path, mime_type=None):
     See https://ai.google.dev/gemini-api/docs/prompting_with_media
     """
     try:
-        file = genai.upload_file(path, mime_type=mime_type)
+        with stage("gemini_upload"):
+            file = get_genai().upload_file(path, mime_type=mime_type)
         logger.info(f"Uploaded file '{file.display_name}' as: {file.uri}")
         if file:
             return file
@@ -151,14 +209,19 @@ def extract_doc_map_using_gemini(
         uploaded_file = upload_to_gemini(file, mime_type=mime_type)
         parts = [uploaded_file, prompt.format(**kwargs)]
 
-        chat_session = gemini_model_2_0_flash_exp.start_chat(
+        chat_session = get_gemini_model().start_chat(
             history=[
                 {"role": "user", "parts": parts},
             ]
         )
-        response = chat_session.send_message("pathob\n")
+        with stage("gemini_generate"):
+            response = chat_session.send_message("pathob\n")
+        usage_metadata = getattr(response, "usage_metadata", None)
+        if usage_metadata:
+            record("llm_prompt_tokens", usage_metadata.prompt_token_count)
+            record("llm_candidates_tokens", usage_metadata.candidates_token_count)
         try:
-            json_response = json.loads(response.text)
+            json_response = decode(response.text)
             save_dict_to_json(
                 json_response, Path(file).parent / f"{dest_filename}.json"
             )
@@ -172,6 +235,57 @@ def extract_doc_map_using_gemini(
     return None
 
 
+def _trim_heap() -> None:
+    """Return the memory freed by Python and MuPDF to the OS, glibc only"""
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+def clean_toc_mapping(toc_mapping: dict) -> dict:
+    """
+    Keep the valid entries of a table of contents extracted by Gemini
+
+    Page numbers returned as strings, e.g. "12", are converted to integers.
+    An entry that still does not match `TocEntry` is logged and skipped,
+    instead of failing the whole table of contents.
+
+    Parameters
+    ----------
+    toc_mapping : dict
+        The sections with their page number and subsections
+
+    Returns
+    -------
+    dict
+        The valid sections, with integer page numbers
+    """
+    entries = {}
+    for section_name, entry in toc_mapping.items():
+        try:
+            subsections = entry.get("subsections") or {}
+            entries[section_name] = dataclasses.asdict(
+                validate(
+                    {
+                        **entry,
+                        "page_number": int(entry["page_number"]),
+                        "subsections": {
+                            name: int(page) for name, page in subsections.items()
+                        },
+                    },
+                    TocEntry,
+                )
+            )
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            logger.warning("Skipping table of contents entry %s: %s", section_name, e)
+    return entries
+
+
+def _ignore_progress(stage_name: str, fraction: float) -> None:
+    pass
+
+
 class ManualSection:
     def __init__(
         self,
@@ -263,8 +377,65 @@ class PdfManualParser:
         model_number: str | None,
         output_path: str | Path | None = None,
         environment: Environment = Environment.LOCAL,
+        instrument: bool = False,
+        profile_mode: str | None = None,
+        registry: DocumentRegistry | None = None,
+        memory_limit_mb: int | None = None,
+        strip_boilerplate: bool = True,
+        languages: list[str] | None = None,
+        extraction_profile: str | ExtractionProfile = DEFAULT_PROFILE,
     ):
+        """
+        Parameters
+        ----------
+        pdf_path : str
+            The path to the PDF manual
+        device : str
+            The device type, e.g. Dishwasher
+        brand : str
+            The brand of the device
+        toc_mapping_method : ExtractorOption
+            The method used to extract the table of contents
+        model_number : str | None
+            The model number of the device
+        output_path : str | Path | None, optional
+            Where to save the outputs, by default derived from the environment
+        environment : Environment, optional
+            The Environment, local or AWS, default is Local
+        instrument : bool, optional
+            Record a run report of stage timings and counters, by default False
+        profile_mode : str | None, optional
+            Also profile the run with "cprofile" or "pyinstrument", by default None
+        registry : DocumentRegistry | None, optional
+            The registry of processed documents, when given a manual that was
+            already parsed reuses its sections instead of being parsed again
+        memory_limit_mb : int | None, optional
+            The peak resident memory of the process while extracting sections,
+            sections are then converted in chunks of pages and the document
+            is reopened to release its caches when over it, by default None
+        strip_boilerplate : bool, optional
+            Remove the running headers, footers and page numbers repeated
+            across pages before converting to markdown, by default True
+        languages : list[str] | None, optional
+            The languages to extract, e.g. ["en"], the table of contents is
+            searched with their keywords and pages detected in other
+            languages are skipped, by default every page in English
+        extraction_profile : str | ExtractionProfile, optional
+            The features of the markdown conversion that run, "fast_text",
+            "balanced" or "full", see `pdfprocessor.profiles`, by default "full"
+        """
         self.pdf_path = Path(pdf_path)
+        self.instrument = instrument
+        self.profile_mode = profile_mode
+        self.registry = registry
+        self.memory_limit = memory_limit_mb * 2**20 if memory_limit_mb else None
+        self.strip_boilerplate = strip_boilerplate
+        self._boilerplate: dict[int, list[pymupdf.Rect]] | None = None
+        self._stripped_pages: set[int] = set()
+        self.languages = languages
+        self._page_languages: list[str | None] | None = None
+        self.extraction_profile = get_profile(extraction_profile)
+        self._hdr_info: pymupdf4llm.IdentifyHeaders | None = None
         self.filename = self.pdf_path.stem
         self.toc_mapping_method = toc_mapping_method
         self.environment = environment
@@ -272,7 +443,7 @@ class PdfManualParser:
         self.document_hash = get_hash_from_file(pdf_path)
         self.device = device
         self.model_number = model_number
-        logger.info(Path(self.pdf_path).parts)
+        logger.debug("PDF path parts: %s", self.pdf_path.parts)
         self.root_data_dir = Path(self.pdf_path).parts[0]
         self.brand = brand
 
@@ -291,6 +462,8 @@ class PdfManualParser:
                 / f"brand={self.brand}"
                 / f"model_number={self.model_number}"
             )
+            # The sections are saved once per document, whatever the model
+            self.document_dir = Path("output") / f"document_hash={self.document_hash}"
 
             self.output_path = self.root_dir / self.relative_dir
 
@@ -304,7 +477,65 @@ class PdfManualParser:
                 f"Output path: {self.output_path}, root_dir: {self.root_dir}, Environment {environment}"
             )
 
-    def _extract_to_markdown(self, document: Document) -> str:
+    @contextmanager
+    def instrumented_run(self):
+        """
+        Record a run report, and optionally a profile, of the enclosed work
+
+        Does nothing unless the parser was created with `instrument` or
+        `profile_mode`. The report is saved as JSON next to the document map.
+
+        Yields
+        ------
+        RunReport | None
+            The report of the run, None when instrumentation is off
+        """
+        if not (self.instrument or self.profile_mode):
+            yield None
+            return
+
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        report_name = f"run_report_{timestamp}"
+        profiler = (
+            profile_capture(
+                self.output_path / self.document_mapping_path / f"profile_{timestamp}",
+                self.profile_mode,
+            )
+            if self.profile_mode
+            else nullcontext()
+        )
+        report = None
+        try:
+            with profiler, run_report(
+                self.filename,
+                document_hash=self.document_hash,
+                brand=self.brand,
+                model_number=self.model_number,
+                device=self.device,
+                page_count=len(self.document),
+            ) as report:
+                yield report
+        finally:
+            if report is not None:
+                self._save_run_report(report, report_name)
+
+    def _save_run_report(self, report, report_name: str) -> None:
+        report_dict = report.to_dict()
+        logger.info("Run report: %s", report_dict)
+        if self.environment == Environment.AWS:
+            save_file_to_s3(
+                encode(report_dict),
+                self.relative_dir / "reports" / f"{report_name}.json",
+            )
+        else:
+            save_dict_to_json(
+                report_dict,
+                self.output_path / self.document_mapping_path / f"{report_name}.json",
+            )
+
+    def _extract_to_markdown(
+        self, document: Document, profile: str | ExtractionProfile | None = None
+    ) -> str:
         """
         Extract a Document to Markdown
 
@@ -312,8 +543,28 @@ class PdfManualParser:
         ----------
         document : Document
             The Document to extract to Markdown
+        profile : str | ExtractionProfile | None, optional
+            The extraction profile, by default the one of the parser
+        """
+        md_text = convert_pages(
+            document,
+            list(range(len(document))),
+            get_profile(profile or self.extraction_profile),
+        )
+        record("pages_processed", len(document))
+        return md_text
+
+    def _header_info(self) -> pymupdf4llm.IdentifyHeaders:
+        """
+        The header levels of the font sizes, computed once for the document
+
+        pymupdf4llm otherwise scans every page of the document again for
+        each section converted.
         """
-        return pymupdf4llm.to_markdown(document)
+        if self._hdr_info is None:
+            with stage("identify_headers"):
+                self._hdr_info = pymupdf4llm.IdentifyHeaders(self.document)
+        return self._hdr_info
 
     def extract_all_subsections(self, section_mapping: dict) -> dict:
         """
@@ -341,6 +592,49 @@ class PdfManualParser:
                 result[key] = [value, value + 1]
         return result
 
+    def page_languages(self) -> list[str | None]:
+        """
+        The language of every page, detected once for the document
+
+        See `pdfprocessor.languages.detect_page_languages`.
+        """
+        if self._page_languages is None:
+            with stage("language_detection"):
+                self._page_languages = detect_page_languages(self.document)
+            logger.info(
+                "Detected the languages %s in %s",
+                sorted(set(self._page_languages) - {None}),
+                self.pdf_path,
+            )
+        return self._page_languages
+
+    def _target_pages(self, page_nums: range) -> list[int]:
+        """The pages in the target languages, every page when none are set"""
+        if not self.languages:
+            return list(page_nums)
+        page_languages = self.page_languages()
+        return [
+            page_number
+            for page_number in page_nums
+            # None when no page of the document was detected
+            if page_languages[page_number] in (*self.languages, None)
+        ]
+
+    def _toc_search_pages(self) -> int | list[int]:
+        """The first pages of each target language, or of the document"""
+        if not self.languages:
+            return TOC_SEARCH_PAGES
+        page_languages = self.page_languages()
+        pages = []
+        for language in self.languages:
+            language_pages = [
+                page_number
+                for page_number, page_language in enumerate(page_languages)
+                if page_language == language
+            ]
+            pages += language_pages[:TOC_SEARCH_PAGES]
+        return sorted(pages) or TOC_SEARCH_PAGES
+
     def _get_consecutive_pages(self, page_matches):
         pg_no_matches = []
         previous_page = None
@@ -357,7 +651,7 @@ class PdfManualParser:
 
     def _get_pages_with_content(
         self,
-        search_content: str,
+        search_content: str | list[str],
         pages_to_search: int | list = 5,
         search_method: PageContentSearchType = PageContentSearchType.CONSECUTIVE_PAGES,
     ) -> list[pymupdf.Page] | None:
@@ -366,8 +660,8 @@ class PdfManualParser:
 
         Parameters
         ----------
-        search_content : str
-            The content to search for in the pages
+        search_content : str | list[str]
+            The content to search for in the pages, any of them when a list
         pages_to_search : int | list, optional
             The maximum page(s) to search in the PDF, by default 5
         search_method : str, optional
@@ -385,12 +679,30 @@ class PdfManualParser:
                     "Pages to search exceeds the number of pages in the document, so searching all pages"
                 )
                 pages_search_list = range(len(self.document))
+        else:
+            pages_search_list = pages_to_search
+        search_terms = (
+            [search_content] if isinstance(search_content, str) else search_content
+        )
 
-        page_matches = {
-            i: self.document[i].search_for(search_content) for i in pages_search_list
-        }
-
-        logger.info(page_matches)
+        with stage("toc_search"):
+            page_matches = {
+                i: [
+                    match
+                    for term in search_terms
+                    for match in self.document[i].search_for(term)
+                ]
+                for i in pages_search_list
+            }
+        record("pages_searched", len(page_matches))
+
+        # Only summarise the matches of every page when debugging
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "Matches of `%s` by page: %s",
+                search_content,
+                {page: len(matches) for page, matches in page_matches.items()},
+            )
 
         pg_no_matches: list = []
         if search_method == PageContentSearchType.EARLIEST_PAGE_FIRST:
@@ -405,11 +717,13 @@ class PdfManualParser:
 
         if pg_no_matches:
             logger.info(
-                f"I searched and found `{search_content}` most likely on page {pg_no_matches}"
+                "I searched and found `%s` most likely on page %s",
+                search_content,
+                pg_no_matches,
             )
             pages = [self.document[page_no] for page_no in pg_no_matches]
             return pages
-        logger.error(f"Could not find {search_content} in the Document")
+        logger.error("Could not find %s in the Document", search_content)
         return None
 
     def save_search_content_to_img(
@@ -420,8 +734,8 @@ class PdfManualParser:
 
         Parameters
         ----------
-        search_content : str
-            The content to search for in the pages
+        search_content : str | list[str]
+            The content to search for in the pages, any of them when a list
         pages_to_search : int, list, optional
             The maximum page(s) to search in the PDF, by default 5
         """
@@ -433,7 +747,9 @@ class PdfManualParser:
             filepath = Path(filepath)
             if self.matched_pages:
                 for matched_page in self.matched_pages:
-                    pix = matched_page.get_pixmap()
+                    with stage("render_page"):
+                        pix = matched_page.get_pixmap()
+                    record("pages_rendered")
 
                     if self.environment == Environment.AWS:
                         save_to_path = f"{self.relative_dir}/{filepath.name}_{matched_page.number}.png"
@@ -462,7 +778,8 @@ class PdfManualParser:
                     base_path = self.output_path / self.document_mapping_path
                 pages_uris = self.save_search_content_to_img(
                     base_path / "toc_map",
-                    search_content="contents",
+                    search_content=contents_keywords(self.languages),
+                    pages_to_search=self._toc_search_pages(),
                 )
                 toc_mappings = {}
                 for _, uri in pages_uris:
@@ -480,9 +797,9 @@ class PdfManualParser:
                     if toc_mapping:
                         toc_mappings.update(toc_mapping)
 
+                toc_mappings = clean_toc_mapping(toc_mappings)
                 if toc_mappings:
-                    toc_json_string = json.dumps(toc_mappings)
-                    toc_json_bytes = toc_json_string.encode("utf-8")
+                    toc_json_bytes = encode(toc_mappings)
                     save_dict_to_json(
                         toc_mappings,
                         self.output_path
@@ -522,13 +839,10 @@ class PdfManualParser:
                         / "simplified_toc_mapping.json",
                     )
                     if self.environment == Environment.AWS:
-                        # Convert the dictionary to a JSON string
-                        json_string = json.dumps(simplified_toc_map)
-                        json_bytes = json_string.encode("utf-8")
                         logger.info("Saving Simplified Table of contents to S3")
 
                         save_file_to_s3(
-                            json_bytes,
+                            encode(simplified_toc_map),
                             self.relative_dir
                             / self.document_mapping_path
                             / "simplified_toc_mapping.json",
@@ -576,7 +890,11 @@ class PdfManualParser:
         return None
 
     def extract_section_content(
-        self, section_name: str, page_start: int, page_end: int | None
+        self,
+        section_name: str,
+        page_start: int,
+        page_end: int | None,
+        profile: str | ExtractionProfile | None = None,
     ) -> dict | None:
         """
         Extracts a section given the page numbers and the section name
@@ -589,17 +907,54 @@ class PdfManualParser:
             The starting page of the section
         page_end : int | None
             The ending page of the section
+        profile : str | ExtractionProfile | None, optional
+            The extraction profile, by default the one of the parser
 
         Returns
         -------
         dict | None
-            A dictionary with the section name and the markdown content of the section, else None
+            A dictionary with the section name and the markdown content of the section,
+            and the error code table rows of troubleshooting sections, else None
         """
         if not page_end:
             page_end = len(self.document) - 1
-        page_nums = range(page_start, page_end)
+        profile = get_profile(profile or self.extraction_profile)
+        page_nums = self._target_pages(range(page_start, page_end))
+        skipped_pages = page_end - page_start - len(page_nums)
+        if skipped_pages:
+            record("pages_skipped_language", skipped_pages)
+        if not page_nums:
+            logger.info(
+                "Skipping %s, none of its pages are in %s", section_name, self.languages
+            )
+            return None
+        page_chunks = [page_nums]
+        if self.memory_limit and len(page_nums) > MEMORY_LIMITED_CHUNK_PAGES:
+            page_chunks = [
+                page_nums[i : i + MEMORY_LIMITED_CHUNK_PAGES]
+                for i in range(0, len(page_nums), MEMORY_LIMITED_CHUNK_PAGES)
+            ]
         try:
-            md_text = pymupdf4llm.to_markdown(self.document, pages=[*page_nums])
+            md_chunks, error_codes = [], []
+            for i, chunk in enumerate(page_chunks):
+                if i:
+                    self.release_memory()
+                if is_troubleshooting_section(section_name):
+                    with stage("error_code_tables"):
+                        for page_number in chunk:
+                            error_codes += extract_error_codes(
+                                self.document[page_number]
+                            )
+                self.remove_boilerplate(chunk)
+                md_chunks.append(
+                    convert_pages(
+                        self.document, list(chunk), profile, self._header_info()
+                    )
+                )
+            md_text = "".join(md_chunks)
+            record("pages_processed", len(page_nums))
+            record("sections_extracted")
+            record("error_codes_extracted", len(error_codes))
             result = {
                 "brand": self.brand,
                 "section_name": section_name,
@@ -607,36 +962,343 @@ class PdfManualParser:
                 "document_hash": self.document_hash,
                 "model_number": self.model_number,
                 "device": self.device,
+                "languages": self._section_languages(page_nums),
+                "error_codes": error_codes,
             }
             logger.info(
-                f"Successfully extracted Markdown for {section_name}, {page_start} -> {page_end}"
+                "Successfully extracted Markdown for %s, %s -> %s",
+                section_name,
+                page_start,
+                page_end,
             )
             return result
+        except MemoryError:
+            raise
         except Exception as markdownexception:
-            logger.error(f"Error getting Markdown for Document {markdownexception}")
+            logger.error("Error getting Markdown for Document %s", markdownexception)
         return None
 
-    def extract_all_sections_content(self) -> list:
-        results = []
+    def _section_languages(self, page_nums: list[int]) -> list[str]:
+        """The languages of the pages, empty when they were not detected"""
+        if self._page_languages is None:
+            return []
+        return sorted(
+            {self._page_languages[page_number] for page_number in page_nums} - {None}
+        )
+
+    def remove_boilerplate(self, page_nums: range | list[int]) -> None:
+        """
+        Remove the boilerplate blocks of the pages before they are converted
+
+        The blocks are found once for the whole document, see
+        `pdfprocessor.boilerplate.find_boilerplate`.
+
+        Parameters
+        ----------
+        page_nums : range | list[int]
+            The pages about to be converted to markdown
+        """
+        if not self.strip_boilerplate:
+            return
+        if self._boilerplate is None:
+            with stage("boilerplate_detection"):
+                self._boilerplate = find_boilerplate(self.document)
+            logger.info(
+                "Found boilerplate on %s of %s pages",
+                len(self._boilerplate),
+                len(self.document),
+            )
+        for page_number in page_nums:
+            rects = self._boilerplate.get(page_number)
+            if rects and page_number not in self._stripped_pages:
+                remove_blocks(self.document[page_number], rects)
+                self._stripped_pages.add(page_number)
+                record("boilerplate_blocks_removed", len(rects))
+
+    def release_memory(self) -> None:
+        """
+        Drop the caches of MuPDF, and reopen the document when over the memory limit
+
+        Raises
+        ------
+        MemoryError
+            When the resident memory is still over the limit
+        """
+        pymupdf.TOOLS.store_shrink(100)
+        rss = resident_memory()
+        if rss is None:
+            return
+        record_max("peak_resident_bytes", rss)
+        if self.memory_limit is None or rss <= self.memory_limit:
+            return
+        # The pages and fonts loaded by a document are only freed when it closes
+        self.document.close()
+        self.document = pymupdf.open(self.pdf_path)
+        # The boilerplate was only removed from the closed document
+        self._stripped_pages.clear()
+        gc.collect()
+        _trim_heap()
+        record("document_reopened")
+        rss = resident_memory()
+        logger.info(
+            "Reopened %s to release memory, now %s MiB", self.pdf_path, rss >> 20
+        )
+        if rss > self.memory_limit:
+            raise MemoryError(
+                f"Resident memory of {rss >> 20} MiB is over the limit of "
+                f"{self.memory_limit >> 20} MiB"
+            )
+
+    def section_spans(self) -> dict[str, tuple[int, int]]:
+        """The page span, end excluded, of every section of the table of contents"""
+        if not getattr(self, "toc_details", None):
+            return {}
+        return {
+            section_name: (page_start, page_end or len(self.document) - 1)
+            for section_name, (
+                page_start,
+                page_end,
+            ) in self.toc_details.simplified_toc_mapping.items()
+        }
+
+    def iter_sections_content(
+        self, progress: Callable[[str, float], None] | None = None
+    ) -> Iterator[dict | None]:
+        """
+        Extract the sections found in the table of contents one at a time
+
+        Each record is yielded as soon as it is extracted, and the caches of
+        the document are released before the next section, so only one
+        section is held in memory.
+
+        Parameters
+        ----------
+        progress : Callable[[str, float], None] | None, optional
+            Called with the current stage and the fraction of it that is done
+
+        Yields
+        ------
+        dict | None
+            The record of each section, None if its extraction failed
+        """
+        progress = progress or _ignore_progress
         if not hasattr(self, "toc_details_dict"):
+            progress("toc_extraction", 0.0)
             self.toc_details = self._extract_toc_map_from_img()
-        if self.toc_details:
-            for (
-                section_name,
-                page_span,
-            ) in self.toc_details.simplified_toc_mapping.items():
-                results.append(self.extract_section_content(section_name, *page_span))
-            logger.info("Extracted all contents found in the Table of contents")
-        return results
-
-    def save_all_sections_content(self):
-        results = self.extract_all_sections_content()
-        for result in results:
-            result_bytes = json.dumps(result).encode("utf-8")
-            save_file_to_s3(
-                result_bytes,
-                self.relative_dir / "sections" / f"{result['section_name']}.json",
+        if not self.toc_details:
+            return
+        sections = list(self.toc_details.simplified_toc_mapping.items())
+        for i, (section_name, page_span) in enumerate(sections):
+            progress("section_extraction", i / len(sections))
+            yield self.extract_section_content(section_name, *page_span)
+            self.release_memory()
+        logger.info("Extracted all contents found in the Table of contents")
+
+    def extract_all_sections_content(
+        self, progress: Callable[[str, float], None] | None = None
+    ) -> list:
+        """
+        Extract every section found in the table of contents
+
+        Parameters
+        ----------
+        progress : Callable[[str, float], None] | None, optional
+            Called with the current stage and the fraction of it that is done
+        """
+        return list(self.iter_sections_content(progress))
+
+    def extract_revised_sections(
+        self,
+        fingerprints: list[str],
+        progress: Callable[[str, float], None] | None = None,
+    ) -> tuple[Iterator[dict | None], dict[str, tuple[int, int]]] | None:
+        """
+        Extract only the sections whose pages changed since the previous revision
+
+        The page fingerprints are diffed against the latest other document
+        of the brand and model number, the records of the unchanged sections
+        are carried over from the registry.
+
+        Parameters
+        ----------
+        fingerprints : list[str]
+            The fingerprint of every page of the document
+        progress : Callable[[str, float], None] | None, optional
+            Called with the current stage and the fraction of it that is done
+
+        Returns
+        -------
+        tuple[Iterator[dict | None], dict[str, tuple[int, int]]] | None
+            The section records, extracted as they are iterated, and their page
+            spans, None if there is no previous revision or it differs too
+            much to be reused
+        """
+        progress = progress or _ignore_progress
+        previous_hash = self.registry.previous_document(
+            self.document_hash, self.brand, self.model_number
+        )
+        if previous_hash is None:
+            return None
+        progress("diffing_pages", 0.0)
+        previous_spans = self.registry.section_spans(previous_hash)
+        plan = plan_revision(
+            self.registry.page_fingerprints(previous_hash), fingerprints, previous_spans
+        )
+        if plan is None:
+            logger.info(
+                "Document %s is not a revision of %s, parsing all of it",
+                self.document_hash,
+                previous_hash,
             )
+            return None
+
+        record("pages_changed", len(plan.changed_pages))
+        logger.info(
+            "Document %s revises %s, %s of %s pages changed",
+            self.document_hash,
+            previous_hash,
+            len(plan.changed_pages),
+            len(fingerprints),
+        )
+        page_spans = {**plan.unchanged, **plan.changed}
+
+        def results() -> Iterator[dict | None]:
+            for i, section_name in enumerate(previous_spans):
+                progress("section_extraction", i / len(previous_spans))
+                previous_record = None
+                if section_name in plan.unchanged:
+                    previous_record = self.registry.section_record(
+                        previous_hash, section_name
+                    )
+                if previous_record:
+                    record("sections_reused")
+                    yield {**previous_record, "document_hash": self.document_hash}
+                else:
+                    yield self.extract_section_content(
+                        section_name, *page_spans[section_name]
+                    )
+                    self.release_memory()
+
+        return results(), page_spans
+
+    def save_model_document(self) -> None:
+        """Save the record linking the brand and model number to the document"""
+        mapping = ModelDocumentRecord(
+            brand=self.brand,
+            model_number=self.model_number,
+            device=self.device,
+            document_hash=self.document_hash,
+            linked_at=datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        )
+        save_file_to_s3(
+            encode(mapping),
+            MODEL_DOCUMENTS_DIR
+            / f"brand={self.brand}"
+            / f"model_number={self.model_number}.json",
+        )
+
+    def save_error_codes(self, section_name: str, error_codes: list[dict]) -> None:
+        """Save the error code table rows of a section, one JSON line per row"""
+        if not error_codes:
+            return
+        rows = [
+            {
+                **row,
+                "section_name": section_name,
+                "document_hash": self.document_hash,
+                "device": self.device,
+            }
+            for row in error_codes
+        ]
+        save_file_to_s3(
+            encode_lines(rows, schema=ErrorCodeRecord),
+            self.document_dir / "error_codes" / f"{section_name}.jsonl",
+        )
+
+    def save_all_sections_content(
+        self, progress: Callable[[str, float], None] | None = None
+    ):
+        """
+        Extract every section and save it to S3
+
+        The sections are saved once under the hash of the document, and a
+        record linking the brand and model number to the document is saved
+        for every upload, so a manual shared by several models is stored once.
+        The rows of the error code tables of troubleshooting sections are
+        saved next to the sections, for direct lookups in the chat.
+        A revision of a manual already parsed for the model only has the
+        sections on changed pages extracted again.
+
+        Parameters
+        ----------
+        progress : Callable[[str, float], None] | None, optional
+            Called with the current stage and the fraction of it that is done
+        """
+        progress = progress or _ignore_progress
+        with self.instrumented_run():
+            if self.registry and self.registry.get(self.document_hash):
+                if self.registry.is_linked(
+                    self.document_hash, self.brand, self.model_number
+                ):
+                    logger.info(
+                        "Document %s was already processed for %s %s",
+                        self.document_hash,
+                        self.brand,
+                        self.model_number,
+                    )
+                    return
+                # A known manual for another model, only link it to the sections
+                progress("linking_sections", 0.0)
+                record(
+                    "sections_reused",
+                    len(self.registry.section_records(self.document_hash)),
+                )
+            else:
+                revision, fingerprints = None, []
+                if self.registry:
+                    with stage("page_fingerprints"):
+                        fingerprints = document_fingerprints(self.document)
+                    self.release_memory()
+                    revision = self.extract_revised_sections(fingerprints, progress)
+                if revision:
+                    results, page_spans = revision
+                else:
+                    results, page_spans = self.iter_sections_content(progress), None
+                # Each section is saved as soon as it is extracted
+                for result in results:
+                    if not result:
+                        continue
+                    result = {**result, "model_number": None}
+                    section = {
+                        key: value
+                        for key, value in result.items()
+                        if key != "error_codes"
+                    }
+                    save_file_to_s3(
+                        encode(section, schema=SectionRecord),
+                        self.document_dir
+                        / "sections"
+                        / f"{result['section_name']}.json",
+                    )
+                    self.save_error_codes(
+                        result["section_name"], result.get("error_codes", [])
+                    )
+                    if self.registry:
+                        self.registry.add_section(self.document_hash, result)
+                if self.registry:
+                    self.registry.register(
+                        self.document_hash,
+                        filename=self.pdf_path.name,
+                        page_count=len(self.document),
+                        page_spans=page_spans or self.section_spans(),
+                        page_fingerprints=fingerprints,
+                        page_languages=self._page_languages,
+                    )
+            self.save_model_document()
+            if self.registry:
+                self.registry.link_model(
+                    self.document_hash, self.brand, self.model_number, self.device
+                )
 
     def cleanup(self):
         try:
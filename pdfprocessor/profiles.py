@@ -0,0 +1,157 @@
+import itertools
+from dataclasses import dataclass
+
+import pymupdf
+import pymupdf4llm
+
+from helper.tracing import record, stage
+
+# The top and bottom bands skipped by pymupdf4llm, e.g. running headers
+MARGINS = (0, 50, 0, 50)
+# pymupdf4llm ends every page with this line
+PAGE_SEPARATOR = "\n-----\n\n"
+
+
+@dataclass(frozen=True)
+class ExtractionProfile:
+    """
+    Which costly features of the markdown conversion run
+
+    The layout analysis of pymupdf4llm finds the tables, images and vector
+    graphics of a page, which is most of its time. The other pages are
+    converted from their text blocks, with headers from the font sizes.
+    """
+
+    name: str
+    # The pages converted with the layout analysis: "all", "graphics" for
+    # the pages with images or vector graphics, or "none"
+    layout_pages: str
+
+
+EXTRACTION_PROFILES = {
+    profile.name: profile
+    for profile in (
+        ExtractionProfile("fast_text", layout_pages="none"),
+        ExtractionProfile("balanced", layout_pages="graphics"),
+        ExtractionProfile("full", layout_pages="all"),
+    )
+}
+DEFAULT_PROFILE = "full"
+
+
+def get_profile(profile: str | ExtractionProfile) -> ExtractionProfile:
+    """The extraction profile, by name or as is"""
+    if isinstance(profile, ExtractionProfile):
+        return profile
+    if profile not in EXTRACTION_PROFILES:
+        raise ValueError(
+            f"Unknown extraction profile {profile!r}, "
+            f"choose from {', '.join(EXTRACTION_PROFILES)}"
+        )
+    return EXTRACTION_PROFILES[profile]
+
+
+def has_graphics(page: pymupdf.Page) -> bool:
+    """Whether a page has images or vector graphics, e.g. table borders"""
+    return bool(page.get_images() or page.get_cdrawings())
+
+
+def page_text_markdown(page: pymupdf.Page, hdr_info) -> str:
+    """
+    Convert a page to markdown from its text blocks only
+
+    Parameters
+    ----------
+    page : pymupdf.Page
+        The page
+    hdr_info : pymupdf4llm.IdentifyHeaders
+        The header levels of the font sizes of the document
+
+    Returns
+    -------
+    str
+        A paragraph per text block, header lines prefixed with their level
+    """
+    left, top, right, bottom = MARGINS
+    clip = page.rect + (left, top, -right, -bottom)
+    paragraphs = []
+    for block in page.get_text(
+        "dict", clip=clip, flags=pymupdf.TEXTFLAGS_TEXT, sort=True
+    )["blocks"]:
+        lines = []
+        for line in block["lines"]:
+            text = "".join(span["text"] for span in line["spans"]).strip()
+            if not text:
+                continue
+            header = hdr_info.get_header_id(line["spans"][0], page=page)
+            if header:
+                if lines:
+                    paragraphs.append(" ".join(lines))
+                    lines = []
+                paragraphs.append(header + text)
+            else:
+                lines.append(text)
+        if lines:
+            paragraphs.append(" ".join(lines))
+    return "\n\n".join(paragraphs) + "\n" + PAGE_SEPARATOR
+
+
+def convert_pages(
+    document: pymupdf.Document,
+    page_nums: list[int],
+    profile: ExtractionProfile,
+    hdr_info=None,
+) -> str:
+    """
+    Convert pages of a document to markdown with an extraction profile
+
+    Parameters
+    ----------
+    document : pymupdf.Document
+        The document
+    page_nums : list[int]
+        The pages to convert, in order
+    profile : ExtractionProfile
+        Which pages are converted with the layout analysis
+    hdr_info : pymupdf4llm.IdentifyHeaders, optional
+        The header levels of the document, computed from every page when
+        None. Pass the same one to every call, it is the same for a document
+
+    Returns
+    -------
+    str
+        The markdown of the pages
+    """
+    if hdr_info is None:
+        hdr_info = pymupdf4llm.IdentifyHeaders(document)
+    if profile.layout_pages == "all":
+        layout_pages = set(page_nums)
+    elif profile.layout_pages == "graphics":
+        layout_pages = {
+            page_number
+            for page_number in page_nums
+            if has_graphics(document[page_number])
+        }
+    else:
+        layout_pages = set()
+
+    md_parts = []
+    for with_layout, pages in itertools.groupby(
+        page_nums, key=lambda page_number: page_number in layout_pages
+    ):
+        pages = list(pages)
+        if with_layout:
+            with stage("to_markdown"):
+                md_parts.append(
+                    pymupdf4llm.to_markdown(
+                        document, pages=pages, hdr_info=hdr_info, show_progress=False
+                    )
+                )
+        else:
+            with stage("text_markdown"):
+                md_parts += [
+                    page_text_markdown(document[page_number], hdr_info)
+                    for page_number in pages
+                ]
+    record("pages_with_layout", len(layout_pages))
+    return "".join(md_parts)
@@ -0,0 +1,377 @@
+import datetime
+import sqlite3
+from contextlib import closing
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from helper.logger import Logger
+from helper.serialization import decode, encode_str
+from helper.utils import auto_create_dir
+
+logger_instance = Logger()
+logger = logger_instance.get_logger()
+
+DEFAULT_STATE_DB = ".ingestion/state.sqlite"
+DOCUMENTS_TABLE = "processed_documents"
+SECTIONS_TABLE = "document_sections"
+MODELS_TABLE = "document_models"
+PAGES_TABLE = "document_pages"
+
+
+@dataclass
+class ProcessedDocument:
+    document_hash: str
+    filename: str | None
+    page_count: int | None
+    processed_at: str
+    # Every brand and model number the document was uploaded for
+    models: list[tuple[str, str | None]] = field(default_factory=list)
+
+
+def _now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+class DocumentRegistry:
+    """
+    Records the manuals already parsed, keyed by the hash of the PDF
+
+    The extracted section records of each document are kept, so a repeat
+    upload of the same manual for another model number can re-emit them with
+    the new metadata instead of rendering pages and calling Gemini again.
+    """
+
+    def __init__(self, db_path: str | Path = DEFAULT_STATE_DB):
+        """
+        Parameters
+        ----------
+        db_path : str | Path, optional
+            The SQLite database of the registry, by default ".ingestion/state.sqlite"
+        """
+        self.db_path = Path(db_path)
+        auto_create_dir(self.db_path.parent)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {DOCUMENTS_TABLE} (
+                    document_hash TEXT PRIMARY KEY,
+                    filename TEXT,
+                    page_count INTEGER,
+                    processed_at TEXT NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {SECTIONS_TABLE} (
+                    document_hash TEXT NOT NULL,
+                    section_name TEXT NOT NULL,
+                    record TEXT NOT NULL,
+                    page_start INTEGER,
+                    page_end INTEGER,
+                    PRIMARY KEY (document_hash, section_name)
+                )
+                """
+            )
+            conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {MODELS_TABLE} (
+                    document_hash TEXT NOT NULL,
+                    brand TEXT NOT NULL,
+                    model_number TEXT NOT NULL,
+                    device TEXT,
+                    linked_at TEXT NOT NULL,
+                    PRIMARY KEY (document_hash, brand, model_number)
+                )
+                """
+            )
+            conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {PAGES_TABLE} (
+                    document_hash TEXT NOT NULL,
+                    page_number INTEGER NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    language TEXT,
+                    PRIMARY KEY (document_hash, page_number)
+                )
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def get(self, document_hash: str) -> ProcessedDocument | None:
+        """The processed document with this hash, None if it was never parsed"""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                f"SELECT * FROM {DOCUMENTS_TABLE} WHERE document_hash = ?",
+                [document_hash],
+            ).fetchone()
+            if row is None:
+                return None
+            models = conn.execute(
+                f"""
+                SELECT brand, model_number FROM {MODELS_TABLE}
+                WHERE document_hash = ? ORDER BY linked_at
+                """,
+                [document_hash],
+            ).fetchall()
+        return ProcessedDocument(
+            **dict(row), models=[(brand, model) for brand, model in models]
+        )
+
+    def is_linked(
+        self, document_hash: str, brand: str, model_number: str | None
+    ) -> bool:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                f"""
+                SELECT 1 FROM {MODELS_TABLE}
+                WHERE document_hash = ? AND brand = ? AND model_number = ?
+                """,
+                [document_hash, brand, str(model_number)],
+            ).fetchone()
+        return row is not None
+
+    def register(
+        self,
+        document_hash: str,
+        sections: list[dict] | None = None,
+        filename: str | None = None,
+        page_count: int | None = None,
+        page_spans: dict[str, tuple[int, int]] | None = None,
+        page_fingerprints: list[str] | None = None,
+        page_languages: list[str | None] | None = None,
+    ) -> None:
+        """
+        Record a parsed document, its section records and page fingerprints
+
+        Parameters
+        ----------
+        document_hash : str
+            The hash of the PDF
+        sections : list[dict] | None, optional
+            The section records extracted by `PdfManualParser`, by default
+            those already saved with `add_section`
+        filename : str | None, optional
+            The name of the uploaded file
+        page_count : int | None, optional
+            The number of pages of the document
+        page_spans : dict[str, tuple[int, int]] | None, optional
+            The page span, end excluded, of every section
+        page_fingerprints : list[str] | None, optional
+            The fingerprint of every page, used to diff a later revision
+        page_languages : list[str | None] | None, optional
+            The detected language of every page, by default not recorded
+        """
+        page_spans = page_spans or {}
+        page_languages = page_languages or []
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                f"""
+                INSERT OR REPLACE INTO {DOCUMENTS_TABLE}
+                (document_hash, filename, page_count, processed_at)
+                VALUES (?, ?, ?, ?)
+                """,
+                [document_hash, filename, page_count, _now()],
+            )
+            if sections is not None:
+                conn.execute(
+                    f"DELETE FROM {SECTIONS_TABLE} WHERE document_hash = ?",
+                    [document_hash],
+                )
+                conn.executemany(
+                    f"INSERT INTO {SECTIONS_TABLE} VALUES (?, ?, ?, NULL, NULL)",
+                    [
+                        [document_hash, section["section_name"], encode_str(section)]
+                        for section in sections
+                    ],
+                )
+            conn.executemany(
+                f"""
+                UPDATE {SECTIONS_TABLE} SET page_start = ?, page_end = ?
+                WHERE document_hash = ? AND section_name = ?
+                """,
+                [
+                    [*page_span, document_hash, section_name]
+                    for section_name, page_span in page_spans.items()
+                ],
+            )
+            (section_count,) = conn.execute(
+                f"SELECT COUNT(*) FROM {SECTIONS_TABLE} WHERE document_hash = ?",
+                [document_hash],
+            ).fetchone()
+            conn.execute(
+                f"DELETE FROM {PAGES_TABLE} WHERE document_hash = ?", [document_hash]
+            )
+            conn.executemany(
+                f"""
+                INSERT INTO {PAGES_TABLE}
+                (document_hash, page_number, fingerprint, language)
+                VALUES (?, ?, ?, ?)
+                """,
+                [
+                    [
+                        document_hash,
+                        page_number,
+                        fingerprint,
+                        (
+                            page_languages[page_number]
+                            if page_number < len(page_languages)
+                            else None
+                        ),
+                    ]
+                    for page_number, fingerprint in enumerate(page_fingerprints or [])
+                ],
+            )
+        logger.info(
+            "Registered document %s with %s sections", document_hash, section_count
+        )
+
+    def add_section(self, document_hash: str, section: dict) -> None:
+        """
+        Save a section record as soon as it is extracted
+
+        The document is only known to the registry once `register` is called,
+        so the sections of an interrupted parse are not reused.
+        """
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                f"""
+                INSERT OR REPLACE INTO {SECTIONS_TABLE}
+                (document_hash, section_name, record) VALUES (?, ?, ?)
+                """,
+                [document_hash, section["section_name"], encode_str(section)],
+            )
+
+    def link_model(
+        self,
+        document_hash: str,
+        brand: str,
+        model_number: str | None,
+        device: str | None = None,
+    ) -> bool:
+        """
+        Link a brand and model number to a processed document
+
+        Returns
+        -------
+        bool
+            True if the link is new, False if it already existed
+        """
+        with closing(self._connect()) as conn, conn:
+            cursor = conn.execute(
+                f"INSERT OR IGNORE INTO {MODELS_TABLE} VALUES (?, ?, ?, ?, ?)",
+                [document_hash, brand, str(model_number), device, _now()],
+            )
+            return cursor.rowcount == 1
+
+    def section_record(self, document_hash: str, section_name: str) -> dict | None:
+        """The record of one section of a processed document, if any"""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                f"""
+                SELECT record FROM {SECTIONS_TABLE}
+                WHERE document_hash = ? AND section_name = ?
+                """,
+                [document_hash, section_name],
+            ).fetchone()
+        return decode(row["record"]) if row else None
+
+    def section_records(
+        self,
+        document_hash: str,
+        brand: str | None = None,
+        model_number: str | None = None,
+        device: str | None = None,
+    ) -> list[dict]:
+        """
+        The section records of a processed document
+
+        Parameters
+        ----------
+        document_hash : str
+            The hash of the PDF
+        brand, model_number, device : str | None, optional
+            Replace the metadata of the records, e.g. for a new model number
+
+        Returns
+        -------
+        list[dict]
+            The section records, in the order they were extracted
+        """
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"""
+                SELECT record FROM {SECTIONS_TABLE}
+                WHERE document_hash = ? ORDER BY rowid
+                """,
+                [document_hash],
+            ).fetchall()
+        metadata = {
+            key: value
+            for key, value in (
+                ("brand", brand),
+                ("model_number", model_number),
+                ("device", device),
+            )
+            if value is not None
+        }
+        return [{**decode(row["record"]), **metadata} for row in rows]
+
+    def previous_document(
+        self, document_hash: str, brand: str, model_number: str | None
+    ) -> str | None:
+        """The hash of the latest other document linked to the brand and model"""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                f"""
+                SELECT document_hash FROM {MODELS_TABLE}
+                WHERE brand = ? AND model_number = ? AND document_hash != ?
+                ORDER BY linked_at DESC LIMIT 1
+                """,
+                [brand, str(model_number), document_hash],
+            ).fetchone()
+        return row["document_hash"] if row else None
+
+    def page_fingerprints(self, document_hash: str) -> list[str]:
+        """The page fingerprints of a document, empty if they were not recorded"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"""
+                SELECT fingerprint FROM {PAGES_TABLE}
+                WHERE document_hash = ? ORDER BY page_number
+                """,
+                [document_hash],
+            ).fetchall()
+        return [row["fingerprint"] for row in rows]
+
+    def page_languages(self, document_hash: str) -> list[str | None]:
+        """The detected page languages of a document, None where not recorded"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"""
+                SELECT language FROM {PAGES_TABLE}
+                WHERE document_hash = ? ORDER BY page_number
+                """,
+                [document_hash],
+            ).fetchall()
+        return [row["language"] for row in rows]
+
+    def section_spans(self, document_hash: str) -> dict[str, tuple[int, int]]:
+        """The page span, end excluded, of every section with a recorded span"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"""
+                SELECT section_name, page_start, page_end FROM {SECTIONS_TABLE}
+                WHERE document_hash = ? AND page_start IS NOT NULL
+                ORDER BY rowid
+                """,
+                [document_hash],
+            ).fetchall()
+        return {
+            row["section_name"]: (row["page_start"], row["page_end"]) for row in rows
+        }
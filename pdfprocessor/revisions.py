@@ -0,0 +1,107 @@
+import hashlib
+from dataclasses import dataclass, field
+from difflib import SequenceMatcher
+
+import pymupdf
+
+# Above this fraction of changed pages a revision is parsed from scratch
+MAX_CHANGED_FRACTION = 0.5
+
+
+def page_fingerprint(page: pymupdf.Page) -> str:
+    """
+    Fingerprint the content of a page
+
+    The text and the digests of the images are hashed, so the fingerprint
+    does not depend on the layout of the PDF file, e.g. object numbers.
+
+    Parameters
+    ----------
+    page : pymupdf.Page
+        The page to fingerprint
+
+    Returns
+    -------
+    str
+        The hex digest of the page content
+    """
+    page_hash = hashlib.blake2b(digest_size=16)
+    page_hash.update(page.get_text("text").encode("utf-8"))
+    for image in page.get_image_info(hashes=True):
+        page_hash.update(image["digest"])
+    return page_hash.hexdigest()
+
+
+def document_fingerprints(document: pymupdf.Document) -> list[str]:
+    """The fingerprint of every page of the document, in page order"""
+    return [page_fingerprint(page) for page in document]
+
+
+@dataclass
+class RevisionPlan:
+    # Section name to the page span in the revision
+    unchanged: dict[str, tuple[int, int]] = field(default_factory=dict)
+    changed: dict[str, tuple[int, int]] = field(default_factory=dict)
+    changed_pages: set[int] = field(default_factory=set)
+
+
+def plan_revision(
+    previous_fingerprints: list[str],
+    fingerprints: list[str],
+    previous_spans: dict[str, tuple[int, int]],
+) -> RevisionPlan | None:
+    """
+    Find the sections of a revised manual whose pages changed
+
+    The pages of both revisions are aligned by their fingerprints, so pages
+    inserted or removed move the following sections instead of marking them
+    as changed.
+
+    Parameters
+    ----------
+    previous_fingerprints : list[str]
+        The page fingerprints of the previous revision
+    fingerprints : list[str]
+        The page fingerprints of the revision
+    previous_spans : dict[str, tuple[int, int]]
+        The page span, end excluded, of every section of the previous revision
+
+    Returns
+    -------
+    RevisionPlan | None
+        The sections to carry over and to extract again, with their page spans
+        in the revision, None if the revision has to be parsed from scratch:
+        too many pages changed or pages outside the sections changed, e.g. the
+        table of contents
+    """
+    if not previous_fingerprints or not previous_spans:
+        return None
+    matcher = SequenceMatcher(None, previous_fingerprints, fingerprints, autojunk=False)
+    opcodes = matcher.get_opcodes()
+    unchanged_pages = {
+        j for tag, _, _, j1, j2 in opcodes if tag == "equal" for j in range(j1, j2)
+    }
+    changed_pages = set(range(len(fingerprints))) - unchanged_pages
+    if len(changed_pages) > MAX_CHANGED_FRACTION * len(fingerprints):
+        return None
+
+    def map_boundary(page: int) -> int:
+        """The page of the revision at a section boundary of the previous one"""
+        for _, i1, i2, j1, j2 in opcodes:
+            if i1 <= page < i2:
+                return j1 + min(page - i1, j2 - j1)
+        return len(fingerprints)
+
+    plan = RevisionPlan(changed_pages=changed_pages)
+    covered = set()
+    for section_name, (page_start, page_end) in previous_spans.items():
+        span = (map_boundary(page_start), map_boundary(page_end))
+        pages = set(range(*span))
+        covered |= pages
+        if pages & changed_pages or span[1] - span[0] != page_end - page_start:
+            plan.changed[section_name] = span
+        else:
+            plan.unchanged[section_name] = span
+    if changed_pages - covered:
+        return None
+    return plan
@@ -0,0 +1,341 @@
+import asyncio
+import datetime
+import hashlib
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from helper.utils import Logger, auto_create_dir
+from scraper.frontier import CrawlFrontier
+
+logger_instance = Logger()
+logger = logger_instance.get_logger()
+
+# Responses worth retrying, the server may recover
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+USER_AGENT = "Mozilla/5.0 (compatible; ManualAssistantCrawler/1.0)"
+
+
+class BrowserFallback:
+    """
+    A headless Chrome started on first use and reused for every later page
+
+    Pages are loaded one at a time, as the driver is not thread safe. Call
+    `close` when done, the driver is not quit after each page.
+    """
+
+    def __init__(self, timeout: int = 20):
+        self.timeout = timeout
+        self._driver = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        # Selenium is only needed when the fallback is used
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+
+        chrome_options = Options()
+        chrome_options.add_argument("--headless")
+        chrome_options.add_argument("--disable-gpu")
+        # Set window size to avoid element location issues
+        chrome_options.add_argument("--window-size=1920,1080")
+        logger.info("Starting headless Chrome")
+        return webdriver.Chrome(options=chrome_options)
+
+    def get_html(self, url: str) -> str:
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        with self._lock:
+            if self._driver is None:
+                self._driver = self._start()
+            self._driver.get(url)
+            WebDriverWait(self._driver, self.timeout).until(
+                EC.presence_of_element_located((By.TAG_NAME, "body"))
+            )
+            return self._driver.page_source
+
+    def close(self) -> None:
+        with self._lock:
+            if self._driver is not None:
+                self._driver.quit()
+                self._driver = None
+
+
+class HostLimiter:
+    """Bounds the concurrent requests to a host and spaces out their starts"""
+
+    def __init__(self, max_concurrency: int, requests_per_second: float | None):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.interval = 1 / requests_per_second if requests_per_second else 0.0
+        self._next_start = 0.0
+        self._lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        if self.interval:
+            async with self._lock:
+                now = time.monotonic()
+                wait = self._next_start - now
+                self._next_start = max(now, self._next_start) + self.interval
+            if wait > 0:
+                await asyncio.sleep(wait)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.semaphore.release()
+
+
+@dataclass
+class CrawlResult:
+    url: str
+    status: int | None = None
+    html: str | None = None
+    path: str | None = None
+    attempts: int = 0
+    error: str | None = None
+    fetched_with: str = "http"
+    etag: str | None = None
+    last_modified: str | None = None
+    # False when the saved copy of the page was still current
+    changed: bool = True
+
+
+def page_file_name(url: str) -> str:
+    """A file name unique to the URL, e.g. file_Device_Dishwasher.html"""
+    parts = urlsplit(url)
+    slug = re.sub(r"[^\w.-]+", "_", f"{parts.path}_{parts.query}").strip("_")
+    return f"file_{slug or 'index'}.html"
+
+
+class Crawler:
+    """
+    Fetches pages concurrently over a pooled HTTP client
+
+    Connections are reused across requests, requests to a host are bounded
+    and rate limited, and failed requests are retried with exponential
+    backoff. When every attempt fails, the page is loaded with the headless
+    browser fallback, if one is given. With a `CrawlFrontier`, only the
+    pending pages are visited and already saved pages are revalidated with
+    conditional requests.
+
+        async with Crawler(per_host_limit=4) as crawler:
+            results = await crawler.crawl(urls, "dataset/raw", "DISHWASHER")
+    """
+
+    def __init__(
+        self,
+        per_host_limit: int = 4,
+        requests_per_second: float | None = None,
+        timeout: int = 20,
+        retries: int = 3,
+        backoff: float = 0.5,
+        browser: BrowserFallback | None = None,
+        frontier: CrawlFrontier | None = None,
+    ):
+        """
+        Parameters
+        ----------
+        per_host_limit : int, optional
+            The maximum number of concurrent requests to a host, by default 4
+        requests_per_second : float | None, optional
+            The maximum rate of requests to a host, by default unlimited
+        timeout : int, optional
+            The timeout of a request in seconds, by default 20
+        retries : int, optional
+            The number of retries after a failed request, by default 3
+        backoff : float, optional
+            The delay before the first retry in seconds, doubled for every
+            later retry, by default 0.5
+        browser : BrowserFallback | None, optional
+            Loads the pages that could not be fetched, by default None
+        frontier : CrawlFrontier | None, optional
+            Keeps the crawl state across runs, by default None
+        """
+        self.per_host_limit = per_host_limit
+        self.requests_per_second = requests_per_second
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.browser = browser
+        self.frontier = frontier
+        self._session: aiohttp.ClientSession | None = None
+        self._hosts: dict[str, HostLimiter] = defaultdict(
+            lambda: HostLimiter(self.per_host_limit, self.requests_per_second)
+        )
+
+    async def __aenter__(self):
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit_per_host=self.per_host_limit),
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={"User-Agent": USER_AGENT},
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._session.close()
+
+    def _retry_delay(self, attempt: int, retry_after: str | None = None) -> float:
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        # Full jitter, so retries of many pages do not arrive together
+        return random.uniform(0, self.backoff * 2**attempt)
+
+    async def fetch(self, url: str, headers: dict | None = None) -> CrawlResult:
+        """
+        Fetch a page, retrying transient failures
+
+        Parameters
+        ----------
+        url : str
+            The URL of the page
+        headers : dict | None, optional
+            Extra request headers, e.g. If-None-Match
+
+        Returns
+        -------
+        CrawlResult
+            The status and HTML of the page, or the error of the last attempt
+        """
+        result = CrawlResult(url)
+        limiter = self._hosts[urlsplit(url).netloc]
+        for attempt in range(self.retries + 1):
+            result.attempts = attempt + 1
+            retry_after = None
+            try:
+                async with limiter, self._session.get(url, headers=headers) as response:
+                    result.status = response.status
+                    if response.status < 400:
+                        result.etag = response.headers.get("ETag")
+                        result.last_modified = response.headers.get("Last-Modified")
+                        if response.status != 304:
+                            result.html = await response.text()
+                        result.error = None
+                        return result
+                    result.error = f"HTTP {response.status}"
+                    if response.status not in RETRY_STATUSES:
+                        break
+                    retry_after = response.headers.get("Retry-After")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                result.error = repr(e)
+            if attempt < self.retries:
+                delay = self._retry_delay(attempt, retry_after)
+                logger.debug("Retrying %s in %.2fs: %s", url, delay, result.error)
+                await asyncio.sleep(delay)
+
+        if self.browser is not None:
+            try:
+                result.html = await asyncio.to_thread(self.browser.get_html, url)
+                result.fetched_with, result.error = "browser", None
+            except Exception as e:
+                result.error = f"{result.error}, browser: {e!r}"
+        if result.error:
+            logger.warning("Failed to fetch %s: %s", url, result.error)
+        return result
+
+    async def crawl(
+        self, urls: list[str] | None, directory: str | Path, partition: str
+    ) -> list[CrawlResult]:
+        """
+        Fetch every page and save it under `directory/<YYYYMMDD>/<partition>`
+
+        With a frontier the URLs are added to it and only those still pending
+        are visited, or every pending page when `urls` is None, e.g. to resume
+        an interrupted crawl. Pages whose content did not change keep their
+        saved copy.
+
+        Parameters
+        ----------
+        urls : list[str] | None
+            The URLs of the pages, None to only visit the pending pages
+        directory : str | Path
+            The root directory of the raw pages
+        partition : str
+            The subdirectory of the pages, e.g. the appliance type
+
+        Returns
+        -------
+        list[CrawlResult]
+            The result of every page visited, in the order of `urls`, or of
+            the frontier
+        """
+        output_dir = (
+            Path(directory) / datetime.datetime.now().strftime("%Y%m%d") / partition
+        )
+        auto_create_dir(output_dir)
+        if self.frontier is not None:
+            self.frontier.add(urls or [])
+            pending = self.frontier.pending()
+            if urls is not None:
+                pending_urls = set(pending)
+                pending = [url for url in urls if url in pending_urls]
+            urls = pending
+
+        async def fetch_and_save(url: str) -> CrawlResult:
+            page = self.frontier.get(url) if self.frontier is not None else None
+            saved = bool(page and page.path and Path(page.path).exists())
+            headers = {}
+            if saved and page.etag:
+                headers["If-None-Match"] = page.etag
+            if saved and page.last_modified:
+                headers["If-Modified-Since"] = page.last_modified
+
+            result = await self.fetch(url, headers)
+            if result.status == 304 and saved:
+                result.path, result.changed = page.path, False
+                self.frontier.record_not_modified(url)
+                return result
+            if result.html is None:
+                if self.frontier is not None:
+                    self.frontier.record_failure(url, result.status, result.error)
+                return result
+
+            content_hash = hashlib.md5(
+                result.html.encode("utf-8"), usedforsecurity=False
+            ).hexdigest()
+            if saved and page.content_hash == content_hash:
+                result.path, result.changed = page.path, False
+            else:
+                path = output_dir / page_file_name(url)
+                await asyncio.to_thread(path.write_text, result.html)
+                result.path = str(path)
+            if self.frontier is not None:
+                self.frontier.record_fetch(
+                    url,
+                    result.status or 200,
+                    content_hash,
+                    result.path,
+                    etag=result.etag,
+                    last_modified=result.last_modified,
+                )
+            return result
+
+        results = await asyncio.gather(*(fetch_and_save(url) for url in urls))
+        logger.info(
+            "Crawled %s pages to %s, %s changed, %s failed",
+            len(results),
+            output_dir,
+            sum(result.changed and result.path is not None for result in results),
+            sum(result.path is None for result in results),
+        )
+        return results
+
+
+def crawl(
+    urls: list[str] | None, directory: str | Path, partition: str, **crawler_options
+) -> list[CrawlResult]:
+    """Crawl the pages from synchronous code, see `Crawler` for the options"""
+
+    async def run() -> list[CrawlResult]:
+        async with Crawler(**crawler_options) as crawler:
+            return await crawler.crawl(urls, directory, partition)
+
+    return asyncio.run(run())
@@ -0,0 +1,205 @@
+import importlib.util
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+from bs4 import BeautifulSoup, SoupStrainer, Tag
+
+# lxml is much faster, the standard library parser is the fallback
+HTML_PARSER = "lxml" if importlib.util.find_spec("lxml") else "html.parser"
+# lxml rejects str input with an encoding declaration, e.g. XHTML pages
+XML_DECLARATION = re.compile(r"^\s*<\?xml[^>]*\?>")
+
+
+@dataclass(frozen=True)
+class FieldSpec:
+    """A value extracted from each target element"""
+
+    name: str
+    # CSS selector within the target element, None for the element itself
+    selector: str | None = None
+    # The attribute to read, None for the text
+    attribute: str | None = None
+    many: bool = False
+
+
+@dataclass(frozen=True)
+class ExtractionSpec:
+    """
+    The elements to extract from the pages of a site
+
+    Only the elements with the tag `element` and the class `class_name` are
+    built into BeautifulSoup trees, see `parse_targets`.
+    """
+
+    name: str
+    element: str | None = None
+    class_name: str | None = None
+    fields: tuple[FieldSpec, ...] = (FieldSpec("text"),)
+
+
+SITE_SPECS = {
+    "ifixit": {
+        "toc": ExtractionSpec(
+            "toc",
+            element="div",
+            class_name="toc",
+            fields=(
+                FieldSpec("text"),
+                FieldSpec("titles", "a", many=True),
+                FieldSpec("links", "a", "href", many=True),
+            ),
+        ),
+        "categories": ExtractionSpec(
+            "categories",
+            element="div",
+            class_name="subcategories",
+            fields=(
+                FieldSpec("names", "a", many=True),
+                FieldSpec("links", "a", "href", many=True),
+            ),
+        ),
+    },
+}
+
+
+def parse_targets(
+    raw_html: str, element_name: str | None, class_name: str | None
+) -> list[Tag]:
+    """
+    Parse only the elements with a tag and class from the raw HTML
+
+    Parameters
+    ----------
+    raw_html : str
+        The raw HTML of the page
+    element_name : str | None
+        The tag of the elements, None for any tag
+    class_name : str | None
+        The class of the elements, None for any class
+
+    Returns
+    -------
+    list[Tag]
+        The matching elements, in document order
+    """
+    if HTML_PARSER == "lxml":
+        return _parse_targets_with_lxml(raw_html, element_name, class_name)
+    # Only the matching elements are built into the tree. The class is still
+    # a single string when straining, e.g. "toc main"
+    strainer = SoupStrainer(
+        element_name,
+        class_=class_name
+        and (lambda value: value is not None and class_name in value.split()),
+    )
+    soup = BeautifulSoup(raw_html, HTML_PARSER, parse_only=strainer)
+    return soup.find_all(element_name, **_class_filter(class_name))
+
+
+def _class_filter(class_name: str | None) -> dict:
+    """The class argument of a search, class_=None only finds tags without a class"""
+    return {"class_": class_name} if class_name else {}
+
+
+def _parse_targets_with_lxml(
+    raw_html: str, element_name: str | None, class_name: str | None
+) -> list[Tag]:
+    """Finds the elements in the C tree of lxml, then converts only them"""
+    import lxml.html
+    from lxml import etree
+
+    if not raw_html.strip():
+        return []
+    xpath = f"//{element_name or '*'}"
+    if class_name:
+        xpath += (
+            "[contains(concat(' ', normalize-space(@class), ' '), "
+            f"' {class_name} ')]"
+        )
+    targets = []
+    raw_html = XML_DECLARATION.sub("", raw_html, count=1)
+    for element in lxml.html.fromstring(raw_html).xpath(xpath):
+        fragment = etree.tostring(element, encoding="unicode", with_tail=False)
+        # The fragment is wrapped in <html> and <body> again, the target is
+        # the first element with its tag
+        target = BeautifulSoup(fragment, "lxml").find(
+            element.tag, **_class_filter(class_name)
+        )
+        if target is not None:
+            targets.append(target)
+    return targets
+
+
+def _field_value(element: Tag, field: FieldSpec) -> str | list | None:
+    if field.selector:
+        matches = element.select(field.selector, limit=0 if field.many else 1)
+    else:
+        matches = [element]
+    values = [
+        (
+            match.get(field.attribute)
+            if field.attribute
+            else match.get_text(" ", strip=True)
+        )
+        for match in matches
+    ]
+    if field.many:
+        return values
+    return values[0] if values else None
+
+
+def extract(raw_html: str, spec: ExtractionSpec) -> list[dict]:
+    """
+    Extract the fields of every target element of a page
+
+    Parameters
+    ----------
+    raw_html : str
+        The raw HTML of the page
+    spec : ExtractionSpec
+        What to extract
+
+    Returns
+    -------
+    list[dict]
+        The fields of each target element, by field name
+    """
+    return [
+        {field.name: _field_value(element, field) for field in spec.fields}
+        for element in parse_targets(raw_html, spec.element, spec.class_name)
+    ]
+
+
+def _extract_file(path: str | Path, spec: ExtractionSpec) -> list[dict]:
+    return extract(Path(path).read_text(), spec)
+
+
+def extract_files(
+    paths: list[str | Path], spec: ExtractionSpec, max_workers: int | None = None
+) -> list[list[dict]]:
+    """
+    Extract the saved pages in a pool of processes
+
+    Parameters
+    ----------
+    paths : list[str | Path]
+        The HTML files, read by the worker processes
+    spec : ExtractionSpec
+        What to extract
+    max_workers : int | None, optional
+        The number of processes, by default the number of CPUs
+
+    Returns
+    -------
+    list[list[dict]]
+        The extracted elements of each file, in the order of `paths`
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    # A few chunks per worker, to spread uneven pages without much IPC
+    chunksize = max(len(paths) // (4 * max_workers), 1)
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        return list(
+            pool.map(_extract_file, paths, [spec] * len(paths), chunksize=chunksize)
+        )
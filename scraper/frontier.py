@@ -0,0 +1,207 @@
+import datetime
+import sqlite3
+from contextlib import closing
+from dataclasses import dataclass
+from enum import Enum
+from pathlib import Path
+
+from helper.utils import Logger, auto_create_dir
+
+logger_instance = Logger()
+logger = logger_instance.get_logger()
+
+DEFAULT_FRONTIER_DB = ".scraper/frontier.sqlite"
+PAGES_TABLE = "crawl_pages"
+
+
+class PageStatus(Enum):
+    PENDING = "pending"
+    DONE = "done"
+    FAILED = "failed"
+
+
+@dataclass
+class CrawledPage:
+    url: str
+    status: PageStatus
+    etag: str | None = None
+    last_modified: str | None = None
+    content_hash: str | None = None
+    path: str | None = None
+    http_status: int | None = None
+    error: str | None = None
+    discovered_at: str | None = None
+    fetched_at: str | None = None
+    checked_at: str | None = None
+
+
+def _now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+class CrawlFrontier:
+    """
+    The URLs to crawl and what is known of each page, kept in SQLite
+
+    A crawl only visits the pending URLs, so an interrupted crawl resumes
+    where it stopped. The validators and content hash of every fetched page
+    are kept, so a refresh sends conditional requests and pages that did not
+    change are neither downloaded nor saved again.
+    """
+
+    def __init__(self, db_path: str | Path = DEFAULT_FRONTIER_DB):
+        """
+        Parameters
+        ----------
+        db_path : str | Path, optional
+            The SQLite database of the frontier, by default ".scraper/frontier.sqlite"
+        """
+        self.db_path = Path(db_path)
+        auto_create_dir(self.db_path.parent)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {PAGES_TABLE} (
+                    url TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    content_hash TEXT,
+                    path TEXT,
+                    http_status INTEGER,
+                    error TEXT,
+                    discovered_at TEXT NOT NULL,
+                    fetched_at TEXT,
+                    checked_at TEXT
+                )
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _execute(self, query: str, parameters=()) -> list[sqlite3.Row]:
+        with closing(self._connect()) as conn, conn:
+            return conn.execute(query, parameters).fetchall()
+
+    def add(self, urls: list[str]) -> int:
+        """Add the URLs not seen before as pending, returns the number added"""
+        with closing(self._connect()) as conn, conn:
+            cursor = conn.executemany(
+                f"""
+                INSERT OR IGNORE INTO {PAGES_TABLE} (url, status, discovered_at)
+                VALUES (?, ?, ?)
+                """,
+                [[url, PageStatus.PENDING.value, _now()] for url in urls],
+            )
+            return cursor.rowcount
+
+    def get(self, url: str) -> CrawledPage | None:
+        rows = self._execute(f"SELECT * FROM {PAGES_TABLE} WHERE url = ?", [url])
+        if not rows:
+            return None
+        values = dict(rows[0])
+        values["status"] = PageStatus(values["status"])
+        return CrawledPage(**values)
+
+    def pending(self, limit: int | None = None) -> list[str]:
+        """The URLs still to visit, in the order they were discovered"""
+        rows = self._execute(
+            f"""
+            SELECT url FROM {PAGES_TABLE} WHERE status = ?
+            ORDER BY discovered_at, rowid LIMIT ?
+            """,
+            [PageStatus.PENDING.value, -1 if limit is None else limit],
+        )
+        return [row["url"] for row in rows]
+
+    def refresh(self, checked_before: str | None = None) -> int:
+        """
+        Mark visited pages as pending, so the next crawl revalidates them
+
+        Parameters
+        ----------
+        checked_before : str | None, optional
+            Only the pages last checked before this ISO timestamp, by default all
+
+        Returns
+        -------
+        int
+            The number of pages to revalidate
+        """
+        with closing(self._connect()) as conn, conn:
+            cursor = conn.execute(
+                f"""
+                UPDATE {PAGES_TABLE} SET status = ?
+                WHERE status != ? AND (? IS NULL OR checked_at < ?)
+                """,
+                [
+                    PageStatus.PENDING.value,
+                    PageStatus.PENDING.value,
+                    checked_before,
+                    checked_before,
+                ],
+            )
+            return cursor.rowcount
+
+    def record_fetch(
+        self,
+        url: str,
+        http_status: int,
+        content_hash: str,
+        path: str,
+        etag: str | None = None,
+        last_modified: str | None = None,
+    ) -> None:
+        """Record a downloaded page, its validators and where it is saved"""
+        now = _now()
+        self._execute(
+            f"""
+            UPDATE {PAGES_TABLE}
+            SET status = ?, http_status = ?, content_hash = ?, path = ?, etag = ?,
+                last_modified = ?, error = NULL, fetched_at = ?, checked_at = ?
+            WHERE url = ?
+            """,
+            [
+                PageStatus.DONE.value,
+                http_status,
+                content_hash,
+                path,
+                etag,
+                last_modified,
+                now,
+                now,
+                url,
+            ],
+        )
+
+    def record_not_modified(self, url: str) -> None:
+        """Record that the saved copy of a page is still current"""
+        self._execute(
+            f"""
+            UPDATE {PAGES_TABLE}
+            SET status = ?, http_status = 304, error = NULL, checked_at = ?
+            WHERE url = ?
+            """,
+            [PageStatus.DONE.value, _now(), url],
+        )
+
+    def record_failure(self, url: str, http_status: int | None, error: str) -> None:
+        self._execute(
+            f"""
+            UPDATE {PAGES_TABLE}
+            SET status = ?, http_status = ?, error = ?, checked_at = ?
+            WHERE url = ?
+            """,
+            [PageStatus.FAILED.value, http_status, error, _now(), url],
+        )
+
+    def counts(self) -> dict[str, int]:
+        """The number of pages by status"""
+        rows = self._execute(
+            f"SELECT status, COUNT(*) AS pages FROM {PAGES_TABLE} GROUP BY status"
+        )
+        return {row["status"]: row["pages"] for row in rows}
@@ -1,32 +1,42 @@
+import atexit
 import datetime
+import functools
+from pathlib import Path
 
 import requests
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import WebDriverWait
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-from utils import Logger, ScraperOption, auto_create_dir
+from helper.utils import Logger, ScraperOption, auto_create_dir
+from scraper.crawler import RETRY_STATUSES, USER_AGENT, BrowserFallback, crawl
+from scraper.extraction import SITE_SPECS, extract, parse_targets
 
 # Initialize logger
 logger_instance = Logger()
 logger = logger_instance.get_logger()
 
+WEBSITE_URL = ""
 
-# Configure ChromeDriver to headless mode
-chrome_options = Options()
-chrome_options.add_argument("--headless")  # Run in headless mode
-chrome_options.add_argument("--disable-gpu")  # Disable GPU acceleration (optional)
-chrome_options.add_argument(
-    "--window-size=1920,1080"
-)  # Set window size to avoid element location issues
 
-# TODO: Download driver using shell command or package it
-# TODO: Add the driver path instead of using ~/.cache/selenium
-driver = webdriver.Chrome(options=chrome_options)
-WEBSITE_URL = ""
+@functools.lru_cache(maxsize=None)
+def get_http_session() -> requests.Session:
+    """The pooled HTTP session of the process, retrying transient failures"""
+    retry = Retry(total=3, backoff_factor=0.5, status_forcelist=RETRY_STATUSES)
+    session = requests.Session()
+    session.headers["User-Agent"] = USER_AGENT
+    session.mount("https://", HTTPAdapter(max_retries=retry))
+    session.mount("http://", HTTPAdapter(max_retries=retry))
+    return session
+
+
+@functools.lru_cache(maxsize=None)
+def get_browser() -> BrowserFallback:
+    """The headless browser of the process, Chrome starts on its first page"""
+    # TODO: Download driver using shell command or package it
+    # TODO: Add the driver path instead of using ~/.cache/selenium
+    browser = BrowserFallback()
+    atexit.register(browser.close)
+    return browser
 
 
 def get_html_content(
@@ -52,16 +62,11 @@ def get_html_content(
     try:
         raw_html = None
         if option == ScraperOption.SELENIUM:
-            try:
-                driver.get(url)
-                WebDriverWait(driver, timeout).until(
-                    EC.presence_of_element_located((By.TAG_NAME, "body"))
-                )
-                raw_html = driver.page_source
-            finally:
-                driver.quit()
+            browser = get_browser()
+            browser.timeout = timeout
+            raw_html = browser.get_html(url)
         elif option == ScraperOption.REQUESTS:
-            response = requests.get(url, timeout=timeout)
+            response = get_http_session().get(url, timeout=timeout)
             raw_html = response.text
         return raw_html
     except Exception as e:
@@ -85,10 +90,16 @@ def save_html_to_file(html: str, directory: str, file_name: str) -> str:
     Returns
     -------
     str
-        The path to the file where the HTML was saved
+        The path to the file where the HTML was saved, the latest saved file
+        when its content is the same
     """
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
     auto_create_dir(directory)
+    # The timestamped names sort by time
+    saved_files = sorted(Path(directory).glob("file_*.html"))
+    if saved_files and saved_files[-1].read_text() == html:
+        logger.info("HTML unchanged since %s", saved_files[-1])
+        return str(saved_files[-1])
     file_name = f"{directory}/file_{timestamp}.html"
     try:
         with open(file_name, "w") as f:
@@ -129,6 +140,33 @@ def save_appliance_categories(directory: str, appliance_type: str) -> str | None
     return None
 
 
+def save_guide_pages(
+    directory: str, appliance_type: str, urls: list[str], **crawler_options
+) -> list[str]:
+    """
+    Crawl guide pages concurrently and save them next to the appliance categories
+
+    Parameters
+    ----------
+    directory : str
+        The directory to save the pages to
+    appliance_type : str
+        The type of appliance of the guides
+    urls : list[str]
+        The URLs of the guide pages
+    crawler_options : dict
+        The options of `scraper.crawler.Crawler`, e.g. per_host_limit
+
+    Returns
+    -------
+    list[str]
+        The paths of the saved pages
+    """
+    crawler_options.setdefault("browser", get_browser())
+    results = crawl(urls, directory, appliance_type.upper(), **crawler_options)
+    return [result.path for result in results if result.path]
+
+
 class SiteScraper:
     def __init__(self, site_name: str, site_url: str):
         self.site_name = site_name
@@ -143,9 +181,25 @@ class SiteScraper:
         """
         Extract the appliance brands from the raw HTML
         """
-        soup = BeautifulSoup(raw_html, "html.parser")
-        subcategories_section = soup.find_all(element_name, class_=class_name)
-        return subcategories_section
+        return parse_targets(raw_html, element_name, class_name)
+
+    def extract(self, raw_html: str, spec_name: str) -> list[dict]:
+        """
+        Extract the fields declared by one of the `SITE_SPECS` of the site
+
+        Parameters
+        ----------
+        raw_html : str
+            The raw HTML of the page
+        spec_name : str
+            The name of the extraction spec, e.g. "toc"
+
+        Returns
+        -------
+        list[dict]
+            The fields of each extracted element
+        """
+        return extract(raw_html, SITE_SPECS[self.site_name][spec_name])
 
     def get_html_content(
         self, scraper_option: ScraperOption | None = None
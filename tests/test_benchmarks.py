@@ -0,0 +1,62 @@
+import os
+import sys
+
+import pymupdf
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "web")))
+
+from benchmarks.fakes import FakeGeminiModel
+from benchmarks.load_test import LoadTestConfig
+from benchmarks.load_test import run as run_load_test
+from benchmarks.synthetic_manual import SECTION_NAMES, generate_manual
+from chat_utils import determine_relevant_section_for_help
+
+
+def test_synthetic_manual_layout(tmp_path):
+    """Test the contents pages, outline and error code table of a generated manual."""
+    manual = generate_manual(tmp_path / "manual.pdf", pages=20, languages=("en", "de"))
+
+    with pymupdf.open(manual.path) as doc:
+        assert doc.page_count == manual.page_count
+        assert doc[manual.toc_pages["de"]].search_for("Inhalt")
+        assert len(doc.get_toc()) == 2 * (len(SECTION_NAMES) + 1)
+        start, _ = manual.sections["troubleshooting"]["en"]
+        table = doc[start].find_tables().tables[0]
+        assert table.extract()[1][0] == "E01"
+
+
+def test_fake_gemini_routes_to_matching_sections():
+    """Test that the fake model answers routing prompts deterministically."""
+    sections = determine_relevant_section_for_help(
+        FakeGeminiModel(),
+        [[name] for name in SECTION_NAMES],
+        "Troubleshooting a leak, is cleaning the filter needed?",
+        top_k=2,
+    )
+
+    assert sections == ["cleaning_and_caring", "troubleshooting"]
+
+
+def test_load_test_reports_percentiles_and_errors(tmp_path):
+    """Test a small load test run against the local stand-ins."""
+    config = LoadTestConfig(
+        requests=12,
+        customers=10,
+        models=2,
+        airtable_latency=0,
+        routing_latency=0,
+        first_token_latency=0,
+        chunk_latency=0,
+        chunks=3,
+        error_rate=0.5,
+    )
+
+    report = run_load_test(config, [1, 4], tmp_path)
+
+    for level in report["levels"]:
+        assert level["requests"] == 12
+        assert level["latency"]["p99"] >= level["latency"]["p50"] > 0
+        assert 0 < level["error_rate"] < 1
+        assert level["degraded_rate"] == 0
+        assert "chat_request.section_routing" in level["stages"]
@@ -0,0 +1,58 @@
+import os
+import sys
+
+import pymupdf
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks.synthetic_manual import generate_manual
+from helper.utils import ExtractorOption
+from pdfprocessor.boilerplate import find_boilerplate
+from pdfprocessor.parser import PdfManualParser
+
+
+def test_find_boilerplate_ignores_body_text(tmp_path):
+    """Test that the repeated header, legal notice and page numbers are found."""
+    manual = generate_manual(tmp_path / "manual.pdf", pages=24)
+
+    with pymupdf.open(manual.path) as document:
+        boilerplate = find_boilerplate(document)
+        page_number = manual.sections_for("en")["cleaning_and_caring"][0]
+        page = document[page_number]
+        texts = sorted(
+            page.get_text("text", clip=rect).strip()
+            for rect in boilerplate[page_number]
+        )
+
+    assert texts == [
+        str(page_number + 1),
+        "BEKO DIS15010 User Manual",
+        "© 2024 BEKO. DIS15010 Rev. 3, subject to change.",
+    ]
+
+
+def test_section_markdown_has_no_boilerplate(tmp_path, monkeypatch):
+    """Test that the legal notice is stripped from the markdown, not the content."""
+    monkeypatch.chdir(tmp_path)
+    manual = generate_manual("dataset/manual.pdf", pages=24)
+    section_name, page_span = list(manual.sections_for("en").items())[1]
+
+    def extract(strip_boilerplate):
+        parser = PdfManualParser(
+            "dataset/manual.pdf",
+            device="Dishwasher",
+            brand="BEKO",
+            toc_mapping_method=ExtractorOption.GEMINI,
+            model_number="DIS15010",
+            strip_boilerplate=strip_boilerplate,
+        )
+        return parser.extract_section_content(section_name, *page_span)["markdown_text"]
+
+    original, stripped = extract(False), extract(True)
+
+    assert "subject to change" in original
+    assert "subject to change" not in stripped
+    assert (
+        original.replace("© 2024 BEKO. DIS15010 Rev. 3, subject to change.", "").split()
+        == stripped.split()
+    )
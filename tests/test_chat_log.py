@@ -0,0 +1,96 @@
+import datetime
+import os
+import sys
+import threading
+import time
+
+import duckdb
+import pyarrow.parquet as pq
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "web")))
+
+from chat_log import CHAT_LOG_TABLE, ChatLogWriter
+
+
+def make_chat_log(i):
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "user_id": f"customer{i}@example.com",
+        "model_number": "DIS15010",
+        "product": "Dishwasher",
+        "messages": [{"role": "user", "content": "E15 error?"}],
+        "metadata": {
+            "gemini_prompt": "E15 error?",
+            "model_name": "gemini-2.0-flash-exp",
+            "gemini_response_time": 1.5,
+            "time_to_first_token": 0.4,
+        },
+    }
+
+
+def test_close_drains_queue_to_duckdb(tmp_path):
+    """Test that every queued log is saved to DuckDB on shutdown."""
+    path = tmp_path / "chat_logs.duckdb"
+    writer = ChatLogWriter(path, batch_size=7, flush_interval=60)
+
+    for i in range(25):
+        assert writer.write(make_chat_log(i))
+    writer.close()
+
+    with duckdb.connect(str(path)) as conn:
+        count, response_time = conn.execute(
+            f"SELECT count(*), avg(gemini_response_time) FROM {CHAT_LOG_TABLE}"
+        ).fetchone()
+    assert count == 25
+    assert response_time == 1.5
+
+
+def test_parquet_sink(tmp_path):
+    """Test that logs can be saved as Parquet files."""
+    writer = ChatLogWriter(tmp_path / "logs", sink="parquet", flush_interval=60)
+
+    for i in range(3):
+        writer.write(make_chat_log(i))
+    writer.close()
+
+    table = pq.read_table(tmp_path / "logs")
+    assert table.num_rows == 3
+    assert table.column("model_name").to_pylist() == ["gemini-2.0-flash-exp"] * 3
+
+
+def test_full_queue_drops_logs(tmp_path):
+    """Test that writes never block when the sink falls behind."""
+    writer = ChatLogWriter(
+        tmp_path / "chat_logs.duckdb", batch_size=1, max_queue_size=2
+    )
+    unblock = threading.Event()
+    flush = writer._flush
+    writer._flush = lambda batch: unblock.wait(5) and flush(batch)
+
+    results = [writer.write(make_chat_log(i)) for i in range(10)]
+    unblock.set()
+    writer.close()
+
+    assert results.count(False) == writer.dropped > 0
+
+
+def test_close_returns_when_the_queue_is_full(tmp_path):
+    """Test that close waits at most its timeout while the sink is stuck."""
+    writer = ChatLogWriter(
+        tmp_path / "chat_logs.duckdb", batch_size=1, max_queue_size=2
+    )
+    unblock = threading.Event()
+    flush = writer._flush
+    writer._flush = lambda batch: unblock.wait(5) and flush(batch)
+    while writer.write(make_chat_log(writer.dropped)):
+        pass
+
+    started = time.monotonic()
+    writer.close(timeout=0.2)
+    closing_time = time.monotonic() - started
+    unblock.set()
+    writer._thread.join(5)
+
+    assert closing_time < 1
+    assert not writer._thread.is_alive()
@@ -0,0 +1,102 @@
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "web")))
+
+from chat_pipeline import NO_CONTEXT_MESSAGE, ChatPipeline
+
+
+def slow(result, delay=0.2):
+    def _stage(*args):
+        time.sleep(delay)
+        return result
+
+    return _stage
+
+
+def test_product_lookup_and_toc_prefetch_overlap():
+    """Test that the stages depending only on the account run concurrently."""
+    pipeline = ChatPipeline(
+        lookup_account=lambda email: {
+            "brand": "BEKO",
+            "model_number": "DIS15010",
+            "product_id": "rec1",
+        },
+        lookup_product=slow("Dishwasher"),
+        fetch_table_of_contents=slow(["troubleshooting"]),
+        route_sections=lambda toc, question: toc,
+        fetch_sections=lambda *args: "Reset the dishwasher",
+    )
+
+    start = time.perf_counter()
+    chat_context = asyncio.run(pipeline.run("jane@example.com", "E15 error?"))
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.35, "Product lookup and TOC prefetch did not overlap."
+    assert chat_context.customer.product == "Dishwasher"
+    assert chat_context.section_names == ["troubleshooting"]
+    assert chat_context.context == "Reset the dishwasher"
+
+
+def test_stage_timeout_uses_fallback():
+    """Test that a slow routing stage falls back instead of blocking."""
+    pipeline = ChatPipeline(
+        lookup_account=lambda email: None,
+        lookup_product=lambda product_id: None,
+        fetch_table_of_contents=lambda brand, model_number: [],
+        route_sections=slow(["troubleshooting"], delay=1),
+        fetch_sections=lambda *args: "never used",
+        stage_timeouts={"section_routing": 0.05},
+    )
+
+    chat_context = asyncio.run(pipeline.run("jane@example.com", "E15 error?"))
+
+    assert chat_context.section_names == []
+    assert chat_context.context == NO_CONTEXT_MESSAGE
+
+
+def test_slow_context_assembly_falls_back_to_the_fetched_sections():
+    """Test that assembling the context has its own timeout, off the event loop."""
+    pipeline = ChatPipeline(
+        lookup_account=lambda email: {"brand": "BEKO", "model_number": "DIS15010"},
+        lookup_product=lambda product_id: "Dishwasher",
+        fetch_table_of_contents=lambda brand, model_number: ["troubleshooting"],
+        route_sections=lambda toc, question: toc,
+        fetch_sections=lambda *args: "Reset the dishwasher",
+        assemble_context=slow("Assembled", delay=1),
+        stage_timeouts={"context_assembly": 0.05},
+    )
+
+    start = time.perf_counter()
+    chat_context = asyncio.run(pipeline.run("jane@example.com", "E15 error?"))
+
+    assert time.perf_counter() - start < 0.5
+    assert chat_context.context == "Reset the dishwasher"
+
+
+def test_error_code_questions_skip_routing():
+    """Test that a direct error code answer skips section routing and fetching."""
+
+    def never_called(*args):
+        raise AssertionError("The question was routed to the sections.")
+
+    pipeline = ChatPipeline(
+        lookup_account=lambda email: {
+            "brand": "BEKO",
+            "model_number": "DIS15010",
+            "product_id": "rec1",
+        },
+        lookup_product=lambda product_id: "Dishwasher",
+        fetch_table_of_contents=lambda brand, model_number: ["troubleshooting"],
+        route_sections=never_called,
+        fetch_sections=never_called,
+        lookup_error_codes=lambda question, brand, model_number: "**E15**: Leak",
+    )
+
+    chat_context = asyncio.run(pipeline.run("jane@example.com", "E15 error?"))
+
+    assert chat_context.direct_answer == "**E15**: Leak"
+    assert chat_context.section_names == []
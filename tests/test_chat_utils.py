@@ -0,0 +1,83 @@
+import json
+import os
+import sys
+
+import duckdb
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "web")))
+
+from chat_utils import MODEL_DOCUMENTS_TABLE, SECTIONS_TABLE, get_column_value
+from context_builder import fetch_sections_markdown
+
+
+def insert(conn, table, records):
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (_airbyte_data JSON)")
+    conn.executemany(
+        f"INSERT INTO {table} VALUES (?)", [[json.dumps(r)] for r in records]
+    )
+
+
+def section(name, model_number=None, document_hash="abc123"):
+    return {
+        "brand": "BEKO",
+        "device": "Dishwasher",
+        "model_number": model_number,
+        "document_hash": document_hash,
+        "section_name": name,
+        "markdown_text": f"## {name}",
+    }
+
+
+def test_sections_are_shared_through_the_model_mapping():
+    """Test that every model linked to a document gets its single copy of the sections."""
+    conn = duckdb.connect()
+    insert(conn, SECTIONS_TABLE, [section("troubleshooting"), section("cleaning")])
+    # A model ingested before the mapping existed keeps its own copy
+    insert(conn, SECTIONS_TABLE, [section("installation", "DIS00001", "old")])
+    insert(
+        conn,
+        MODEL_DOCUMENTS_TABLE,
+        [
+            {"brand": "BEKO", "model_number": model, "document_hash": "abc123"}
+            for model in ("DIS15010", "DIS15011")
+        ],
+    )
+
+    for model in ("DIS15010", "DIS15011"):
+        toc = json.loads(get_column_value(conn, "section_name", "BEKO", model))
+        assert sorted(json.loads(name) for (name,) in toc) == [
+            "cleaning",
+            "troubleshooting",
+        ]
+    # Every upload of the manual links the model again
+    insert(
+        conn,
+        MODEL_DOCUMENTS_TABLE,
+        [
+            {
+                "brand": "BEKO",
+                "model_number": "DIS15010",
+                "document_hash": "abc123",
+                "linked_at": f"2025-01-1{day}T00:00:00+00:00",
+            }
+            for day in range(3)
+        ],
+    )
+    toc = json.loads(get_column_value(conn, "section_name", "BEKO", "DIS15010"))
+    assert len(toc) == 2
+    legacy = json.loads(get_column_value(conn, "section_name", "BEKO", "DIS00001"))
+    assert legacy == [['"installation"']]
+    assert fetch_sections_markdown(
+        conn, ["troubleshooting"], "BEKO", "Dishwasher", "DIS15011"
+    ) == [("troubleshooting", "## troubleshooting")]
+
+
+def test_sections_are_queried_by_model_without_the_mapping_table():
+    """Test that the per model records are used until the mapping is synced."""
+    conn = duckdb.connect()
+    insert(conn, SECTIONS_TABLE, [section("installation", "DIS00001")])
+
+    toc = get_column_value(conn, "section_name", "BEKO", "DIS00001", "Dishwasher")
+
+    assert json.loads(toc) == [['"installation"']]
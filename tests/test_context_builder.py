@@ -0,0 +1,64 @@
+import json
+import os
+import sys
+
+import duckdb
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "web")))
+
+from context_builder import build_context, estimate_tokens, fetch_sections_markdown
+
+TROUBLESHOOTING = "\n\n".join(
+    ["## Troubleshooting", "E15 error: water leak detected, turn off the tap."]
+    + [f"Filler paragraph {i} about the warranty terms." for i in range(200)]
+)
+CLEANING = "## Cleaning\n\nClean the filters once a week under running water."
+
+
+def test_fetch_sections_markdown_keeps_routing_order():
+    """Test that several sections are fetched in one query in routing order."""
+    conn = duckdb.connect()
+    conn.execute(
+        "CREATE TABLE _airbyte_raw_hackathon_manual_sections (_airbyte_data JSON)"
+    )
+    for section_name, markdown_text in [
+        ("troubleshooting", TROUBLESHOOTING),
+        ("cleaning_and_caring", CLEANING),
+    ]:
+        record = {
+            "brand": "BEKO",
+            "device": "Dishwasher",
+            "model_number": "DIS15010",
+            "section_name": section_name,
+            "markdown_text": markdown_text,
+        }
+        conn.execute(
+            "INSERT INTO _airbyte_raw_hackathon_manual_sections VALUES (?)",
+            [json.dumps(record)],
+        )
+
+    sections = fetch_sections_markdown(
+        conn,
+        ["cleaning_and_caring", "troubleshooting"],
+        "BEKO",
+        "Dishwasher",
+        "DIS15010",
+    )
+
+    assert [name for name, _ in sections] == ["cleaning_and_caring", "troubleshooting"]
+    assert sections[1][1] == TROUBLESHOOTING
+
+
+def test_build_context_stays_within_budget_and_cites_sources():
+    """Test that the most relevant paragraph is packed into a small budget."""
+    context = build_context(
+        "What does the E15 error mean?",
+        [("cleaning_and_caring", CLEANING), ("troubleshooting", TROUBLESHOOTING)],
+        token_budget=100,
+    )
+
+    assert estimate_tokens(context) <= 100
+    assert "[Source: troubleshooting]" in context
+    assert "E15 error: water leak detected" in context
+    assert "Filler paragraph 199" not in context
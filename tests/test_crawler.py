@@ -0,0 +1,131 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from scraper.crawler import Crawler, crawl
+from scraper.frontier import CrawlFrontier, PageStatus
+
+
+class GuideSite(BaseHTTPRequestHandler):
+    """Serves guide pages with ETags, failing the first requests to /flaky"""
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            server.hits[self.path] = server.hits.get(self.path, 0) + 1
+            hits = server.hits[self.path]
+        try:
+            time.sleep(0.05)
+            if self.path == "/flaky" and hits <= 2:
+                self.send_response(503)
+                self.send_header("Retry-After", "0")
+                self.end_headers()
+                return
+            if self.path == "/missing":
+                self.send_error(404)
+                return
+            etag = f'"{server.version}-{self.path}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            body = f"<html><body><div class='toc'>{self.path}</div></body></html>"
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(body.encode())
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def guide_site():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), GuideSite)
+    server.lock, server.active, server.max_active, server.hits = (
+        threading.Lock(),
+        0,
+        0,
+        {},
+    )
+    server.version = 1
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_crawl_saves_pages_within_the_host_limit(guide_site, tmp_path):
+    """Test that pages are fetched concurrently, bounded per host, and saved."""
+    server, base_url = guide_site
+    urls = [f"{base_url}/Guide/{i}" for i in range(20)]
+
+    results = crawl(urls, tmp_path, "DISHWASHER", per_host_limit=4)
+
+    assert [result.status for result in results] == [200] * 20
+    assert len({result.path for result in results}) == 20
+    assert all("DISHWASHER" in result.path for result in results)
+    assert open(results[3].path).read().count("/Guide/3") == 1
+    assert 1 < server.max_active <= 4
+
+
+def test_fetch_retries_transient_errors_only(guide_site):
+    """Test that 503s are retried with backoff and 404s are not."""
+    server, base_url = guide_site
+
+    async def fetch_all():
+        async with Crawler(retries=3, backoff=0.01) as crawler:
+            return await asyncio.gather(
+                crawler.fetch(f"{base_url}/flaky"), crawler.fetch(f"{base_url}/missing")
+            )
+
+    flaky, missing = asyncio.run(fetch_all())
+
+    assert (flaky.status, flaky.attempts, flaky.error) == (200, 3, None)
+    assert (missing.status, missing.attempts, missing.html) == (404, 1, None)
+    assert server.hits["/missing"] == 1
+
+
+def test_frontier_resumes_and_revalidates_pages(guide_site, tmp_path):
+    """Test that a crawl resumes pending pages and a refresh costs only 304s."""
+    server, base_url = guide_site
+    urls = [f"{base_url}/Guide/{i}" for i in range(6)]
+    frontier = CrawlFrontier(tmp_path / "frontier.sqlite")
+    frontier.add(urls)
+    # An interrupted crawl got through the first two pages
+    first = crawl(urls[:2], tmp_path, "DISHWASHER", frontier=frontier)
+    assert frontier.pending() == urls[2:]
+
+    resumed = crawl(None, tmp_path, "DISHWASHER", frontier=frontier)
+    assert [result.url for result in resumed] == urls[2:]
+    assert all(hits == 1 for hits in server.hits.values())
+
+    frontier.refresh()
+    refreshed = crawl(None, tmp_path, "DISHWASHER", frontier=frontier)
+    assert [result.status for result in refreshed] == [304] * 6
+    assert not any(result.changed for result in refreshed)
+    assert refreshed[0].path == first[0].path
+    assert len(list(tmp_path.glob("*/DISHWASHER/*.html"))) == 6
+
+    # A page with a new ETag but the same content is not saved again
+    server.version = 2
+    frontier.refresh()
+    revalidated = crawl(None, tmp_path, "DISHWASHER", frontier=frontier)
+    assert [result.status for result in revalidated] == [200] * 6
+    assert not any(result.changed for result in revalidated)
+    assert frontier.counts() == {PageStatus.DONE.value: 6}
+    assert frontier.get(urls[0]).etag == '"2-/Guide/0"'
@@ -0,0 +1,142 @@
+import json
+import os
+import re
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from pyairtable import Api
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "web")))
+
+from customer_profile import CustomerProfileService
+
+ACCOUNTS = [
+    {
+        "id": f"recAccount{i}",
+        "createdTime": "2025-01-01T00:00:00.000Z",
+        "fields": {
+            "Email": f"customer{i}@example.com",
+            "Brand Name": ["BEKO"],
+            "Product Model Number": [f"DIS{i:05d}"],
+            "Product Category": ["recDishwasher"],
+        },
+    }
+    for i in range(250)
+]
+PRODUCTS = [
+    {
+        "id": "recDishwasher",
+        "createdTime": "2025-01-01T00:00:00.000Z",
+        "fields": {"Name": "Dishwasher"},
+    }
+]
+
+
+class FakeAirtableHandler(BaseHTTPRequestHandler):
+    """A local stand-in for the list and get record endpoints of the Airtable API"""
+
+    requests = []
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        self.requests.append((url.path, params))
+        _, _, _, table_id, *record_id = url.path.split("/")
+        records = ACCOUNTS if table_id == "tblAccounts" else PRODUCTS
+
+        if record_id:
+            body = next(r for r in records if r["id"] == record_id[0])
+        else:
+            if "filterByFormula" in params:
+                email = re.search(r"\{Email\}='(.*)'", params["filterByFormula"][0])
+                records = [
+                    r for r in records if r["fields"].get("Email") == email.group(1)
+                ]
+            offset = int(params.get("offset", ["0"])[0])
+            page_size = int(params.get("pageSize", ["100"])[0])
+            body = {"records": records[offset : offset + page_size]}
+            if offset + page_size < len(records):
+                body["offset"] = str(offset + page_size)
+
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def airtable_api():
+    FakeAirtableHandler.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeAirtableHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield Api("fake-key", endpoint_url=f"http://127.0.0.1:{server.server_port}")
+    server.shutdown()
+
+
+def make_service(airtable_api, **kwargs):
+    return CustomerProfileService(
+        accounts_table=airtable_api.table("appBase", "tblAccounts"),
+        products_table=airtable_api.table("appBase", "tblProducts"),
+        **kwargs,
+    )
+
+
+def test_profile_lookup_filters_server_side_and_caches(airtable_api):
+    """Test that only the customer's record is requested, once per TTL."""
+    service = make_service(airtable_api)
+
+    for _ in range(3):
+        account = service.lookup_account("customer42@example.com")
+
+    assert account["model_number"] == "DIS00042"
+    assert service.lookup_product(account["product_id"]) == "Dishwasher"
+    account_requests = [
+        params for path, params in FakeAirtableHandler.requests if "tblAccounts" in path
+    ]
+    assert len(account_requests) == 1, "Cached profile was fetched again."
+    assert "filterByFormula" in account_requests[0]
+
+
+def test_unknown_email_returns_none(airtable_api):
+    """Test that an email without an account has no profile."""
+    service = make_service(airtable_api)
+
+    assert service.lookup_account("nobody@example.com") is None
+
+
+def test_unknown_email_is_cached_for_the_negative_ttl(airtable_api):
+    """Test that a missing account is requested once until it is invalidated."""
+    service = make_service(airtable_api)
+
+    for _ in range(3):
+        assert service.lookup_account("nobody@example.com") is None
+    service.invalidate("nobody@example.com")
+    assert service.lookup_account("nobody@example.com") is None
+
+    account_requests = [
+        path for path, _ in FakeAirtableHandler.requests if "tblAccounts" in path
+    ]
+    assert len(account_requests) == 2, "Missing account was fetched again."
+
+
+def test_snapshot_serves_profiles_without_airtable(airtable_api, tmp_path):
+    """Test that profiles are read from the local DuckDB snapshot."""
+    service = make_service(airtable_api, snapshot_db=str(tmp_path / "profiles.duckdb"))
+
+    assert service.refresh_snapshot() == len(ACCOUNTS)
+    FakeAirtableHandler.requests = []
+    profile = service.get_profile("customer7@example.com")
+
+    assert profile.product == "Dishwasher"
+    assert profile.model_number == "DIS00007"
+    assert FakeAirtableHandler.requests == []
@@ -0,0 +1,100 @@
+import json
+import os
+import sys
+
+import duckdb
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "web")))
+
+from benchmarks.synthetic_manual import ERROR_CODES, generate_manual
+from chat_utils import MODEL_DOCUMENTS_TABLE
+from error_codes import ERROR_CODES_TABLE, ErrorCodeIndex, find_codes
+from helper.utils import ExtractorOption
+from pdfprocessor.parser import PdfManualParser
+
+
+def insert(conn, table, records):
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (_airbyte_data JSON)")
+    conn.executemany(
+        f"INSERT INTO {table} VALUES (?)", [[json.dumps(r)] for r in records]
+    )
+
+
+def test_troubleshooting_tables_are_extracted(tmp_path, monkeypatch):
+    """Test that the error code table rows are extracted with the section."""
+    monkeypatch.chdir(tmp_path)
+    manual = generate_manual("dataset/manual.pdf", pages=30)
+    parser = PdfManualParser(
+        "dataset/manual.pdf",
+        device="Dishwasher",
+        brand="BEKO",
+        toc_mapping_method=ExtractorOption.GEMINI,
+        model_number="DIS15010",
+    )
+    page_span = manual.sections_for("en")["troubleshooting"]
+
+    error_codes = parser.extract_section_content("troubleshooting", *page_span)[
+        "error_codes"
+    ]
+    other = parser.extract_section_content(
+        "cleaning_and_caring", *manual.sections_for("en")["cleaning_and_caring"]
+    )
+
+    assert [
+        (row["code"], row["symptom"], row["cause"], row["remedy"])
+        for row in error_codes
+    ] == ERROR_CODES
+    assert {row["page"] for row in error_codes} == {page_span[0]}
+    assert other["error_codes"] == []
+
+
+def test_error_codes_are_answered_from_the_index():
+    """Test that a code of the customer's model is looked up, other questions are not."""
+    source = duckdb.connect()
+    insert(
+        source,
+        ERROR_CODES_TABLE,
+        [
+            {
+                "code": code,
+                "symptom": symptom,
+                "cause": cause,
+                "remedy": remedy,
+                "page": 16,
+                "section_name": "troubleshooting",
+                "document_hash": "abc123",
+            }
+            for code, symptom, cause, remedy in ERROR_CODES
+        ],
+    )
+    insert(
+        source,
+        MODEL_DOCUMENTS_TABLE,
+        [{"brand": "BEKO", "model_number": "DIS15010", "document_hash": "abc123"}],
+    )
+    index = ErrorCodeIndex(lambda: source)
+
+    assert index.refresh() == len(ERROR_CODES)
+    assert find_codes("My 2024 dishwasher shows e-15 and E24") == ["2024", "E15", "E24"]
+    answer = index.answer("E15 on my BEKO dishwasher", "BEKO", "DIS15010")
+    assert answer.startswith("**E15**: Water leak detected")
+    assert "Turn off the tap" in answer
+    assert index.answer("E15 on my BEKO dishwasher", "BEKO", "DIS99999") is None
+    assert index.answer("E99 on my BEKO dishwasher", "BEKO", "DIS15010") is None
+    assert (
+        index.answer(
+            "E15 came back after I cleaned the filter and reset the dishwasher, why?",
+            "BEKO",
+            "DIS15010",
+        )
+        is None
+    )
+
+
+def test_index_is_empty_before_the_first_sync():
+    """Test that a missing error codes table leaves the index empty."""
+    index = ErrorCodeIndex(lambda: duckdb.connect())
+
+    assert index.refresh() == 0
+    assert index.answer("E15?", "BEKO", "DIS15010") is None
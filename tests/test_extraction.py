@@ -0,0 +1,79 @@
+import os
+import sys
+
+import pytest
+from bs4 import BeautifulSoup
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import scraper.extraction as extraction
+from scraper.extraction import SITE_SPECS, extract, extract_files, parse_targets
+
+GUIDE_PAGE = """
+<html><body>
+<div class="step"><p>Remove the <b>screws</b> <a href="/x">here</a></p></div>
+<div class="toc main"><a href="/Guide/1">Replace the pump</a>
+<a href="/Guide/2">Clean the filter</a></div>
+<span class="toc">Not a div</span>
+<div class="tocs"><a href="/no">No</a></div>
+</body></html>
+"""
+
+
+@pytest.fixture(params=["lxml", "html.parser"])
+def html_parser(request, monkeypatch):
+    if request.param == "lxml":
+        pytest.importorskip("lxml")
+    monkeypatch.setattr(extraction, "HTML_PARSER", request.param)
+    return request.param
+
+
+def test_parse_targets_matches_a_full_parse(html_parser):
+    """Test that only parsing the targets finds the same elements as a full parse."""
+    expected = BeautifulSoup(GUIDE_PAGE, "html.parser").find_all("div", class_="toc")
+
+    targets = parse_targets(GUIDE_PAGE, "div", "toc")
+
+    assert [str(target) for target in targets] == [str(tag) for tag in expected]
+
+
+def test_parse_targets_of_any_element_and_xhtml_pages(html_parser):
+    """Test that every element is found without a tag or class, and XHTML pages parse."""
+    expected = BeautifulSoup(GUIDE_PAGE, "html.parser").find_all(True)
+    xhtml_page = '<?xml version="1.0" encoding="utf-8"?>\n' + GUIDE_PAGE
+
+    targets = parse_targets(GUIDE_PAGE, None, None)
+
+    assert [target.name for target in targets] == [tag.name for tag in expected]
+    assert targets[2].name == "div" and targets[2]["class"] == ["step"]
+    assert [str(target) for target in parse_targets(xhtml_page, "div", "toc")] == [
+        str(target) for target in parse_targets(GUIDE_PAGE, "div", "toc")
+    ]
+
+
+def test_site_spec_extracts_fields(html_parser):
+    """Test that a declarative spec extracts the text and links of each element."""
+    toc = extract(GUIDE_PAGE, SITE_SPECS["ifixit"]["toc"])
+
+    assert toc == [
+        {
+            "text": "Replace the pump Clean the filter",
+            "titles": ["Replace the pump", "Clean the filter"],
+            "links": ["/Guide/1", "/Guide/2"],
+        }
+    ]
+
+
+def test_extract_files_in_a_process_pool(tmp_path):
+    """Test that saved pages are extracted by worker processes in order."""
+    paths = []
+    for i in range(6):
+        path = tmp_path / f"file_{i}.html"
+        path.write_text(GUIDE_PAGE.replace("/Guide/1", f"/Guide/{i}"))
+        paths.append(path)
+
+    results = extract_files(paths, SITE_SPECS["ifixit"]["toc"], max_workers=2)
+
+    assert [result[0]["links"][0] for result in results] == [
+        f"/Guide/{i}" for i in range(6)
+    ]
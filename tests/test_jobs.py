@@ -0,0 +1,132 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from pdfprocessor.jobs import JobQueue, JobStatus, run_in_subprocess
+
+
+def wait_for(job_queue, job_ids, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        jobs = [job_queue.get(job_id) for job_id in job_ids]
+        if all(job.is_finished for job in jobs):
+            return jobs
+        time.sleep(0.01)
+    raise TimeoutError(f"Jobs did not finish: {jobs}")
+
+
+def parse_in_worker(job, progress):
+    progress("section_extraction", 0.5)
+    if job.brand == "crash":
+        # e.g. MuPDF aborting on a damaged manual
+        os._exit(1)
+    if job.brand == "fail":
+        raise ValueError("No table of contents found")
+    assert job.options["languages"] == ["de"]
+
+
+def test_jobs_run_in_background_at_bounded_concurrency(tmp_path):
+    """Test that submit returns at once and at most max_workers jobs run together."""
+    running, peak = 0, 0
+    lock = threading.Lock()
+    release = threading.Event()
+
+    def run_job(job, progress):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        progress("section_extraction", 0.5)
+        release.wait(5)
+        with lock:
+            running -= 1
+
+    job_queue = JobQueue(tmp_path / "state.sqlite", max_workers=2, run_job=run_job)
+    job_ids = [
+        job_queue.submit(f"manual_{i}.pdf", "BEKO", f"DIS{i}", "Dishwasher")
+        for i in range(5)
+    ]
+    time.sleep(0.1)
+    statuses = [job_queue.get(job_id).status for job_id in job_ids]
+    release.set()
+    jobs = wait_for(job_queue, job_ids)
+
+    assert statuses.count(JobStatus.RUNNING) == 2
+    assert statuses.count(JobStatus.QUEUED) == 3
+    assert peak == 2
+    assert all(job.status == JobStatus.SUCCEEDED for job in jobs)
+    assert (jobs[0].stage, jobs[0].progress) == ("done", 1.0)
+
+
+def test_failed_job_records_error_and_removes_pdf(tmp_path):
+    """Test that a failing job is marked as failed and its upload is cleaned up."""
+    pdf_path = tmp_path / "upload.pdf"
+    pdf_path.write_bytes(b"%PDF-1.7")
+
+    def run_job(job, progress):
+        progress("toc_extraction", 0.0)
+        raise ValueError("No table of contents found")
+
+    job_queue = JobQueue(tmp_path / "state.sqlite", run_job=run_job)
+    job_id = job_queue.submit(
+        pdf_path, "BEKO", "DIS15010", "Dishwasher", remove_pdf=True
+    )
+    (job,) = wait_for(job_queue, [job_id])
+
+    assert job.status == JobStatus.FAILED
+    assert (job.stage, job.error) == ("toc_extraction", "No table of contents found")
+    assert not pdf_path.exists()
+
+
+def test_restart_resubmits_queued_and_fails_running_jobs(tmp_path):
+    """Test the recovery of the jobs table after a restart."""
+    release = threading.Event()
+    job_queue = JobQueue(
+        tmp_path / "state.sqlite", max_workers=1, run_job=lambda *_: release.wait(5)
+    )
+    pdf_path = tmp_path / "a.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4")
+    running_id = job_queue.submit(
+        pdf_path, "BEKO", "DIS1", "Dishwasher", remove_pdf=True
+    )
+    queued_id = job_queue.submit("b.pdf", "BEKO", "DIS2", "Dishwasher")
+    time.sleep(0.1)
+
+    restarted = JobQueue(tmp_path / "state.sqlite", run_job=lambda *_: None)
+    (queued,) = wait_for(restarted, [queued_id])
+    assert not pdf_path.exists()
+    release.set()
+    job_queue.shutdown()
+
+    assert restarted.get(running_id).error == "Interrupted by a restart"
+    assert queued.status == JobStatus.SUCCEEDED
+
+
+def test_worker_processes_isolate_crashes(tmp_path):
+    """Test that jobs run in worker processes and a crashing worker fails its job."""
+    stages = []
+    job_queue = JobQueue(
+        tmp_path / "state.sqlite",
+        run_job=lambda job, progress: run_in_subprocess(
+            job,
+            lambda *event: stages.append(event) or progress(*event),
+            run_job=parse_in_worker,
+        ),
+    )
+    job_ids = [
+        job_queue.submit(
+            f"{brand}.pdf", brand, "DIS15010", "Dishwasher", languages=["de"]
+        )
+        for brand in ("BEKO", "fail", "crash")
+    ]
+    succeeded, failed, crashed = wait_for(job_queue, job_ids, timeout=60)
+
+    assert succeeded.status == JobStatus.SUCCEEDED
+    assert ("section_extraction", 0.5) in stages
+    assert failed.status == JobStatus.FAILED
+    assert failed.error == "ValueError: No table of contents found"
+    assert crashed.status == JobStatus.FAILED
+    assert "exited with code 1" in crashed.error
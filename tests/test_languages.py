@@ -0,0 +1,75 @@
+import os
+import sys
+
+import pymupdf
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks.synthetic_manual import generate_manual
+from helper.utils import ExtractorOption
+from pdfprocessor.languages import (
+    contents_keywords,
+    detect_language,
+    detect_page_languages,
+)
+from pdfprocessor.parser import PdfManualParser
+
+LANGUAGES = ("en", "de", "fr", "es", "it")
+
+
+def test_detect_language():
+    """Test that manual sentences are detected, and too little text is not."""
+    assert (
+        detect_language("Clean the filter if the water does not drain from the door.")
+        == "en"
+    )
+    assert (
+        detect_language("Reinigen Sie den Filter, wenn das Wasser nicht abläuft.")
+        == "de"
+    )
+    assert (
+        detect_language("Nettoyez le filtre si l'eau ne s'écoule pas par la porte.")
+        == "fr"
+    )
+    assert detect_language("E01 Drain pump") is None
+
+
+def test_page_languages_follow_language_blocks(tmp_path):
+    """Test that the contents page of each language is assigned to it."""
+    manual = generate_manual(tmp_path / "manual.pdf", pages=60, languages=LANGUAGES)
+
+    with pymupdf.open(manual.path) as document:
+        languages = detect_page_languages(document)
+
+    for language in LANGUAGES:
+        toc_page = manual.toc_pages[language]
+        _, last_page = manual.sections_for(language)["warranty"]
+        assert set(languages[toc_page:last_page]) == {language}
+    assert contents_keywords(["de", "it"]) == ["Inhalt", "Indice", "Sommario"]
+
+
+def test_extraction_is_restricted_to_target_languages(tmp_path, monkeypatch):
+    """Test that the localized contents page is found and other languages skipped."""
+    monkeypatch.chdir(tmp_path)
+    manual = generate_manual("dataset/manual.pdf", pages=60, languages=LANGUAGES)
+    parser = PdfManualParser(
+        "dataset/manual.pdf",
+        device="Dishwasher",
+        brand="BEKO",
+        toc_mapping_method=ExtractorOption.GEMINI,
+        model_number="DIS15010",
+        languages=["de"],
+    )
+
+    pages = parser._get_pages_with_content(
+        contents_keywords(parser.languages), parser._toc_search_pages()
+    )
+    # The last section of a table of contents runs to the end of the document
+    result = parser.extract_section_content("warranty", 0, None)
+
+    assert [page.number for page in pages] == [manual.toc_pages["de"]]
+    assert result["languages"] == ["de"]
+    assert "Spülmittel".lower() in result["markdown_text"].lower()
+    assert "détergent" not in result["markdown_text"]
+    assert "dishwasher" not in result["markdown_text"]
+    assert parser.extract_section_content("warranty", 0, 9) is None
@@ -0,0 +1,51 @@
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+CHECK_IMPORT = """
+import sys
+sys.path[:0] = [{root!r}, {web!r}]
+import {module}
+heavy = [name for name in {heavy!r} if name in sys.modules]
+assert not heavy, heavy
+"""
+
+
+def import_in_subprocess(
+    module: str, heavy=("google.generativeai", "google.genai", "pyairtable")
+) -> subprocess.CompletedProcess:
+    env = {
+        key: value
+        for key, value in os.environ.items()
+        if key not in ("GEMINI_API_KEY", "MOTHERDUCK_API_KEY")
+    }
+    code = CHECK_IMPORT.format(
+        root=REPO_ROOT, web=os.path.join(REPO_ROOT, "web"), module=module, heavy=heavy
+    )
+    return subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=REPO_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+
+
+def test_parser_imports_without_gemini():
+    """Test that the parser imports without an API key or the Gemini SDK."""
+    result = import_in_subprocess("pdfprocessor.parser")
+    assert result.returncode == 0, result.stderr
+
+
+def test_chatbot_imports_without_clients():
+    """Test that importing the chatbot creates no clients."""
+    result = import_in_subprocess("chatbot")
+    assert result.returncode == 0, result.stderr
+
+
+def test_utils_imports_without_boto3_or_duckdb():
+    """Test that the helpers import boto3 and DuckDB only when they are used."""
+    result = import_in_subprocess("helper.utils", heavy=("boto3", "duckdb"))
+    assert result.returncode == 0, result.stderr
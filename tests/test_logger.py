@@ -0,0 +1,37 @@
+import os
+import sys
+import uuid
+from logging.handlers import QueueHandler, RotatingFileHandler
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from helper import logger as logger_module
+from helper.logger import Logger
+
+
+def test_instances_share_one_queue_handler():
+    """Test that creating a Logger per module no longer duplicates handlers."""
+    loggers = [Logger().get_logger() for _ in range(5)]
+
+    assert all(logger is loggers[0] for logger in loggers)
+    assert [type(handler) for handler in loggers[0].handlers] == [QueueHandler]
+
+
+def test_records_are_written_by_the_listener():
+    """Test that queued records reach the log file exactly once."""
+    logger = Logger().get_logger()
+    listener = logger_module._listener
+    file_handler = next(
+        handler
+        for handler in listener.handlers
+        if isinstance(handler, RotatingFileHandler)
+    )
+
+    token = uuid.uuid4().hex
+    logger.info("Queued record %s", token)
+    # Stopping the listener drains the queue
+    listener.stop()
+    listener.start()
+
+    with open(file_handler.baseFilename) as log_file:
+        assert log_file.read().count(f"Queued record {token}") == 1
@@ -0,0 +1,66 @@
+import os
+import sys
+
+import pymupdf
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pdfprocessor.profiles as profiles_module
+from benchmarks.synthetic_manual import generate_manual
+from helper.utils import ExtractorOption
+from pdfprocessor.parser import PdfManualParser
+from pdfprocessor.profiles import convert_pages, get_profile
+
+
+@pytest.fixture
+def parser(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    manual = generate_manual("dataset/manual.pdf", pages=30)
+    parser = PdfManualParser(
+        "dataset/manual.pdf",
+        device="Dishwasher",
+        brand="BEKO",
+        toc_mapping_method=ExtractorOption.GEMINI,
+        model_number="DIS15010",
+        extraction_profile="balanced",
+    )
+    parser.manual = manual
+    return parser
+
+
+def test_balanced_profile_only_analyses_pages_with_graphics(parser, monkeypatch):
+    """Test that only the page with the error code table gets the layout analysis."""
+    calls = []
+    to_markdown = profiles_module.pymupdf4llm.to_markdown
+    monkeypatch.setattr(
+        profiles_module.pymupdf4llm,
+        "to_markdown",
+        lambda document, pages, **kwargs: calls.append(pages)
+        or to_markdown(document, pages=pages, **kwargs),
+    )
+    page_start, page_end = parser.manual.sections_for("en")["troubleshooting"]
+
+    balanced = parser.extract_section_content("troubleshooting", page_start, page_end)[
+        "markdown_text"
+    ]
+    full = parser.extract_section_content(
+        "troubleshooting", page_start, page_end, profile="full"
+    )["markdown_text"]
+
+    assert calls == [[page_start], list(range(page_start, page_end))]
+    assert balanced.split() == full.split()
+
+
+def test_fast_text_keeps_headers_and_text(parser):
+    """Test that the text blocks are converted with their header levels."""
+    page_number, _ = parser.manual.sections_for("en")["installation"]
+
+    with pymupdf.open(parser.pdf_path) as document:
+        full = convert_pages(document, [page_number], get_profile("full"))
+        fast = convert_pages(document, [page_number], get_profile("fast_text"))
+
+    assert fast.startswith("## Installation\n\n")
+    assert fast.split() == full.split()
+    with pytest.raises(ValueError):
+        get_profile("fastest")
@@ -0,0 +1,72 @@
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pdfprocessor.parser as parser_module
+from benchmarks.synthetic_manual import generate_manual
+from helper.utils import ExtractorOption
+from pdfprocessor.parser import PdfManualParser
+from pdfprocessor.registry import DocumentRegistry
+
+
+def make_parser(model_number, registry):
+    return PdfManualParser(
+        "dataset/manual.pdf",
+        device="Dishwasher",
+        brand="BEKO",
+        toc_mapping_method=ExtractorOption.GEMINI,
+        model_number=model_number,
+        registry=registry,
+    )
+
+
+def test_repeat_upload_relinks_sections_without_parsing(tmp_path, monkeypatch):
+    """Test that a known manual is linked to a new model without being parsed."""
+    monkeypatch.chdir(tmp_path)
+    manual = generate_manual("dataset/manual.pdf", pages=12)
+    sections = manual.sections_for("en")
+    saved = []
+    monkeypatch.setattr(
+        parser_module,
+        "save_file_to_s3",
+        lambda data, object_key, **kwargs: saved.append(str(object_key)),
+    )
+    registry = DocumentRegistry(tmp_path / "state.sqlite")
+
+    first = make_parser("DIS15010", registry)
+    first._extract_toc_map_from_img = lambda: SimpleNamespace(
+        simplified_toc_mapping=sections
+    )
+    first.save_all_sections_content()
+
+    second = make_parser("DIS15011", registry)
+
+    def parse_again():
+        raise AssertionError("The manual was parsed again")
+
+    second._extract_toc_map_from_img = parse_again
+    second.save_all_sections_content()
+    # A repeat upload for the same model is a no-op
+    make_parser("DIS15011", registry).save_all_sections_content()
+
+    document = registry.get(first.document_hash)
+    relinked = registry.section_records(first.document_hash, model_number="DIS15011")
+    assert document.models == [("BEKO", "DIS15010"), ("BEKO", "DIS15011")]
+    assert [record["section_name"] for record in relinked] == list(sections)
+    assert {record["model_number"] for record in relinked} == {"DIS15011"}
+    # The sections and error codes are saved once, then one mapping record per model
+    assert len(saved) == len(sections) + 3
+    assert all(
+        key.startswith(f"output/document_hash={first.document_hash}/")
+        for key in saved[: len(sections) + 1]
+    )
+    assert (
+        f"output/document_hash={first.document_hash}/error_codes/troubleshooting.jsonl"
+        in saved
+    )
+    assert saved[-2:] == [
+        "output/model_documents/brand=BEKO/model_number=DIS15010.json",
+        "output/model_documents/brand=BEKO/model_number=DIS15011.json",
+    ]
@@ -0,0 +1,152 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import duckdb
+import pymupdf
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "web")))
+
+import pdfprocessor.parser as parser_module
+from benchmarks.synthetic_manual import ERROR_CODES, generate_manual
+from chat_utils import MODEL_DOCUMENTS_TABLE, SECTIONS_TABLE
+from context_builder import fetch_sections_markdown
+from error_codes import ERROR_CODES_TABLE, ErrorCodeIndex
+from helper.utils import ExtractorOption
+from pdfprocessor.parser import PdfManualParser
+from pdfprocessor.registry import DocumentRegistry
+from pdfprocessor.revisions import plan_revision
+
+
+def test_plan_revision_shifts_sections_after_an_inserted_page():
+    """Test that only the section with an inserted page is marked as changed."""
+    previous = ["toc", "a1", "a2", "b1", "b2", "c1"]
+    revised = ["toc", "a1", "a2", "b1", "new", "b2", "c1"]
+    spans = {"a": (1, 3), "b": (3, 5), "c": (5, 6)}
+
+    plan = plan_revision(previous, revised, spans)
+
+    assert plan.unchanged == {"a": (1, 3), "c": (6, 7)}
+    assert plan.changed == {"b": (3, 6)}
+    assert plan.changed_pages == {4}
+    # A changed table of contents may move every section
+    assert plan_revision(previous, ["new toc", *revised[1:]], spans) is None
+
+
+def test_revised_manual_only_extracts_changed_sections(tmp_path, monkeypatch):
+    """Test that a revision carries over the sections whose pages did not change."""
+    monkeypatch.chdir(tmp_path)
+    manual = generate_manual("dataset/manual.pdf", pages=16)
+    sections = manual.sections_for("en")
+    monkeypatch.setattr(parser_module, "save_file_to_s3", lambda *args, **kwargs: True)
+    registry = DocumentRegistry(tmp_path / "state.sqlite")
+
+    def make_parser(pdf_path):
+        return PdfManualParser(
+            pdf_path,
+            device="Dishwasher",
+            brand="BEKO",
+            toc_mapping_method=ExtractorOption.GEMINI,
+            model_number="DIS15010",
+            registry=registry,
+        )
+
+    first = make_parser("dataset/manual.pdf")
+    first._extract_toc_map_from_img = lambda: SimpleNamespace(
+        simplified_toc_mapping=sections
+    )
+    first.save_all_sections_content()
+
+    revised_section, (page_start, _) = list(sections.items())[-1]
+    with pymupdf.open("dataset/manual.pdf") as document:
+        document[page_start].insert_text((72, 400), "Revised: descale monthly")
+        document.save("dataset/manual_rev2.pdf")
+    second = make_parser("dataset/manual_rev2.pdf")
+
+    def parse_again():
+        raise AssertionError("The table of contents was extracted again")
+
+    second._extract_toc_map_from_img = parse_again
+    extracted = []
+    extract_section_content = second.extract_section_content
+    second.extract_section_content = lambda name, *span: (
+        extracted.append(name) or extract_section_content(name, *span)
+    )
+    second.save_all_sections_content()
+
+    records = registry.section_records(second.document_hash)
+    assert extracted == [revised_section]
+    assert [record["section_name"] for record in records] == list(sections)
+    assert {record["document_hash"] for record in records} == {second.document_hash}
+    assert "descale monthly" in records[-1]["markdown_text"]
+    assert registry.section_spans(second.document_hash) == {
+        name: tuple(span) for name, span in sections.items()
+    }
+
+
+def test_models_only_see_the_revised_manual(tmp_path, monkeypatch):
+    """Test that the chat queries only return the sections of the latest revision."""
+    monkeypatch.chdir(tmp_path)
+    manual = generate_manual("dataset/manual.pdf", pages=30)
+    sections = manual.sections_for("en")
+    # The objects saved to S3 as synced by Airbyte, appended to the raw tables
+    conn = duckdb.connect()
+    for table in (SECTIONS_TABLE, MODEL_DOCUMENTS_TABLE, ERROR_CODES_TABLE):
+        conn.execute(f"CREATE TABLE {table} (_airbyte_data JSON)")
+
+    def save_file_to_s3(data, object_key, *args, **kwargs):
+        object_key = str(object_key)
+        if "/sections/" in object_key:
+            table = SECTIONS_TABLE
+        elif "/error_codes/" in object_key:
+            table = ERROR_CODES_TABLE
+        elif "model_documents/" in object_key:
+            table = MODEL_DOCUMENTS_TABLE
+        else:
+            return True
+        lines = data.decode("utf-8").splitlines()
+        conn.executemany(f"INSERT INTO {table} VALUES (?)", [[line] for line in lines])
+        return True
+
+    monkeypatch.setattr(parser_module, "save_file_to_s3", save_file_to_s3)
+    registry = DocumentRegistry(tmp_path / "state.sqlite")
+
+    def make_parser(pdf_path):
+        return PdfManualParser(
+            pdf_path,
+            device="Dishwasher",
+            brand="BEKO",
+            toc_mapping_method=ExtractorOption.GEMINI,
+            model_number="DIS15010",
+            registry=registry,
+        )
+
+    first = make_parser("dataset/manual.pdf")
+    first._extract_toc_map_from_img = lambda: SimpleNamespace(
+        simplified_toc_mapping=sections
+    )
+    first.save_all_sections_content()
+    revised_section, (page_start, _) = list(sections.items())[-1]
+    with pymupdf.open("dataset/manual.pdf") as document:
+        document[page_start].insert_text((72, 400), "Revised: descale monthly")
+        document.save("dataset/manual_rev2.pdf")
+    make_parser("dataset/manual_rev2.pdf").save_all_sections_content()
+
+    markdown = fetch_sections_markdown(
+        conn, [revised_section, "troubleshooting"], "BEKO", "Dishwasher", "DIS15010"
+    )
+    index = ErrorCodeIndex(lambda: conn)
+
+    assert sorted(name for name, _ in markdown) == sorted(
+        [revised_section, "troubleshooting"]
+    )
+    assert "descale monthly" in dict(markdown)[revised_section]
+    assert index.refresh() == len(ERROR_CODES)
+    # Both revisions are in the raw tables
+    assert (
+        conn.execute(
+            f"SELECT count(DISTINCT _airbyte_data->>'document_hash') FROM {SECTIONS_TABLE}"
+        ).fetchone()[0]
+        == 2
+    )
@@ -0,0 +1,98 @@
+import datetime
+import gzip
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import helper.serialization as serialization_module
+from helper.serialization import (
+    ChatLogRecord,
+    SectionRecord,
+    TocEntry,
+    decode,
+    encode,
+    encode_lines,
+)
+from pdfprocessor.parser import clean_toc_mapping
+
+
+@pytest.fixture(autouse=True, params=["orjson", "json"])
+def encoder(request, monkeypatch):
+    """Run every test with orjson and with the stdlib fallback"""
+    if request.param == "orjson":
+        assert serialization_module.orjson is not None
+    else:
+        monkeypatch.setattr(serialization_module, "orjson", None)
+    return request.param
+
+
+def make_section(**fields):
+    return {
+        "brand": "BEKO",
+        "section_name": "troubleshooting",
+        "markdown_text": "## Troubleshooting\n\nE15: Water leak détecté",
+        "document_hash": "abc123",
+        "model_number": None,
+        "device": "Dishwasher",
+        "languages": ["en"],
+        **fields,
+    }
+
+
+def test_records_round_trip_as_compact_json():
+    """Test that records are encoded compactly, gzipped or not, and decoded back."""
+    section = make_section()
+
+    data = encode(section, schema=SectionRecord)
+    compressed = encode(section, schema=SectionRecord, compress=True)
+
+    assert data == json.dumps(
+        section, separators=(",", ":"), ensure_ascii=False
+    ).encode("utf-8")
+    assert gzip.decompress(compressed) == data
+    assert decode(compressed) == decode(data) == section
+    assert decode(data, schema=SectionRecord) == SectionRecord(**section)
+    assert encode_lines([{"code": "E15"}, {"code": "E24"}]).count(b"\n") == 1
+    assert encode({"toc": {"page_number": 3}}, indent=True) == (
+        b'{\n  "toc": {\n    "page_number": 3\n  }\n}'
+    )
+
+
+def test_schema_drift_fails_at_encode_time():
+    """Test that renamed or missing fields and unsupported types are rejected."""
+    with pytest.raises(ValueError, match="SectionRecord"):
+        encode(make_section(markdown="renamed"), schema=SectionRecord)
+    with pytest.raises(ValueError, match="ChatLogRecord"):
+        encode({"user_id": "customer@example.com"}, schema=ChatLogRecord)
+    with pytest.raises(ValueError, match="languages is a str"):
+        encode(make_section(languages="en"), schema=SectionRecord)
+    with pytest.raises(ValueError, match="subsections"):
+        encode({"page_number": 3, "subsections": {"filters": "4"}}, schema=TocEntry)
+    assert encode(make_section(model_number="DIS15010"), schema=SectionRecord)
+    with pytest.raises(TypeError):
+        encode({"pages": {1, 2}})
+
+    timestamp = datetime.datetime(2025, 1, 15, tzinfo=datetime.timezone.utc)
+    assert decode(encode({"timestamp": timestamp})) == {
+        "timestamp": "2025-01-15T00:00:00+00:00"
+    }
+    assert decode(encode({"pages": {1, 2}}, default=sorted)) == {"pages": [1, 2]}
+
+
+def test_bad_toc_entries_are_skipped():
+    """Test that string page numbers are converted and only invalid entries dropped."""
+    toc_mapping = {
+        "installation": {"page_number": "4", "subsections": {"water_supply": "5"}},
+        "troubleshooting": {"page_number": 12, "subsections": {"error_codes": 13}},
+        "warranty": {"page_number": "last", "subsections": {}},
+        "notes": "see page 20",
+    }
+
+    assert clean_toc_mapping(toc_mapping) == {
+        "installation": {"page_number": 4, "subsections": {"water_supply": 5}},
+        "troubleshooting": {"page_number": 12, "subsections": {"error_codes": 13}},
+    }
@@ -0,0 +1,61 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "web")))
+
+from stream_renderer import ThrottledStreamRenderer
+
+
+class FakePlaceholder:
+    def __init__(self):
+        self.renders = []
+
+    def markdown(self, text):
+        self.renders.append(text)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_chunks_are_coalesced_and_flushed_on_completion():
+    """Test that renders are batched by size and the final answer has no cursor."""
+    placeholder = FakePlaceholder()
+    renderer = ThrottledStreamRenderer(
+        placeholder, flush_interval=10, flush_chars=20, clock=FakeClock()
+    )
+
+    full_response = renderer.render(["abcde"] * 10)
+
+    assert full_response == "abcde" * 10
+    assert len(placeholder.renders) == 3, "Expected two size flushes and a final one."
+    assert placeholder.renders[0] == "abcde" * 4 + "▌"
+    assert placeholder.renders[-1] == full_response
+
+
+def test_time_window_flush_and_time_to_first_token():
+    """Test that slow chunks are flushed by time and the first token is timed."""
+    placeholder = FakePlaceholder()
+    clock = FakeClock()
+    renderer = ThrottledStreamRenderer(
+        placeholder, flush_interval=0.05, flush_chars=1000, clock=clock
+    )
+
+    def chunks():
+        for chunk in ["Hello", " there", "!"]:
+            clock.now += 0.1
+            yield chunk
+
+    renderer.render(chunks(), start_time=0.0)
+
+    assert renderer.time_to_first_token == 0.1
+    assert placeholder.renders == [
+        "Hello▌",
+        "Hello there▌",
+        "Hello there!▌",
+        "Hello there!",
+    ]
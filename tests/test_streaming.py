@@ -0,0 +1,89 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pdfprocessor.parser as parser_module
+from benchmarks.synthetic_manual import generate_manual
+from helper.utils import ExtractorOption
+from pdfprocessor.parser import MEMORY_LIMITED_CHUNK_PAGES, PdfManualParser
+
+
+@pytest.fixture
+def manual(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return generate_manual("dataset/manual.pdf", pages=40)
+
+
+def make_parser(manual, **kwargs):
+    parser = PdfManualParser(
+        "dataset/manual.pdf",
+        device="Dishwasher",
+        brand="BEKO",
+        toc_mapping_method=ExtractorOption.GEMINI,
+        model_number="DIS15010",
+        **kwargs,
+    )
+    parser._extract_toc_map_from_img = lambda: SimpleNamespace(
+        simplified_toc_mapping=manual.sections_for("en")
+    )
+    return parser
+
+
+def test_sections_are_saved_as_soon_as_they_are_extracted(manual, monkeypatch):
+    """Test that each section is uploaded before the next one is extracted."""
+    events = []
+    monkeypatch.setattr(
+        parser_module,
+        "save_file_to_s3",
+        lambda data, object_key, **kwargs: events.append(
+            "save_error_codes" if "/error_codes/" in str(object_key) else "save"
+        ),
+    )
+    parser = make_parser(manual)
+    extract_section_content = parser.extract_section_content
+    parser.extract_section_content = lambda *args: (
+        events.append("extract") or extract_section_content(*args)
+    )
+
+    parser.save_all_sections_content()
+
+    expected = []
+    for section_name in manual.sections_for("en"):
+        expected += ["extract", "save"]
+        if section_name == "troubleshooting":
+            expected.append("save_error_codes")
+    # The model mapping record is saved last
+    assert events == expected + ["save"]
+
+
+def test_memory_limit_converts_chunks_and_reopens_the_document(manual, monkeypatch):
+    """Test that over the memory limit the document is reopened, then the run fails."""
+    calls = []
+    to_markdown = parser_module.pymupdf4llm.to_markdown
+    monkeypatch.setattr(
+        parser_module.pymupdf4llm,
+        "to_markdown",
+        lambda document, pages, **kwargs: calls.append(pages)
+        or to_markdown(document, pages=pages, **kwargs),
+    )
+    parser = make_parser(manual, memory_limit_mb=100)
+    page_start = 2
+    page_end = page_start + MEMORY_LIMITED_CHUNK_PAGES + 5
+    document = parser.document
+    # Over the limit, then back under it once the document is reopened
+    readings = iter([200 * 2**20, 50 * 2**20])
+    monkeypatch.setattr(parser_module, "resident_memory", lambda: next(readings))
+
+    result = parser.extract_section_content("manual", page_start, page_end)
+
+    assert [len(pages) for pages in calls] == [MEMORY_LIMITED_CHUNK_PAGES, 5]
+    assert parser.document is not document and not parser.document.is_closed
+    assert result["markdown_text"]
+
+    monkeypatch.setattr(parser_module, "resident_memory", lambda: 200 * 2**20)
+    with pytest.raises(MemoryError):
+        parser.release_memory()
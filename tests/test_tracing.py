@@ -0,0 +1,86 @@
+import json
+import os
+import sys
+import urllib.request
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from helper.tracing import (
+    SPAN_METRIC,
+    MetricsRegistry,
+    record,
+    run_report,
+    span,
+    stage,
+    start_metrics_server,
+)
+
+
+def test_nested_spans_are_recorded_under_their_path():
+    """Test that child spans are timed under the dotted path of their parent."""
+    registry = MetricsRegistry()
+
+    with span("chat_request", registry) as request_span:
+        with span("section_routing", registry):
+            pass
+        with span("gemini_stream", registry) as stream_span:
+            stream_span.set("candidates_tokens", 42)
+
+    assert [child.name for child in request_span.children] == [
+        "section_routing",
+        "gemini_stream",
+    ]
+    assert registry.histogram(SPAN_METRIC, span="chat_request.gemini_stream").count == 1
+    assert request_span.to_dict()["children"][1]["attributes"] == {
+        "candidates_tokens": 42
+    }
+
+
+def test_percentiles_and_prometheus_export():
+    """Test the quantiles of a histogram and their Prometheus rendering."""
+    registry = MetricsRegistry()
+    for value in range(1, 101):
+        registry.observe("stage_seconds", value / 100, stage="section_fetch")
+    registry.increment("gemini_tokens_total", 10, type="prompt")
+
+    summary = registry.summary()["histograms"]["stage_seconds"][0]
+    text = registry.to_prometheus()
+
+    assert (summary["p50"], summary["p95"], summary["p99"]) == (0.5, 0.95, 0.99)
+    assert 'stage_seconds{stage="section_fetch",quantile="0.95"} 0.95' in text
+    assert 'stage_seconds_count{stage="section_fetch"} 100' in text
+    assert 'gemini_tokens_total{type="prompt"} 10' in text
+
+
+def test_metrics_server_endpoints():
+    """Test that the metrics are served as Prometheus text and JSON."""
+    registry = MetricsRegistry()
+    registry.observe("stage_seconds", 0.25, stage="toc_prefetch")
+    server = start_metrics_server(0, host="127.0.0.1", registry=registry)
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    try:
+        with urllib.request.urlopen(f"{base_url}/metrics") as response:
+            assert b'stage_seconds_sum{stage="toc_prefetch"} 0.25' in response.read()
+        with urllib.request.urlopen(f"{base_url}/metrics.json") as response:
+            assert json.load(response)["histograms"]["stage_seconds"][0]["p50"] == 0.25
+    finally:
+        server.shutdown()
+
+
+def test_run_report_collects_stages_and_counters():
+    """Test that stages and counters are only recorded inside a run report."""
+    with stage("to_markdown"):
+        record("pages_processed", 10)
+
+    with run_report("DW603", brand="BEKO") as report:
+        for _ in range(3):
+            with stage("to_markdown"):
+                record("pages_processed", 10)
+        record("bytes_written", 2048)
+
+    report_dict = report.to_dict()
+    assert report_dict["brand"] == "BEKO"
+    assert report_dict["stages"]["to_markdown"]["calls"] == 3
+    assert report_dict["counters"] == {"pages_processed": 30, "bytes_written": 2048}
+    assert report_dict["duration"] >= report_dict["stages"]["to_markdown"]["seconds"]
@@ -1,11 +1,15 @@
+import hashlib
 import json
 import os
 import sys
 import tempfile
 
+from botocore.exceptions import ClientError
+
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from helper.utils import save_dict_to_json
+import helper.utils as utils_module
+from helper.utils import get_hash_from_data, get_hash_from_file, save_dict_to_json
 
 
 def test_save_dict_to_json_success():
@@ -63,3 +67,72 @@ def test_save_dict_to_json_invalid_path(capsys):
     assert (
         "Error saving data to JSON" in captured.out
     ), "Error message not printed for invalid path."
+
+
+class FakeS3Client:
+    """Stores the objects put in memory, with the ETag and metadata S3 returns"""
+
+    def __init__(self):
+        self.objects = {}
+        self.puts = []
+
+    def _error(self, code):
+        return ClientError({"Error": {"Code": code}}, "PutObject")
+
+    def head_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise self._error("404")
+        return self.objects[Key]
+
+    def put_object(self, Bucket, Key, Body, IfNoneMatch=None, **kwargs):
+        if IfNoneMatch == "*" and Key in self.objects:
+            raise self._error("PreconditionFailed")
+        body = Body.read() if hasattr(Body, "read") else Body
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.puts.append(Key)
+        self.objects[Key] = {
+            "ETag": f'"{hashlib.md5(body).hexdigest()}"',
+            "Metadata": kwargs.get("Metadata", {}),
+        }
+
+
+def test_hashes_match_the_etag_of_the_data():
+    """Test that files, bytes and strings hash to the MD5 of their content."""
+    with tempfile.NamedTemporaryFile() as temp_file:
+        temp_file.write(b"manual" * 10_000)
+        temp_file.flush()
+        temp_file.seek(0)
+        expected = hashlib.md5(b"manual" * 10_000).hexdigest()
+
+        assert get_hash_from_file(temp_file.name) == expected
+        assert get_hash_from_data(temp_file) == expected
+        assert temp_file.tell() == 0
+    with tempfile.NamedTemporaryFile() as empty_file:
+        assert get_hash_from_file(empty_file.name) == hashlib.md5(b"").hexdigest()
+    assert get_hash_from_data("manual") == hashlib.md5(b"manual").hexdigest()
+
+
+def test_unchanged_objects_are_not_uploaded_again(monkeypatch):
+    """Test that identical data is skipped and changed data is uploaded."""
+    s3_client = FakeS3Client()
+    monkeypatch.setattr(utils_module, "get_s3_client", lambda bucket_name: s3_client)
+
+    for data in (b'{"page": 1}', b'{"page": 1}', b'{"page": 2}'):
+        assert utils_module.save_file_to_s3(data, "toc.json", bucket_name="bucket")
+    # The same object created by another run after it was compared
+    get_stored_hashes = utils_module._get_stored_hashes
+    heads = []
+
+    def get_stored_hashes_after_race(*args):
+        heads.append(args)
+        return None if len(heads) == 1 else get_stored_hashes(*args)
+
+    monkeypatch.setattr(
+        utils_module, "_get_stored_hashes", get_stored_hashes_after_race
+    )
+    s3_client.objects["race.json"] = {"ETag": f'"{hashlib.md5(b"{}").hexdigest()}"'}
+    assert utils_module.save_file_to_s3(b"{}", "race.json", bucket_name="bucket")
+
+    assert s3_client.puts == ["toc.json", "toc.json"]
+    assert len(heads) == 2
@@ -0,0 +1,220 @@
+import atexit
+import datetime
+import queue
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import duckdb
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from helper.logger import Logger
+from helper.serialization import ChatLogRecord, encode_str, validate
+from helper.utils import auto_create_dir
+
+logger_instance = Logger()
+logger = logger_instance.get_logger()
+
+CHAT_LOG_TABLE = "chat_logs"
+CHAT_LOG_SCHEMA = pa.schema(
+    [
+        ("timestamp", pa.timestamp("us", tz="UTC")),
+        ("user_id", pa.string()),
+        ("model_number", pa.string()),
+        ("product", pa.string()),
+        ("model_name", pa.string()),
+        ("gemini_prompt", pa.string()),
+        ("gemini_response_time", pa.float64()),
+        ("time_to_first_token", pa.float64()),
+        ("messages", pa.string()),
+        ("metadata", pa.string()),
+    ]
+)
+
+_STOP = object()
+
+
+def chat_log_to_row(chat_log: dict | ChatLogRecord) -> dict:
+    """Flattens a chat log into a row of `CHAT_LOG_SCHEMA`"""
+    chat_log = validate(chat_log, ChatLogRecord)
+    metadata = chat_log.metadata
+    timestamp = chat_log.timestamp
+    if isinstance(timestamp, str):
+        timestamp = datetime.datetime.fromisoformat(timestamp)
+    return {
+        "timestamp": timestamp or datetime.datetime.now(datetime.timezone.utc),
+        "user_id": chat_log.user_id,
+        "model_number": chat_log.model_number,
+        "product": chat_log.product,
+        "model_name": metadata.get("model_name"),
+        "gemini_prompt": metadata.get("gemini_prompt"),
+        "gemini_response_time": metadata.get("gemini_response_time"),
+        "time_to_first_token": metadata.get("time_to_first_token"),
+        "messages": encode_str(chat_log.messages),
+        "metadata": encode_str(metadata, default=str),
+    }
+
+
+class ChatLogWriter:
+    """
+    Saves chat logs from a background thread without blocking the UI
+
+    `write` only puts the log on a bounded queue. A daemon thread batches the
+    queued logs and appends them to a local DuckDB table or to Parquet files
+    whenever `batch_size` logs are pending or `flush_interval` seconds have
+    passed. When the queue is full new logs are dropped and counted.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        sink: str = "duckdb",
+        batch_size: int = 100,
+        flush_interval: float = 5.0,
+        max_queue_size: int = 10_000,
+    ):
+        """
+        Parameters
+        ----------
+        path : str | Path
+            The DuckDB database file, or the directory for Parquet files
+        sink : str, optional
+            Either "duckdb" or "parquet", by default "duckdb"
+        batch_size : int, optional
+            The number of pending logs that triggers a flush, by default 100
+        flush_interval : float, optional
+            The maximum number of seconds a log waits to be flushed, by default 5.0
+        max_queue_size : int, optional
+            The maximum number of queued logs, by default 10 000
+        """
+        if sink not in ("duckdb", "parquet"):
+            raise ValueError(f"Unsupported chat log sink: {sink}")
+        self.path = Path(path)
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._closed = False
+        self._stop = threading.Event()
+
+        if sink == "duckdb":
+            auto_create_dir(self.path.parent)
+            with duckdb.connect(str(self.path)) as conn:
+                conn.execute(
+                    f"""
+                    CREATE TABLE IF NOT EXISTS {CHAT_LOG_TABLE} (
+                        timestamp TIMESTAMPTZ,
+                        user_id VARCHAR,
+                        model_number VARCHAR,
+                        product VARCHAR,
+                        model_name VARCHAR,
+                        gemini_prompt VARCHAR,
+                        gemini_response_time DOUBLE,
+                        time_to_first_token DOUBLE,
+                        messages JSON,
+                        metadata JSON
+                    )
+                    """
+                )
+        else:
+            auto_create_dir(self.path)
+
+        self._thread = threading.Thread(
+            target=self._run, name="chat-log-writer", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, chat_log: dict | ChatLogRecord) -> bool:
+        """
+        Queue a chat log to be saved
+
+        Returns
+        -------
+        bool
+            True if the log was queued, False if it was dropped
+
+        Raises
+        ------
+        ValueError
+            When the fields of the log are not those of `ChatLogRecord`
+        """
+        if self._closed:
+            return False
+        try:
+            self._queue.put_nowait(validate(chat_log, ChatLogRecord))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            logger.warning("Chat log queue is full, dropped %s logs", self.dropped)
+            return False
+
+    def close(self, timeout: float | None = 30) -> None:
+        """Flush the queued logs and stop the writer thread within `timeout` seconds"""
+        if self._closed:
+            return
+        self._closed = True
+        self._stop.set()
+        try:
+            # Wakes the writer thread, when the queue is full it is busy anyway
+            self._queue.put_nowait(_STOP)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+
+    def _drain(self) -> list[dict]:
+        """The logs still queued"""
+        items = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return items
+            if item is not _STOP:
+                items.append(item)
+
+    def _run(self) -> None:
+        batch: list[dict] = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                item = None
+
+            if item is not None and item is not _STOP:
+                batch.append(item)
+            if self._stop.is_set():
+                self._flush(batch + self._drain())
+                return
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._flush(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+    def _flush(self, batch: list[dict]) -> None:
+        if not batch:
+            return
+        try:
+            table = pa.Table.from_pylist(
+                [chat_log_to_row(chat_log) for chat_log in batch],
+                schema=CHAT_LOG_SCHEMA,
+            )
+            if self.sink == "duckdb":
+                with duckdb.connect(str(self.path)) as conn:
+                    conn.register("chat_log_batch", table)
+                    conn.execute(
+                        f"INSERT INTO {CHAT_LOG_TABLE} SELECT * FROM chat_log_batch"
+                    )
+            else:
+                timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+                pq.write_table(
+                    table,
+                    self.path / f"chat_logs_{timestamp}_{uuid.uuid4().hex}.parquet",
+                )
+            logger.info("Saved %s chat logs to %s", len(batch), self.path)
+        except Exception as e:
+            logger.error("Unable to save %s chat logs: %s", len(batch), e)
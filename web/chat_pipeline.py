@@ -0,0 +1,281 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from helper.logger import Logger
+from helper.tracing import metrics, span
+
+logger_instance = Logger()
+logger = logger_instance.get_logger()
+
+NO_CONTEXT_MESSAGE = (
+    "Apologies, for the issue you are currently experiencing. "
+    "One of our technicians will get in touch with you via phone"
+)
+
+# Seconds each stage may take before its fallback value is used instead
+DEFAULT_STAGE_TIMEOUTS = {
+    "account_lookup": 10.0,
+    "error_code_lookup": 2.0,
+    "product_lookup": 10.0,
+    "toc_prefetch": 10.0,
+    "section_routing": 20.0,
+    "section_fetch": 10.0,
+    "context_assembly": 5.0,
+}
+
+# Stages run on a shared pool rather than the loop's default executor, so a
+# stage that timed out cannot hold up `asyncio.run` while it finishes
+_stage_executor = ThreadPoolExecutor(thread_name_prefix="chat-stage")
+
+ANSWER_PROMPT = """Task:
+                    You are friendly support chatbot for helping customers troubleshoot given a user manual
+                    If unsure ask user to contact support via phone
+                    **Task:**
+                    Act like a conversational human, don't be too verbose but still answer the User's question here, given context:
+
+                    ```User question
+                    {user_question}
+                    ```
+
+                    ```Context
+                    {context}
+                    ```
+                    """
+
+
+@dataclass
+class CustomerContext:
+    email: str
+    brand: str | None = None
+    model_number: str | None = None
+    product: str | None = None
+    table_of_contents: list = field(default_factory=list)
+
+
+@dataclass
+class ChatContext:
+    question: str
+    customer: CustomerContext
+    section_names: list
+    context: Any
+    # Answered without the model, e.g. from the error code tables
+    direct_answer: str | None = None
+
+    @property
+    def prompt(self) -> str:
+        return ANSWER_PROMPT.format(user_question=self.question, context=self.context)
+
+
+async def run_stage(
+    name: str, func: Callable, *args, timeout: float | None, fallback: Any = None
+) -> Any:
+    """
+    Run a blocking pipeline stage in a worker thread
+
+    Parameters
+    ----------
+    name : str
+        The name of the stage, used for logging
+    func : Callable
+        The blocking function to run
+    args : tuple
+        The positional arguments passed to `func`
+    timeout : float | None
+        The number of seconds to wait for the stage, None waits forever
+    fallback : Any, optional
+        The value returned if the stage fails or times out, by default None
+
+    Returns
+    -------
+    Any
+        The result of the stage or the fallback
+    """
+    loop = asyncio.get_running_loop()
+    with span(name) as stage_span:
+        context = contextvars.copy_context()
+        stage = functools.partial(context.run, func, *args)
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(_stage_executor, stage), timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning(
+                "Stage %s timed out after %ss, using fallback", name, timeout
+            )
+            stage_span.set("fallback", "timeout")
+        except Exception as e:
+            logger.error("Stage %s failed, using fallback: %s", name, e)
+            stage_span.set("fallback", "error")
+    metrics.increment(
+        "chat_stage_fallbacks_total",
+        stage=name,
+        reason=stage_span.attributes["fallback"],
+    )
+    return fallback
+
+
+class ChatPipeline:
+    """
+    Runs the steps behind a chat answer as an asynchronous pipeline
+
+    Independent steps overlap, so the time to the first streamed token is
+    bounded by the critical path
+    account -> (product | TOC prefetch) -> section routing -> section fetch
+    instead of the sum of every call.
+    """
+
+    def __init__(
+        self,
+        lookup_account: Callable[[str], dict | None],
+        lookup_product: Callable[[str], str | None],
+        fetch_table_of_contents: Callable[[str, str], list],
+        route_sections: Callable[[list, str], list],
+        fetch_sections: Callable[[list, str, str, str], Any],
+        stage_timeouts: dict | None = None,
+        *,
+        assemble_context: Callable[[str, Any], Any] | None = None,
+        lookup_error_codes: Callable[[str, str, str], str | None] | None = None,
+    ):
+        """
+        Parameters
+        ----------
+        lookup_account : Callable[[str], dict | None]
+            Returns the `brand`, `model_number` and `product_id` of a customer email
+        lookup_product : Callable[[str], str | None]
+            Returns the product (device) name of a product id
+        fetch_table_of_contents : Callable[[str, str], list]
+            Returns the section names for a brand and model number
+        route_sections : Callable[[list, str], list]
+            Returns the section names relevant to a question
+        fetch_sections : Callable[[list, str, str, str], Any]
+            Returns the content of section names for a brand, device and model number
+        stage_timeouts : dict | None, optional
+            Overrides for `DEFAULT_STAGE_TIMEOUTS`
+        assemble_context : Callable[[str, Any], Any] | None, optional
+            Turns a question and the fetched content into the prompt context,
+            by default the fetched content is used as is
+        lookup_error_codes : Callable[[str, str, str], str | None] | None, optional
+            Returns the direct answer to a question about error codes for a
+            brand and model number, None to route it to the sections
+        """
+        self.lookup_account = lookup_account
+        self.lookup_product = lookup_product
+        self.fetch_table_of_contents = fetch_table_of_contents
+        self.route_sections = route_sections
+        self.fetch_sections = fetch_sections
+        self.assemble_context = assemble_context
+        self.stage_timeouts = {**DEFAULT_STAGE_TIMEOUTS, **(stage_timeouts or {})}
+        self.lookup_error_codes = lookup_error_codes
+
+    async def _stage(self, name: str, func: Callable, *args, fallback: Any = None):
+        return await run_stage(
+            name, func, *args, timeout=self.stage_timeouts.get(name), fallback=fallback
+        )
+
+    async def resolve_customer(self, email: str) -> CustomerContext:
+        """
+        Look up a customer's product and prefetch its table of contents
+
+        The product lookup and the TOC prefetch only depend on the account,
+        so both run concurrently once the account is known.
+        """
+        customer = CustomerContext(email=email)
+        account = await self._stage("account_lookup", self.lookup_account, email)
+        if not account:
+            logger.warning("No customer account found for %s", email)
+            return customer
+
+        customer.brand = account.get("brand")
+        customer.model_number = account.get("model_number")
+        customer.product, customer.table_of_contents = await asyncio.gather(
+            self._stage(
+                "product_lookup", self.lookup_product, account.get("product_id")
+            ),
+            self._stage(
+                "toc_prefetch",
+                self.fetch_table_of_contents,
+                customer.brand,
+                customer.model_number,
+                fallback=[],
+            ),
+        )
+        return customer
+
+    async def prepare(self, customer: CustomerContext, question: str) -> ChatContext:
+        """
+        Route a question to the relevant sections and fetch their content
+
+        Parameters
+        ----------
+        customer : CustomerContext
+            The customer, as returned by `resolve_customer`
+        question : str
+            The customer's question
+
+        Returns
+        -------
+        ChatContext
+            The question with the context to answer it, falls back to
+            `NO_CONTEXT_MESSAGE` when no relevant section could be found. An
+            error code found in the tables of the model is answered directly
+        """
+        if self.lookup_error_codes and customer.brand:
+            direct_answer = await self._stage(
+                "error_code_lookup",
+                self.lookup_error_codes,
+                question,
+                customer.brand,
+                customer.model_number,
+            )
+            if direct_answer:
+                metrics.increment("chat_direct_answers_total", source="error_codes")
+                return ChatContext(
+                    question=question,
+                    customer=customer,
+                    section_names=[],
+                    context=direct_answer,
+                    direct_answer=direct_answer,
+                )
+
+        section_names = await self._stage(
+            "section_routing",
+            self.route_sections,
+            customer.table_of_contents,
+            question,
+            fallback=[],
+        )
+        logger.info("These are the relevant sections %s", section_names)
+
+        context = None
+        if section_names:
+            context = await self._stage(
+                "section_fetch",
+                self.fetch_sections,
+                section_names,
+                customer.brand,
+                customer.product,
+                customer.model_number,
+            )
+        if context and self.assemble_context:
+            # The fetched content is used as is if it cannot be assembled
+            context = await self._stage(
+                "context_assembly",
+                self.assemble_context,
+                question,
+                context,
+                fallback=context,
+            )
+        return ChatContext(
+            question=question,
+            customer=customer,
+            section_names=section_names or [],
+            context=context or NO_CONTEXT_MESSAGE,
+        )
+
+    async def run(self, email: str, question: str) -> ChatContext:
+        customer = await self.resolve_customer(email)
+        return await self.prepare(customer, question)
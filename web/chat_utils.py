@@ -3,7 +3,6 @@ import os
 import sys
 
 import duckdb
-import google.generativeai as genai
 from dotenv import load_dotenv
 
 from helper.logger import Logger
@@ -15,6 +14,59 @@ load_dotenv()
 logger_instance = Logger()
 logger = logger_instance.get_logger()
 
+SECTIONS_TABLE = "_airbyte_raw_hackathon_manual_sections"
+MODEL_DOCUMENTS_TABLE = "_airbyte_raw_hackathon_model_documents"
+
+# The model documents table is append only, a model gets a new record every
+# time its manual is uploaded, so each model is linked to its latest document
+LATEST_MODEL_DOCUMENTS_CTE = f"""
+    latest_model_documents AS (
+        SELECT
+            _airbyte_data->>'brand' AS brand,
+            _airbyte_data->>'model_number' AS model_number,
+            _airbyte_data->>'document_hash' AS document_hash
+        FROM {MODEL_DOCUMENTS_TABLE}
+        QUALIFY row_number() OVER (
+            PARTITION BY _airbyte_data->>'brand', _airbyte_data->>'model_number'
+            ORDER BY TRY_CAST(_airbyte_data->>'linked_at' AS TIMESTAMPTZ) DESC NULLS LAST
+        ) = 1
+    )
+"""
+
+# Sections are stored once per document and linked to model numbers by the
+# model documents table. Models ingested before that have their own copies
+# of the sections, which are used until the model is linked to a document.
+MODEL_SECTIONS_CTE = f"""
+    WITH {LATEST_MODEL_DOCUMENTS_CTE},
+    model_sections AS (
+        SELECT sections._airbyte_data
+        FROM {SECTIONS_TABLE} sections
+        JOIN latest_model_documents models
+        ON (sections._airbyte_data->>'document_hash') = models.document_hash
+        WHERE models.brand = $brand
+        AND models.model_number = $model_number
+        UNION ALL
+        SELECT _airbyte_data
+        FROM {SECTIONS_TABLE}
+        WHERE (_airbyte_data->>'brand') = $brand
+        AND (_airbyte_data->>'model_number') = $model_number
+        AND NOT EXISTS (
+            SELECT 1 FROM {MODEL_DOCUMENTS_TABLE} linked
+            WHERE (linked._airbyte_data->>'brand') = $brand
+            AND (linked._airbyte_data->>'model_number') = $model_number
+        )
+    )
+"""
+# Until the model documents stream has been synced only the copies exist
+LEGACY_SECTIONS_CTE = f"""
+    WITH model_sections AS (
+        SELECT _airbyte_data
+        FROM {SECTIONS_TABLE}
+        WHERE (_airbyte_data->>'brand') = $brand
+        AND (_airbyte_data->>'model_number') = $model_number
+    )
+"""
+
 
 def get_duckdb_conn(db_name: str, api_key: str) -> duckdb.duckdb.DuckDBPyConnection:
     """
@@ -68,12 +120,42 @@ def get_query_results(
     return results
 
 
+def query_model_sections(
+    duckdb_conn: duckdb.duckdb.DuckDBPyConnection, query: str, parameters: dict
+) -> duckdb.duckdb.DuckDBPyConnection:
+    """
+    Run a query over the `model_sections` of a brand and model number
+
+    Parameters
+    ----------
+    duckdb_conn : duckdb.duckdb.DuckDBPyConnection
+        The connection to duckdb
+    query : str
+        The query, selecting from `model_sections`
+    parameters : dict
+        The named parameters of the query, including `brand` and `model_number`
+
+    Returns
+    -------
+    duckdb.duckdb.DuckDBPyConnection
+        The connection with the query results pending
+    """
+    parameters = {**parameters, "model_number": str(parameters["model_number"])}
+    try:
+        return duckdb_conn.execute(MODEL_SECTIONS_CTE + query, parameters)
+    except duckdb.CatalogException:
+        logger.debug(
+            "%s does not exist, querying sections by model", MODEL_DOCUMENTS_TABLE
+        )
+        return duckdb_conn.execute(LEGACY_SECTIONS_CTE + query, parameters)
+
+
 def get_column_value(
     duckdb_conn: duckdb.duckdb.DuckDBPyConnection,
     col_name: str,
     brand: str,
     model_number,
-    product,
+    product=None,
 ) -> list:
     """
     Query the Duckdb Database
@@ -82,8 +164,15 @@ def get_column_value(
     ----------
     duckdb_conn : duckdb.duckdb.DuckDBPyConnection
         The connection to duckdb
-    query : str
-        The SQL quuery
+    col_name : str
+        The column to return
+    brand : str
+        The brand of the device
+    model_number : str
+        The model number of the device
+    product : str, optional
+        The device type, if None the device filter is skipped so the
+        query can run before the product record has been looked up
 
     Returns
     -------
@@ -92,24 +181,17 @@ def get_column_value(
     """
     results = []
     try:
-        query = f"""
-            SELECT _airbyte_data.{col_name}
-            FROM
-            _airbyte_raw_hackathon_manual_sections
-            WHERE (_airbyte_data->>'brand')='{brand}'
-            AND (_airbyte_data->>'device')='{product}'
-            AND (_airbyte_data->>'model_number')='{model_number}'
-        """
-        # query = f"""
-        #     SELECT _airbyte_data.{col_name}
-        #     FROM
-        #     _airbyte_raw_hackathon_manual_sections
-        #     WHERE (_airbyte_data->>'brand')='BEKO'
-        #     AND (_airbyte_data->>'device')='Dishwasher'
-        #     AND (_airbyte_data->>'model_number')='DIS15010'
-        # """
-        logger.info(f"Query: {query}")
-        results = duckdb_conn.sql(query).fetchdf().to_json(orient="values")
+        parameters = {"brand": brand, "model_number": model_number}
+        query = f"SELECT _airbyte_data.{col_name} FROM model_sections"
+        if product:
+            query += " WHERE (_airbyte_data->>'device') = $device"
+            parameters["device"] = product
+        logger.debug("Query: %s", query)
+        results = (
+            query_model_sections(duckdb_conn, query, parameters)
+            .fetchdf()
+            .to_json(orient="values")
+        )
     except duckdb.duckdb.DatabaseError as db_error:
         logger.exception(f"Unable to query DB, check connection details{db_error}")
     return results
@@ -194,6 +276,9 @@ def create_model(model_name: str = "gemini-2.0-flash-exp", **kwargs):
     """
     generation_config = kwargs
 
+    # The SDK is slow to import, so it is only loaded once a model is needed
+    import google.generativeai as genai
+
     model = genai.GenerativeModel(
         model_name=model_name,
         generation_config=generation_config,
@@ -235,7 +320,7 @@ def does_user_need_asssitance(gemini_model, user_prompt) -> bool:
 
 
 def determine_relevant_section_for_help(
-    gemini_model, table_of_content: list, user_prompt: str
+    gemini_model, table_of_content: list, user_prompt: str, top_k: int = 1
 ) -> list:
     chat_session = gemini_model.start_chat(
         history=[
@@ -246,7 +331,7 @@ def determine_relevant_section_for_help(
                 You are an Expert Technician in electrical appliances and devices. You can quickly look at the table of contents of User manuals
                 and service manuals to highlight relevant sections that can help anyone troubleshoot or use a device.
 
-                Given this Table of contents list containing section names, can you give the top 1 section name where a user might
+                Given this Table of contents list containing section names, can you give the top {top_k} section names, most relevant first, where a user might
                 find the answer to this question. If you don't think there is any return an empty list.
 
                 {table_of_content}
@@ -281,15 +366,26 @@ def get_relevant_markdown_content(
     # Get content from motherduck
     result = []
     if helper_sections:
-        top_content_name = helper_sections[0]
-        query = f"""
+        query = """
             SELECT _airbyte_data.markdown_text
-            FROM
-            _airbyte_raw_hackathon_manual_sections
-            WHERE (_airbyte_data->>'brand')='{brand}'
-            AND (_airbyte_data->>'device')='{device}'
-            AND (_airbyte_data->>'model_number')='{model_number}'
-            AND (_airbyte_data->>'section_name')='{top_content_name}'
+            FROM model_sections
+            WHERE (_airbyte_data->>'device') = $device
+            AND (_airbyte_data->>'section_name') = $section_name
         """
-        result = get_query_results(motherduck_conn, query)
+        parameters = {
+            "brand": brand,
+            "model_number": model_number,
+            "device": device,
+            "section_name": helper_sections[0],
+        }
+        try:
+            result = (
+                query_model_sections(motherduck_conn, query, parameters)
+                .fetchdf()
+                .to_json(orient="values")
+            )
+        except duckdb.duckdb.DatabaseError as db_error:
+            logger.exception(
+                "Unable to query DB, check connection details %s", db_error
+            )
     return result
@@ -1,29 +1,44 @@
+import asyncio
 import datetime
+import functools
 import json
+import logging
 import os
 import sys
+import threading
+import time
 
-import boto3
 import streamlit as st
 import streamlit_authenticator as stauth
 import yaml
 from dotenv import load_dotenv
-from google import genai
 from yaml.loader import SafeLoader
 
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
+from chat_log import ChatLogWriter
+from chat_pipeline import ChatPipeline
 from chat_utils import (
     create_model,
     determine_relevant_section_for_help,
     get_column_value,
     get_duckdb_conn,
-    get_relevant_markdown_content,
     is_table_exists,
 )
+from context_builder import build_context, fetch_sections_markdown
+from customer_profile import CustomerProfileService
+from error_codes import ErrorCodeIndex
+from stream_renderer import ThrottledStreamRenderer
 
 from helper.logger import Logger
-from helper.utils import get_airtable_table
+from helper.tracing import (
+    current_span,
+    metrics,
+    span,
+    start_json_dump,
+    start_metrics_server,
+)
+from helper.utils import get_airtable_table, get_s3_client
 
 load_dotenv()
 
@@ -32,42 +47,75 @@ load_dotenv()
 logger_instance = Logger()
 logger = logger_instance.get_logger()
 
-gemini_model = create_model(
-    temperature=1,
-    top_p=0.95,
-    top_k=40,
-    max_output_tokens=8192,
-    response_mime_type="application/json",
-)
-
 proj_dir = os.path.dirname(__file__)
-is_table_created = False
-try:
-    motherduck_conn = get_duckdb_conn("my_db", os.environ["MOTHERDUCK_API_KEY"])
-    is_table_created = is_table_exists(
-        motherduck_conn, "main", "_airbyte_raw_hackathon_manual_sections"
+model_name: str = "gemini-2.0-flash-exp"
+ROUTING_TOP_K = int(os.getenv("ROUTING_TOP_K", "3"))
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))
+
+# The clients below are created on first use and shared by every session and
+# rerun of the process, so importing this module stays cheap
+
+
+@functools.lru_cache(maxsize=None)
+def get_gemini_model():
+    """Creates the process wide Gemini model used for section routing"""
+    return create_model(
+        temperature=1,
+        top_p=0.95,
+        top_k=40,
+        max_output_tokens=8192,
+        response_mime_type="application/json",
     )
-except Exception as motherduck_exception:
-    logger.exception(f"Cannot connect to motherduck {motherduck_exception}")
-
 
-try:
-    with open(f"{proj_dir}/auth.yml") as file:
-        config = yaml.load(file, Loader=SafeLoader)
-        logger.info("Loaded Auth file")
-except Exception as e:
-    logger.exception(f"Unable to read yaml file {e}")
 
+@functools.lru_cache(maxsize=None)
+def get_gemini_client():
+    """Creates the process wide Gemini client used to stream answers"""
+    from google import genai
 
-model_name: str = "gemini-2.0-flash-exp"
-
-try:
     client = genai.Client(api_key=os.environ["GEMINI_API_KEY"])
     logger.info("Set Gemini client")
-except KeyError as keyerror:
-    logger.exception(f"Issue setting up Gemini client {keyerror}")
-    st.error("Please set the GEMINI_API_KEY environment variable.")
-    st.stop()
+    return client
+
+
+@functools.lru_cache(maxsize=None)
+def get_motherduck_conn():
+    """Connects to MotherDuck once per process, None if it is unreachable"""
+    try:
+        return get_duckdb_conn("my_db", os.environ["MOTHERDUCK_API_KEY"])
+    except Exception as motherduck_exception:
+        logger.exception("Cannot connect to motherduck %s", motherduck_exception)
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def is_table_created() -> bool:
+    motherduck_conn = get_motherduck_conn()
+    if motherduck_conn is None:
+        return False
+    return is_table_exists(
+        motherduck_conn.cursor(), "main", "_airbyte_raw_hackathon_manual_sections"
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def load_auth_config() -> dict:
+    with open(f"{proj_dir}/auth.yml") as file:
+        config = yaml.load(file, Loader=SafeLoader)
+    logger.info("Loaded Auth file")
+    return config
+
+
+@functools.lru_cache(maxsize=None)
+def start_metrics_exporters() -> None:
+    """Starts the configured metrics exporters once per process"""
+    if os.getenv("METRICS_PORT"):
+        start_metrics_server(int(os.environ["METRICS_PORT"]))
+    if os.getenv("METRICS_JSON_PATH"):
+        start_json_dump(
+            os.environ["METRICS_JSON_PATH"],
+            interval=float(os.getenv("METRICS_JSON_INTERVAL", "60")),
+        )
 
 
 def upload_to_s3(file, bucket_name, brand, object_name=None):
@@ -81,7 +129,7 @@ def upload_to_s3(file, bucket_name, brand, object_name=None):
     """
     if object_name is None:
         object_name = f"dataset/{brand.upper()}/{file.name}"  # Add brand to object key
-    s3_client = boto3.client("s3")
+    s3_client = get_s3_client(bucket_name)
     try:
         s3_client.upload_fileobj(file, bucket_name, object_name)
         st.success("File uploaded 🎉")
@@ -89,13 +137,144 @@ def upload_to_s3(file, bucket_name, brand, object_name=None):
         st.error(f"Error uploading file: {e}")
 
 
+@functools.lru_cache(maxsize=None)
+def get_customer_profiles() -> CustomerProfileService:
+    """Creates the process wide customer profile service"""
+    customer_profiles = CustomerProfileService(
+        accounts_table=get_airtable_table(
+            table_id=os.environ["AIRTABLE_CUSTOMER_ACCOUNTS_TABLE_ID"]
+        ),
+        products_table=get_airtable_table(
+            table_id=os.environ["AIRTABLE_PRODUCT_TABLE_ID"]
+        ),
+        ttl=int(os.getenv("CUSTOMER_PROFILE_TTL", "300")),
+        snapshot_db=os.getenv("CUSTOMER_PROFILE_SNAPSHOT_DB"),
+    )
+    if os.getenv("CUSTOMER_PROFILE_SNAPSHOT_DB"):
+        customer_profiles.start_snapshot_refresh(
+            int(os.getenv("CUSTOMER_PROFILE_SNAPSHOT_INTERVAL", "3600"))
+        )
+    return customer_profiles
+
+
+_error_code_index: ErrorCodeIndex | None = None
+_error_code_index_lock = threading.Lock()
+
+
+def get_error_code_index() -> ErrorCodeIndex:
+    """
+    Loads the process wide error code index, then refreshes it in the background
+
+    Called at startup by `app`, so questions never wait for the first load.
+    The lock keeps concurrent first sessions from each loading an index.
+    """
+    global _error_code_index
+    with _error_code_index_lock:
+        if _error_code_index is None:
+            error_code_index = ErrorCodeIndex(lambda: get_motherduck_conn().cursor())
+            try:
+                error_code_index.refresh()
+            except Exception as e:
+                logger.error("Unable to load the error code index: %s", e)
+            error_code_index.start_refresh(
+                int(os.getenv("ERROR_CODE_INDEX_INTERVAL", "3600"))
+            )
+            _error_code_index = error_code_index
+    return _error_code_index
+
+
+@functools.lru_cache(maxsize=None)
+def get_chat_log_writer() -> ChatLogWriter:
+    """Creates the process wide chat log writer"""
+    return ChatLogWriter(
+        path=os.getenv("CHAT_LOG_PATH", ".chat_logs/chat_logs.duckdb"),
+        sink=os.getenv("CHAT_LOG_SINK", "duckdb"),
+    )
+
+
+def lookup_account(email: str) -> dict | None:
+    return get_customer_profiles().lookup_account(email)
+
+
+def lookup_product(product_id: str) -> str | None:
+    return get_customer_profiles().lookup_product(product_id)
+
+
+def fetch_table_of_contents(brand: str, model_number: str) -> list:
+    """Gets the section names of a model, each stage thread uses its own cursor"""
+    return get_column_value(
+        get_motherduck_conn().cursor(), "section_name", brand, model_number
+    )
+
+
+def lookup_error_codes(user_question: str, brand: str, model_number: str) -> str | None:
+    return get_error_code_index().answer(user_question, brand, model_number)
+
+
+def route_sections(table_of_contents: list, user_question: str) -> list:
+    return determine_relevant_section_for_help(
+        get_gemini_model(), table_of_contents, user_question, top_k=ROUTING_TOP_K
+    )
+
+
+def fetch_sections(
+    section_names: list, brand: str, device: str, model_number: str
+) -> list:
+    return fetch_sections_markdown(
+        get_motherduck_conn().cursor(), section_names, brand, device, model_number
+    )
+
+
+def assemble_context(user_question: str, sections: list) -> str:
+    return build_context(user_question, sections, token_budget=CONTEXT_TOKEN_BUDGET)
+
+
+chat_pipeline = ChatPipeline(
+    lookup_account=lookup_account,
+    lookup_product=lookup_product,
+    fetch_table_of_contents=fetch_table_of_contents,
+    route_sections=route_sections,
+    fetch_sections=fetch_sections,
+    assemble_context=assemble_context,
+    lookup_error_codes=lookup_error_codes,
+)
+
+
+def record_token_usage(usage_metadata, model: str) -> None:
+    """Records the token counts of a streamed response on the current span
+
+    Every streamed chunk carries the running totals, so the counters are
+    only incremented by the difference since the previous chunk.
+    """
+    request_span = current_span()
+    for token_type, count in (
+        ("prompt", usage_metadata.prompt_token_count),
+        ("candidates", usage_metadata.candidates_token_count),
+    ):
+        if not count:
+            continue
+        previous = (
+            request_span.attributes.get(f"{token_type}_tokens", 0)
+            if request_span
+            else 0
+        )
+        if count > previous:
+            metrics.increment(
+                "gemini_tokens_total", count - previous, model=model, type=token_type
+            )
+        if request_span:
+            request_span.set(f"{token_type}_tokens", count)
+
+
 def generate_text_with_gemini_stream(prompt, model="gemini-pro"):
     """Generates text using Gemini with streaming and robust error handling."""
     try:
-        response_stream = client.models.generate_content_stream(
+        response_stream = get_gemini_client().models.generate_content_stream(
             model=model, contents=prompt
         )
         for response in response_stream:
+            if response.usage_metadata:
+                record_token_usage(response.usage_metadata, model)
             if response.candidates:
                 for candidate in response.candidates:
                     if candidate.content.parts:
@@ -119,7 +298,18 @@ def generate_text_with_gemini_stream(prompt, model="gemini-pro"):
 
 
 def app():
+    start_metrics_exporters()
+    get_error_code_index()
     st.title("Anuja (Your favourite repair Chatbot)")
+    try:
+        config = load_auth_config()
+    except Exception as e:
+        logger.exception("Unable to read yaml file %s", e)
+        st.error("Unable to load the authentication settings.")
+        st.stop()
+    if not os.getenv("GEMINI_API_KEY"):
+        st.error("Please set the GEMINI_API_KEY environment variable.")
+        st.stop()
     authenticator = stauth.Authenticate(
         config["credentials"],
         config["cookie"]["name"],
@@ -142,36 +332,19 @@ def app():
             st.session_state.appliance_model = None
 
         def disable():
-            st.session_state.disabled = is_table_created
-
-        # Airtable
-        cs_accounts_table_obj = get_airtable_table(
-            table_id=os.environ["AIRTABLE_CUSTOMER_ACCOUNTS_TABLE_ID"]
-        )
-        cs_product_table_obj = get_airtable_table(
-            table_id=os.environ["AIRTABLE_PRODUCT_TABLE_ID"]
-        )
-
-        cs_accounts = cs_accounts_table_obj.all(
-            fields=["Product Category", "Email", "Product Model Number", "Brand Name"]
-        )
+            st.session_state.disabled = is_table_created()
 
-        for cs_account in cs_accounts:
-            if cs_account["fields"]["Email"] == st.session_state["username"]:
-                break
-        cs_product = cs_product_table_obj.get(
-            cs_account["fields"]["Product Category"][0],
+        # Airtable lookups run concurrently with the TOC prefetch
+        with span("resolve_customer"):
+            customer = asyncio.run(
+                chat_pipeline.resolve_customer(st.session_state["username"])
+            )
+        selected_product = st.selectbox("Select your Product:", [customer.product])
+        selected_model_number = st.selectbox(
+            "Select your Product:", [customer.model_number]
         )
-
-        cs_product_name = cs_product["fields"]["Name"]
-        cs_product_brand_name = cs_account["fields"]["Brand Name"][0]
-
-        cs_model_name = cs_account["fields"]["Product Model Number"][0]
-        selected_product = st.selectbox("Select your Product:", cs_product_name)
-        selected_model_number = st.selectbox("Select your Product:", cs_model_name)
         st.session_state.product = selected_product
         st.session_state.model_number = selected_model_number
-        # Airtable
 
         for message in st.session_state.messages:
             with st.chat_message(message["role"]):
@@ -182,62 +355,44 @@ def app():
             disabled=False,  # st.session_state.disabled,
             on_submit=disable,
         ):
-            table_of_contents = get_column_value(
-                motherduck_conn,
-                "section_name",
-                cs_product_brand_name,
-                selected_model_number,
-                selected_product,
-            )
-            logger.info(f"TOC {table_of_contents}")
-            relevant_section_names = determine_relevant_section_for_help(
-                gemini_model, table_of_contents, user_question
-            )
-
-            logger.info(f"These are the relevant sections {relevant_section_names}")
+            with span("chat_request") as request_span:
+                request_start = time.perf_counter()
+                chat_context = asyncio.run(
+                    chat_pipeline.prepare(customer, user_question)
+                )
 
-            if relevant_section_names:
-                md_text = get_relevant_markdown_content(
-                    motherduck_conn,
-                    relevant_section_names,
-                    cs_product_brand_name,
-                    selected_product,
-                    selected_model_number,
+                st.session_state.messages.append(
+                    {"role": "user", "content": user_question}
                 )
-            else:
-                md_text = "Apologies, for the issue you are currently experiencing. One of our technicians will get in touch with you via phone"
-
-            st.session_state.messages.append({"role": "user", "content": user_question})
-            with st.chat_message("user"):
-                st.markdown(user_question)
-
-            with st.chat_message("assistant", avatar="👷🏽‍♀️"):
-                message_placeholder = st.empty()
-                full_response = ""
-                start_time = datetime.datetime.now()
-                for text_chunk in generate_text_with_gemini_stream(
-                    f"""Task:
-                    You are friendly support chatbot for helping customers troubleshoot given a user manual
-                    If unsure ask user to contact support via phone
-                    **Task:**
-                    Act like a conversational human, don't be too verbose but still answer the User's question here, given context:
-
-                    ```User question
-                    {user_question}
-                    ```
-
-                    ```Context
-                    {md_text}
-                    ```
-                    """,
-                    model_name,
-                ):
-                    full_response += text_chunk
-                    message_placeholder.markdown(
-                        full_response + "▌"
-                    )  # Add a cursor for effect
-                message_placeholder.markdown(full_response)
-                end_time = datetime.datetime.now()
+                with st.chat_message("user"):
+                    st.markdown(user_question)
+
+                with st.chat_message("assistant", avatar="👷🏽‍♀️"):
+                    renderer = ThrottledStreamRenderer(st.empty())
+                    start_time = datetime.datetime.now()
+                    # Error code lookups are answered without calling Gemini
+                    if chat_context.direct_answer:
+                        stream_name = "direct_answer"
+                        chunks = [chat_context.direct_answer]
+                    else:
+                        stream_name = "gemini_stream"
+                        chunks = generate_text_with_gemini_stream(
+                            chat_context.prompt, model_name
+                        )
+                    with span(stream_name):
+                        full_response = renderer.render(
+                            chunks, start_time=request_start
+                        )
+                    end_time = datetime.datetime.now()
+
+            if renderer.time_to_first_token is not None:
+                metrics.observe(
+                    "chat_time_to_first_token_seconds",
+                    renderer.time_to_first_token,
+                    model=model_name,
+                )
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("Chat request trace %s", request_span.to_dict())
 
             st.session_state.messages.append(
                 {"role": "assistant", "content": full_response}
@@ -248,13 +403,16 @@ def app():
                 "user_id": st.session_state.username,
                 "model_number": st.session_state.model_number,
                 "product": st.session_state.product,
-                "messages": st.session_state.messages,
+                "messages": list(st.session_state.messages),
                 "metadata": {
                     "gemini_prompt": user_question,
+                    "model_name": model_name,
                     "gemini_response_time": (end_time - start_time).total_seconds(),
+                    "time_to_first_token": renderer.time_to_first_token,
+                    "direct_answer": chat_context.direct_answer is not None,
                 },
             }
-            # save_chat_log(chat_log)
+            get_chat_log_writer().write(chat_log)
         elif st.session_state["authentication_status"] is False:
             st.error("Username/password is incorrect")
         elif st.session_state["authentication_status"] is None:
@@ -0,0 +1,248 @@
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+
+import duckdb
+
+from chat_utils import query_model_sections
+
+from helper.logger import Logger
+
+logger_instance = Logger()
+logger = logger_instance.get_logger()
+
+DEFAULT_TOKEN_BUDGET = 2000
+# Rough number of characters per token for English text with Gemini
+CHARS_PER_TOKEN = 4
+MAX_PARAGRAPH_TOKENS = 300
+
+SECTIONS_QUERY = """
+    SELECT _airbyte_data->>'section_name' AS section_name,
+           _airbyte_data->>'markdown_text' AS markdown_text
+    FROM model_sections
+    WHERE (_airbyte_data->>'device') = $device
+    AND list_contains($section_names, _airbyte_data->>'section_name')
+"""
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "can", "do", "does",
+    "for", "from", "has", "have", "how", "i", "if", "in", "is", "it", "its", "me",
+    "my", "not", "of", "on", "or", "so", "that", "the", "there", "this", "to",
+    "what", "when", "where", "which", "why", "will", "with", "you", "your",
+}  # fmt: skip
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+@dataclass
+class Paragraph:
+    section_name: str
+    section_rank: int
+    position: int
+    text: str
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text)
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _terms(text: str) -> list[str]:
+    return [
+        word for word in WORD_PATTERN.findall(text.lower()) if word not in STOPWORDS
+    ]
+
+
+def fetch_sections_markdown(
+    duckdb_conn: duckdb.duckdb.DuckDBPyConnection,
+    section_names: list,
+    brand: str,
+    device: str,
+    model_number: str,
+) -> list[tuple[str, str]]:
+    """
+    Fetch the markdown of several sections in one query
+
+    Parameters
+    ----------
+    duckdb_conn : duckdb.duckdb.DuckDBPyConnection
+        The connection to duckdb
+    section_names : list
+        The candidate section names, most relevant first
+    brand : str
+        The brand of the device
+    device : str
+        The device type
+    model_number : str
+        The model number of the device
+
+    Returns
+    -------
+    list[tuple[str, str]]
+        The (section name, markdown) pairs in the order of `section_names`
+    """
+    if not section_names:
+        return []
+    parameters = {
+        "brand": brand,
+        "model_number": model_number,
+        "device": device,
+        "section_names": list(section_names),
+    }
+    try:
+        rows = query_model_sections(duckdb_conn, SECTIONS_QUERY, parameters).fetchall()
+    except duckdb.duckdb.DatabaseError as db_error:
+        logger.exception(f"Unable to query DB, check connection details{db_error}")
+        return []
+    rank = {name: i for i, name in enumerate(section_names)}
+    return sorted(rows, key=lambda row: rank.get(row[0], len(rank)))
+
+
+def split_paragraphs(
+    section_name: str,
+    markdown_text: str,
+    section_rank: int = 0,
+    max_paragraph_tokens: int = MAX_PARAGRAPH_TOKENS,
+) -> list[Paragraph]:
+    """
+    Split a section's markdown into paragraphs
+
+    Headings are kept with the paragraph that follows them and paragraphs
+    longer than `max_paragraph_tokens` are split on line boundaries.
+    """
+    paragraphs = []
+    heading = ""
+    for block in re.split(r"\n\s*\n", markdown_text or ""):
+        block = block.strip()
+        if not block:
+            continue
+        if block.startswith("#") and "\n" not in block:
+            heading = f"{heading}\n{block}" if heading else block
+            continue
+        if heading:
+            block = f"{heading}\n{block}"
+            heading = ""
+
+        chunk = []
+        for line in block.splitlines():
+            chunk.append(line)
+            if estimate_tokens("\n".join(chunk)) >= max_paragraph_tokens:
+                paragraphs.append("\n".join(chunk))
+                chunk = []
+        if chunk:
+            paragraphs.append("\n".join(chunk))
+    if heading:
+        paragraphs.append(heading)
+
+    return [
+        Paragraph(section_name, section_rank, position, text)
+        for position, text in enumerate(paragraphs)
+    ]
+
+
+def rank_paragraphs(
+    question: str, paragraphs: list[Paragraph], k1: float = 1.5, b: float = 0.75
+) -> list[Paragraph]:
+    """
+    Rank paragraphs by their BM25 score against the question
+
+    Ties, including questions sharing no terms with the manual, are broken
+    by the routing rank of the section and then the position in it.
+    """
+    if not paragraphs:
+        return []
+    question_terms = set(_terms(question))
+    paragraph_terms = [Counter(_terms(p.text)) for p in paragraphs]
+    average_length = sum(sum(t.values()) for t in paragraph_terms) / len(paragraphs)
+    document_frequency = Counter(
+        term for terms in paragraph_terms for term in question_terms & terms.keys()
+    )
+
+    def score(terms: Counter) -> float:
+        length = sum(terms.values())
+        total = 0.0
+        for term in question_terms & terms.keys():
+            idf = math.log(
+                1
+                + (len(paragraphs) - document_frequency[term] + 0.5)
+                / (document_frequency[term] + 0.5)
+            )
+            frequency = terms[term]
+            total += (
+                idf
+                * frequency
+                * (k1 + 1)
+                / (frequency + k1 * (1 - b + b * length / (average_length or 1)))
+            )
+        return total
+
+    scores = [score(terms) for terms in paragraph_terms]
+    order = sorted(
+        range(len(paragraphs)),
+        key=lambda i: (
+            -scores[i],
+            paragraphs[i].section_rank,
+            paragraphs[i].position,
+        ),
+    )
+    return [paragraphs[i] for i in order]
+
+
+def build_context(
+    question: str,
+    sections: list[tuple[str, str]],
+    token_budget: int = DEFAULT_TOKEN_BUDGET,
+) -> str:
+    """
+    Pack the paragraphs most relevant to a question into a token budget
+
+    Parameters
+    ----------
+    question : str
+        The customer's question
+    sections : list[tuple[str, str]]
+        The (section name, markdown) candidates, most relevant first
+    token_budget : int, optional
+        The maximum estimated number of tokens of the context, by default 2000
+
+    Returns
+    -------
+    str
+        The selected paragraphs grouped by section in reading order, each
+        group headed by a `[Source: section_name]` citation
+    """
+    paragraphs = [
+        paragraph
+        for section_rank, (section_name, markdown_text) in enumerate(sections)
+        for paragraph in split_paragraphs(section_name, markdown_text, section_rank)
+    ]
+
+    selected = []
+    used_tokens = 0
+    for paragraph in rank_paragraphs(question, paragraphs):
+        citation_tokens = estimate_tokens(f"[Source: {paragraph.section_name}]\n")
+        if used_tokens + paragraph.tokens + citation_tokens > token_budget:
+            continue
+        selected.append(paragraph)
+        used_tokens += paragraph.tokens + citation_tokens
+
+    selected.sort(key=lambda p: (p.section_rank, p.position))
+    blocks = []
+    current_section = None
+    for paragraph in selected:
+        if paragraph.section_name != current_section:
+            blocks.append(f"[Source: {paragraph.section_name}]")
+            current_section = paragraph.section_name
+        blocks.append(paragraph.text)
+
+    logger.info(
+        "Packed %s of %s paragraphs into ~%s tokens",
+        len(selected),
+        len(paragraphs),
+        used_tokens,
+    )
+    return "\n\n".join(blocks)
@@ -0,0 +1,276 @@
+import datetime
+import threading
+from dataclasses import asdict, dataclass
+
+import duckdb
+from cachetools import TTLCache
+
+from helper.logger import Logger
+
+logger_instance = Logger()
+logger = logger_instance.get_logger()
+
+ACCOUNT_FIELDS = ["Product Category", "Email", "Product Model Number", "Brand Name"]
+SNAPSHOT_TABLE = "customer_profiles"
+
+
+@dataclass
+class CustomerProfile:
+    email: str
+    brand: str | None
+    model_number: str | None
+    product_id: str | None
+    product: str | None = None
+
+
+def _first(fields: dict, name: str) -> str | None:
+    """Airtable lookup fields are lists, returns the first value"""
+    value = fields.get(name)
+    if isinstance(value, list):
+        return value[0] if value else None
+    return value
+
+
+class CustomerProfileService:
+    """
+    Looks up customer profiles in Airtable by email
+
+    Accounts are queried with a server-side formula so only the customer's
+    record is downloaded, and results are cached per user for `ttl` seconds.
+    Emails without an account are remembered for the shorter `negative_ttl`
+    so repeated misses do not each query Airtable.
+    Optionally, a periodic snapshot of all accounts is kept in a local DuckDB
+    table indexed by email and used before falling back to Airtable.
+    """
+
+    def __init__(
+        self,
+        accounts_table,
+        products_table,
+        ttl: int = 300,
+        negative_ttl: int = 30,
+        max_profiles: int = 10_000,
+        snapshot_db: str | None = None,
+    ):
+        """
+        Parameters
+        ----------
+        accounts_table : pyairtable.Table
+            The Airtable customer accounts table
+        products_table : pyairtable.Table
+            The Airtable products table
+        ttl : int, optional
+            The number of seconds a profile is cached for, by default 300
+        negative_ttl : int, optional
+            The number of seconds an email without an account is cached for,
+            by default 30
+        max_profiles : int, optional
+            The maximum number of cached profiles, by default 10 000
+        snapshot_db : str | None, optional
+            The path to a local DuckDB file holding account snapshots, by default None
+        """
+        self.accounts_table = accounts_table
+        self.products_table = products_table
+        self._profiles = TTLCache(maxsize=max_profiles, ttl=ttl)
+        self._products = TTLCache(maxsize=max_profiles, ttl=ttl)
+        self._misses = TTLCache(maxsize=max_profiles, ttl=negative_ttl)
+        self._lock = threading.Lock()
+        self._snapshot_conn = None
+        self._snapshot_lock = threading.Lock()
+        self._stop_refresh = threading.Event()
+        if snapshot_db:
+            self._snapshot_conn = duckdb.connect(snapshot_db)
+            self._snapshot_conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {SNAPSHOT_TABLE} (
+                    email VARCHAR,
+                    brand VARCHAR,
+                    model_number VARCHAR,
+                    product_id VARCHAR,
+                    product VARCHAR,
+                    refreshed_at TIMESTAMP
+                )
+                """
+            )
+            self._snapshot_conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {SNAPSHOT_TABLE}_email_idx "
+                f"ON {SNAPSHOT_TABLE} (email)"
+            )
+
+    def get_profile(self, email: str) -> CustomerProfile | None:
+        """
+        Get a customer's profile, from the cache, the snapshot or Airtable
+
+        Parameters
+        ----------
+        email : str
+            The email the customer logs in with
+
+        Returns
+        -------
+        CustomerProfile | None
+            The customer's profile, or None if no account uses this email
+        """
+        with self._lock:
+            profile = self._profiles.get(email)
+            missed = email in self._misses
+        if profile or missed:
+            return profile
+
+        profile = self._get_profile_from_snapshot(email)
+        if profile is None:
+            profile = self._get_profile_from_airtable(email)
+
+        with self._lock:
+            if profile:
+                self._profiles[email] = profile
+            else:
+                self._misses[email] = True
+        return profile
+
+    def get_product_name(self, product_id: str | None) -> str | None:
+        """Get the name of a product, cached like the profiles"""
+        if not product_id:
+            return None
+        with self._lock:
+            name = self._products.get(product_id)
+        if name:
+            return name
+        product = self.products_table.get(product_id)
+        name = product["fields"].get("Name")
+        with self._lock:
+            self._products[product_id] = name
+        return name
+
+    def lookup_account(self, email: str) -> dict | None:
+        """The `lookup_account` stage of the chat pipeline"""
+        profile = self.get_profile(email)
+        return asdict(profile) if profile else None
+
+    def lookup_product(self, product_id: str | None) -> str | None:
+        """The `lookup_product` stage of the chat pipeline"""
+        return self.get_product_name(product_id)
+
+    def invalidate(self, email: str) -> None:
+        with self._lock:
+            self._profiles.pop(email, None)
+            self._misses.pop(email, None)
+
+    def _get_profile_from_airtable(self, email: str) -> CustomerProfile | None:
+        from pyairtable.formulas import EQ, Field
+
+        record = self.accounts_table.first(
+            formula=EQ(Field("Email"), email), fields=ACCOUNT_FIELDS
+        )
+        if not record:
+            logger.warning("No Airtable account found for %s", email)
+            return None
+        fields = record["fields"]
+        return CustomerProfile(
+            email=fields.get("Email", email),
+            brand=_first(fields, "Brand Name"),
+            model_number=_first(fields, "Product Model Number"),
+            product_id=_first(fields, "Product Category"),
+        )
+
+    def _get_profile_from_snapshot(self, email: str) -> CustomerProfile | None:
+        if self._snapshot_conn is None:
+            return None
+        with self._snapshot_lock:
+            row = self._snapshot_conn.execute(
+                f"""
+                SELECT email, brand, model_number, product_id, product
+                FROM {SNAPSHOT_TABLE} WHERE email = ?
+                """,
+                [email],
+            ).fetchone()
+        return CustomerProfile(*row) if row else None
+
+    def refresh_snapshot(self) -> int:
+        """
+        Download all accounts and products into the local snapshot table
+
+        Returns
+        -------
+        int
+            The number of profiles in the snapshot
+        """
+        if self._snapshot_conn is None:
+            raise ValueError("The service was created without a snapshot_db.")
+
+        products = {
+            record["id"]: record["fields"].get("Name")
+            for record in self.products_table.all(fields=["Name"])
+        }
+        refreshed_at = datetime.datetime.now(datetime.timezone.utc)
+        rows = []
+        for record in self.accounts_table.all(fields=ACCOUNT_FIELDS):
+            fields = record["fields"]
+            if not fields.get("Email"):
+                continue
+            product_id = _first(fields, "Product Category")
+            rows.append(
+                (
+                    fields["Email"],
+                    _first(fields, "Brand Name"),
+                    _first(fields, "Product Model Number"),
+                    product_id,
+                    products.get(product_id),
+                    refreshed_at,
+                )
+            )
+
+        with self._snapshot_lock:
+            self._snapshot_conn.execute("BEGIN TRANSACTION")
+            try:
+                self._snapshot_conn.execute(f"DELETE FROM {SNAPSHOT_TABLE}")
+                if rows:
+                    self._snapshot_conn.executemany(
+                        f"INSERT INTO {SNAPSHOT_TABLE} VALUES (?, ?, ?, ?, ?, ?)",
+                        rows,
+                    )
+                self._snapshot_conn.execute("COMMIT")
+            except duckdb.Error:
+                self._snapshot_conn.execute("ROLLBACK")
+                raise
+
+        with self._lock:
+            self._misses.clear()
+            self._products.update(
+                {product_id: name for product_id, name in products.items() if name}
+            )
+        logger.info("Refreshed customer profile snapshot with %s profiles", len(rows))
+        return len(rows)
+
+    def start_snapshot_refresh(self, interval: int = 3600) -> threading.Thread:
+        """
+        Refresh the snapshot every `interval` seconds in a daemon thread
+
+        Parameters
+        ----------
+        interval : int, optional
+            The number of seconds between refreshes, by default 3600
+
+        Returns
+        -------
+        threading.Thread
+            The refresh thread, stopped with `stop_snapshot_refresh`
+        """
+
+        def _refresh_loop():
+            while not self._stop_refresh.is_set():
+                try:
+                    self.refresh_snapshot()
+                except Exception as e:
+                    logger.error("Unable to refresh customer profile snapshot: %s", e)
+                self._stop_refresh.wait(interval)
+
+        self._stop_refresh.clear()
+        thread = threading.Thread(
+            target=_refresh_loop, name="customer-profile-snapshot", daemon=True
+        )
+        thread.start()
+        return thread
+
+    def stop_snapshot_refresh(self) -> None:
+        self._stop_refresh.set()
@@ -0,0 +1,232 @@
+import re
+import threading
+from dataclasses import dataclass
+from typing import Callable
+
+import duckdb
+
+from chat_utils import LATEST_MODEL_DOCUMENTS_CTE
+
+from helper.logger import Logger
+from pdfprocessor.error_codes import normalize_code
+
+logger_instance = Logger()
+logger = logger_instance.get_logger()
+
+ERROR_CODES_TABLE = "_airbyte_raw_hackathon_error_codes"
+INDEX_TABLE = "error_codes"
+# Longer questions are free-form, e.g. E15 came back after cleaning the
+# filter, and are answered by the model from the troubleshooting sections
+DIRECT_ANSWER_MAX_WORDS = 12
+
+# The error codes of every model, from the latest document linked to it
+MODEL_ERROR_CODES_QUERY = f"""
+    WITH {LATEST_MODEL_DOCUMENTS_CTE}
+    SELECT DISTINCT
+        models.brand,
+        models.model_number,
+        codes._airbyte_data->>'code' AS code,
+        codes._airbyte_data->>'symptom' AS symptom,
+        codes._airbyte_data->>'cause' AS cause,
+        codes._airbyte_data->>'remedy' AS remedy,
+        codes._airbyte_data->>'section_name' AS section_name,
+        TRY_CAST(codes._airbyte_data->>'page' AS INTEGER) AS page
+    FROM {ERROR_CODES_TABLE} codes
+    JOIN latest_model_documents models
+    ON (codes._airbyte_data->>'document_hash') = models.document_hash
+"""
+
+# E15, F-07, 4E, or capital letters like OE
+CODE_MENTION_PATTERN = re.compile(
+    r"\b(?:[A-Za-z]{0,3}[-:]?\d{1,4}[A-Za-z]{0,2}|[A-Z]{2,3})\b"
+)
+
+
+@dataclass
+class ErrorCode:
+    code: str
+    symptom: str
+    cause: str
+    remedy: str
+    section_name: str | None = None
+    page: int | None = None
+
+
+def find_codes(question: str) -> list[str]:
+    """The normalized error codes mentioned in a question, in order"""
+    codes = []
+    for mention in CODE_MENTION_PATTERN.findall(question):
+        code = normalize_code(mention)
+        if code not in codes:
+            codes.append(code)
+    return codes
+
+
+def format_answer(error_codes: list[ErrorCode]) -> str:
+    """The markdown answer for the error codes"""
+    answers = []
+    for error_code in error_codes:
+        lines = [f"**{error_code.code}**: {error_code.symptom}".rstrip(": ")]
+        if error_code.cause:
+            lines.append(f"- **Cause:** {error_code.cause}")
+        if error_code.remedy:
+            lines.append(f"- **What to do:** {error_code.remedy}")
+        answers.append("\n".join(lines))
+    return "\n\n".join(answers)
+
+
+class ErrorCodeIndex:
+    """
+    The error codes of every model, in a local DuckDB table indexed by model
+
+    The error code tables extracted by the parser are synced to MotherDuck.
+    They are copied to the local table by `refresh`, so looking up the codes
+    in a question takes milliseconds and needs no model call.
+    """
+
+    def __init__(
+        self,
+        get_source_conn: Callable[[], duckdb.duckdb.DuckDBPyConnection],
+        db_path: str = ":memory:",
+    ):
+        """
+        Parameters
+        ----------
+        get_source_conn : Callable[[], duckdb.duckdb.DuckDBPyConnection]
+            Returns a connection to the database synced by Airbyte
+        db_path : str, optional
+            The local DuckDB database of the index, by default in memory
+        """
+        self.get_source_conn = get_source_conn
+        self._conn = duckdb.connect(db_path)
+        self._lock = threading.Lock()
+        self._stop_refresh = threading.Event()
+        self._conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {INDEX_TABLE} (
+                brand VARCHAR,
+                model_number VARCHAR,
+                code VARCHAR,
+                symptom VARCHAR,
+                cause VARCHAR,
+                remedy VARCHAR,
+                section_name VARCHAR,
+                page INTEGER
+            )
+            """
+        )
+        self._conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {INDEX_TABLE}_model_code_idx "
+            f"ON {INDEX_TABLE} (brand, model_number, code)"
+        )
+
+    def refresh(self) -> int:
+        """
+        Copy the error codes of every model to the local table
+
+        Returns
+        -------
+        int
+            The number of error codes in the index
+        """
+        try:
+            rows = self.get_source_conn().execute(MODEL_ERROR_CODES_QUERY).fetchall()
+        except duckdb.CatalogException:
+            logger.info("%s does not exist yet, no error codes", ERROR_CODES_TABLE)
+            rows = []
+
+        with self._lock:
+            self._conn.execute("BEGIN TRANSACTION")
+            try:
+                self._conn.execute(f"DELETE FROM {INDEX_TABLE}")
+                if rows:
+                    self._conn.executemany(
+                        f"INSERT INTO {INDEX_TABLE} VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        rows,
+                    )
+                self._conn.execute("COMMIT")
+            except duckdb.Error:
+                self._conn.execute("ROLLBACK")
+                raise
+        logger.info("Refreshed the error code index with %s codes", len(rows))
+        return len(rows)
+
+    def lookup(
+        self, brand: str, model_number: str, codes: list[str]
+    ) -> list[ErrorCode]:
+        """The error codes of a model, in the order of `codes`"""
+        if not codes:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                f"""
+                SELECT code, symptom, cause, remedy, section_name, page
+                FROM {INDEX_TABLE}
+                WHERE brand = ? AND model_number = ? AND list_contains(?, code)
+                ORDER BY list_position(?, code), page
+                """,
+                [brand, str(model_number), codes, codes],
+            ).fetchall()
+        return [ErrorCode(*row) for row in rows]
+
+    def answer(self, question: str, brand: str, model_number: str) -> str | None:
+        """
+        Answer a question about error codes with their table rows
+
+        Parameters
+        ----------
+        question : str
+            The customer's question
+        brand : str
+            The brand of the customer's device
+        model_number : str
+            The model number of the customer's device
+
+        Returns
+        -------
+        str | None
+            The answer, None when the question is free-form or mentions no
+            error code of the model
+        """
+        if len(question.split()) > DIRECT_ANSWER_MAX_WORDS:
+            return None
+        # Other mentions, e.g. a year, are not in the tables of the model
+        error_codes = self.lookup(brand, model_number, find_codes(question))
+        if not error_codes:
+            return None
+        return format_answer(error_codes)
+
+    def start_refresh(self, interval: int = 3600) -> threading.Thread:
+        """
+        Refresh the index every `interval` seconds in a daemon thread
+
+        The first refresh happens after `interval` seconds, call `refresh`
+        first so the index is loaded before it is used.
+
+        Parameters
+        ----------
+        interval : int, optional
+            The number of seconds between refreshes, by default 3600
+
+        Returns
+        -------
+        threading.Thread
+            The refresh thread, stopped with `stop_refresh`
+        """
+
+        def _refresh_loop():
+            while not self._stop_refresh.wait(interval):
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.error("Unable to refresh the error code index: %s", e)
+
+        self._stop_refresh.clear()
+        thread = threading.Thread(
+            target=_refresh_loop, name="error-code-index", daemon=True
+        )
+        thread.start()
+        return thread
+
+    def stop_refresh(self) -> None:
+        self._stop_refresh.set()
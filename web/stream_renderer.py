@@ -0,0 +1,96 @@
+import time
+from typing import Callable, Iterable
+
+DEFAULT_FLUSH_INTERVAL = 0.05
+DEFAULT_FLUSH_CHARS = 200
+
+
+class ThrottledStreamRenderer:
+    """
+    Renders a streamed answer into a Streamlit placeholder in batches
+
+    Every `placeholder.markdown` call re-sends the whole answer, so chunks are
+    coalesced and only flushed once `flush_interval` seconds have passed or
+    `flush_chars` characters are pending, plus once more on completion.
+    """
+
+    def __init__(
+        self,
+        placeholder,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        flush_chars: int = DEFAULT_FLUSH_CHARS,
+        cursor: str = "▌",
+        clock: Callable[[], float] = time.perf_counter,
+    ):
+        """
+        Parameters
+        ----------
+        placeholder : streamlit.delta_generator.DeltaGenerator
+            The placeholder to render into, e.g. `st.empty()`
+        flush_interval : float, optional
+            The maximum number of seconds between renders, by default 0.05
+        flush_chars : int, optional
+            The number of pending characters that forces a render, by default 200
+        cursor : str, optional
+            Appended to the partial answer while streaming, by default "▌"
+        clock : Callable[[], float], optional
+            The clock used for timings, by default time.perf_counter
+        """
+        self.placeholder = placeholder
+        self.flush_interval = flush_interval
+        self.flush_chars = flush_chars
+        self.cursor = cursor
+        self.clock = clock
+        self.time_to_first_token: float | None = None
+        self.total_time: float | None = None
+        self.chunk_count = 0
+        self.flush_count = 0
+
+    def render(self, chunks: Iterable[str], start_time: float | None = None) -> str:
+        """
+        Render chunks as they arrive and return the full answer
+
+        Parameters
+        ----------
+        chunks : Iterable[str]
+            The streamed text chunks
+        start_time : float | None, optional
+            The `clock` time the request started at, used for the time to
+            first token, by default the time `render` is called
+
+        Returns
+        -------
+        str
+            The full answer
+        """
+        start_time = self.clock() if start_time is None else start_time
+        parts: list[str] = []
+        pending_chars = 0
+        last_flush = start_time
+
+        for chunk in chunks:
+            if not chunk:
+                continue
+            now = self.clock()
+            if self.time_to_first_token is None:
+                self.time_to_first_token = now - start_time
+            parts.append(chunk)
+            self.chunk_count += 1
+            pending_chars += len(chunk)
+
+            if (
+                pending_chars >= self.flush_chars
+                or now - last_flush >= self.flush_interval
+            ):
+                self._flush("".join(parts) + self.cursor)
+                pending_chars = 0
+                last_flush = now
+
+        full_response = "".join(parts)
+        self._flush(full_response)
+        self.total_time = self.clock() - start_time
+        return full_response
+
+    def _flush(self, text: str) -> None:
+        self.placeholder.markdown(text)
+        self.flush_count += 1
@@ -1,15 +1,15 @@
+import functools
 import os
 import sys
 import tempfile
 
-import boto3
 import streamlit as st
 from dotenv import load_dotenv
 
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
-from helper.utils import Environment, ExtractorOption, Logger
-from pdfprocessor.parser import PdfManualParser
+from helper.utils import Environment, Logger, get_s3_client
+from pdfprocessor.jobs import JobQueue, JobStatus
 
 load_dotenv()
 
@@ -19,6 +19,17 @@ logger = logger_instance.get_logger()
 
 env_to_use = os.getenv("ENVIRONMENT", "LOCAL")
 envs = {"AWS": Environment.AWS, "LOCAL": Environment.LOCAL}
+PARSER_INSTRUMENT = os.getenv("PARSER_INSTRUMENT", "false").lower() == "true"
+PARSER_PROFILE_MODE = os.getenv("PARSER_PROFILE_MODE") or None
+PARSER_EXTRACTION_PROFILE = os.getenv("PARSER_EXTRACTION_PROFILE", "full")
+INGESTION_STATE_DB = os.getenv("INGESTION_STATE_DB", ".ingestion/state.sqlite")
+INGESTION_MAX_WORKERS = int(os.getenv("INGESTION_MAX_WORKERS", "2"))
+INGESTION_MEMORY_LIMIT_MB = int(os.getenv("INGESTION_MEMORY_LIMIT_MB") or 0) or None
+INGESTION_LANGUAGES = [
+    language.strip()
+    for language in os.getenv("INGESTION_LANGUAGES", "").split(",")
+    if language.strip()
+] or None
 
 BUCKET_NAME = "airbyte-motherduck-hackathon"
 SUPPORTED_BRANDS = ["ASKO", "BEKO", "LG", "SAMSUNG"]
@@ -36,7 +47,7 @@ def upload_to_s3(file, bucket_name, brand, object_name=None):
     """
     if object_name is None:
         object_name = f"dataset/{brand.upper()}/{file.name}"  # Add brand to object key
-    s3_client = boto3.client("s3")
+    s3_client = get_s3_client(bucket_name)
     try:
         s3_client.upload_fileobj(file, bucket_name, object_name)
         st.success("File uploaded 🎉")
@@ -44,6 +55,30 @@ def upload_to_s3(file, bucket_name, brand, object_name=None):
         st.error(f"Error uploading file: {e}")
 
 
+@functools.lru_cache(maxsize=None)
+def get_job_queue() -> JobQueue:
+    """Creates the process wide ingestion job queue"""
+    return JobQueue(INGESTION_STATE_DB, max_workers=INGESTION_MAX_WORKERS)
+
+
+@st.fragment(run_every=2)
+def show_jobs(job_ids: list):
+    """Shows the progress of the jobs queued in this session, refreshed every 2s"""
+    job_queue = get_job_queue()
+    for job_id in reversed(job_ids):
+        job = job_queue.get(job_id)
+        if job is None:
+            continue
+        label = f"{job.brand} {job.model_number} ({job_id[:8]}): {job.status.value}"
+        if job.status == JobStatus.FAILED:
+            st.error(f"{label} - {job.error}")
+        elif job.status == JobStatus.SUCCEEDED:
+            st.success(label)
+        else:
+            stage_name = (job.stage or "waiting").replace("_", " ")
+            st.progress(job.progress, text=f"{label} - {stage_name}")
+
+
 def app():
     with st.container():
         st.title("Welcome to Ocelot Living User Manual Upload")
@@ -81,23 +116,32 @@ def app():
         # upload_to_s3(uploaded_file, BUCKET_NAME, selected_brand)
         # logger.info(uploaded_file)
 
-        # Save the uploaded file to the specified path
+        # Save the uploaded file for the background job, which removes it when done
         with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
             temp_file.write(uploaded_file.getbuffer())
             logger.info(temp_file.name)
-            pdf_parser = PdfManualParser(
-                pdf_path=temp_file.name,
-                model_number=model_number,
-                brand=selected_brand,
-                device=selected_device,
-                environment=envs[env_to_use],
-                toc_mapping_method=ExtractorOption.GEMINI,
-            )
-            pdf_parser.temp_file_path = temp_file.name
-            pdf_parser.save_all_sections_content()
-            pdf_parser.cleanup()
+        job_id = get_job_queue().submit(
+            temp_file.name,
+            brand=selected_brand,
+            model_number=model_number,
+            device=selected_device,
+            environment=envs[env_to_use].value,
+            instrument=PARSER_INSTRUMENT,
+            profile_mode=PARSER_PROFILE_MODE,
+            state_db=INGESTION_STATE_DB,
+            memory_limit_mb=INGESTION_MEMORY_LIMIT_MB,
+            languages=INGESTION_LANGUAGES,
+            extraction_profile=PARSER_EXTRACTION_PROFILE,
+            remove_pdf=True,
+        )
+        st.session_state.setdefault("ingestion_jobs", []).append(job_id)
+        st.success(f"Queued for parsing, job ID {job_id} 🎉")
 
     elif upload_button and selected_brand and not uploaded_file:
         st.warning("Please select a file to upload. ⚠️")
     elif upload_button and uploaded_file and not selected_brand:
         st.warning("Please select a brand. ⚠️")
+
+    if st.session_state.get("ingestion_jobs"):
+        st.header("Parsing Jobs")
+        show_jobs(st.session_state.ingestion_jobs)